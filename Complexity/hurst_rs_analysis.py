@@ -2,54 +2,107 @@ import numpy as np
 from scipy.stats import linregress
 
 
-def hurst_rs_multiscale(time_series: np.ndarray) -> float:
+def _window_sizes(N: int) -> np.ndarray:
     """
-    Compute Hurst exponent using multi-scale Rescaled Range (R/S) analysis.
+    Logarithmically spaced R/S window sizes from 10 to N // 2.
+    """
+    return np.floor(
+        np.logspace(np.log10(10), np.log10(N // 2), num=10)
+    ).astype(int)
 
-    This implementation follows standard R/S methodology
-    used in EEG time-series analysis.
+
+def rescaled_range_batch(epochs: np.ndarray, w: int) -> np.ndarray:
+    """
+    Mean R/S over all non-overlapping windows of size w, per epoch.
+
+    The epochs are reshaped into (n_epochs, num_segments, w) views,
+    so every segment of every epoch is processed at once. Segments
+    with zero standard deviation are ignored; epochs without any
+    valid segment get NaN.
+    """
+    n_epochs, N = epochs.shape
+    num_segments = N // w
+    segments = epochs[:, :num_segments * w].reshape(n_epochs, num_segments, w)
+
+    dev = segments - segments.mean(axis=2, keepdims=True)
+    cum_dev = np.cumsum(dev, axis=2)
+
+    R = cum_dev.max(axis=2) - cum_dev.min(axis=2)
+    S = segments.std(axis=2, ddof=1)
+
+    valid = S > 0
+    rs = np.divide(R, S, out=np.zeros_like(R), where=valid)
+    counts = valid.sum(axis=1)
+
+    return np.divide(
+        rs.sum(axis=1), counts,
+        out=np.full(n_epochs, np.nan), where=counts > 0
+    )
+
+
+def hurst_rs_multiscale_batch(epochs: np.ndarray) -> np.ndarray:
+    """
+    Hurst exponent of many equal-length signals at once.
 
     Parameters
     ----------
-    time_series : np.ndarray
-        1D EEG signal
+    epochs : np.ndarray
+        (n_epochs, n_samples) EEG signals, e.g. all epochs of a channel
 
     Returns
     -------
-    float
-        Hurst exponent
+    np.ndarray
+        Hurst exponent per epoch (NaN if fewer than two scales are
+        usable)
     """
-    N = len(time_series)
-    window_sizes = np.floor(
-        np.logspace(np.log10(10), np.log10(N // 2), num=10)
-    ).astype(int)
+    epochs = np.asarray(epochs, dtype=float)
+    n_epochs, N = epochs.shape
+    window_sizes = _window_sizes(N)
+    window_sizes = window_sizes[window_sizes >= 10]
 
-    RS = []
+    # (n_epochs, n_scales) mean R/S; NaN where a scale has no valid segment
+    RS = np.column_stack(
+        [rescaled_range_batch(epochs, w) for w in window_sizes]
+    ) if len(window_sizes) else np.empty((n_epochs, 0))
 
-    for w in window_sizes:
-        if w < 10:
-            continue
+    H = np.full(n_epochs, np.nan)
+    complete = np.isfinite(RS).all(axis=1)
+    log_w = np.log(window_sizes)
 
-        num_segments = N // w
-        rs_vals = []
+    if len(np.unique(log_w)) > 1 and complete.any():
+        # Closed-form least-squares slope of log(R/S) on log(w)
+        log_RS = np.log(RS[complete])
+        x = log_w - log_w.mean()
+        y = log_RS - log_RS.mean(axis=1, keepdims=True)
+        H[complete] = y @ x / (x @ x)
 
-        for i in range(num_segments):
-            segment = time_series[i * w:(i + 1) * w]
-            mean_seg = np.mean(segment)
-            dev = segment - mean_seg
-            cum_dev = np.cumsum(dev)
+    for e in np.flatnonzero(~complete):
+        rs = RS[e][np.isfinite(RS[e])]
+        if len(np.unique(log_w[:len(rs)])) > 1:
+            # Pair the surviving scales with the leading window sizes,
+            # as the original per-signal implementation did
+            H[e] = linregress(log_w[:len(rs)], np.log(rs)).slope
 
-            R = np.max(cum_dev) - np.min(cum_dev)
-            S = np.std(segment, ddof=1)
+    return H
 
-            if S > 0:
-                rs_vals.append(R / S)
 
-        if len(rs_vals) > 0:
-            RS.append(np.mean(rs_vals))
+def hurst_rs_multiscale(time_series: np.ndarray) -> float:
+    """
+    Compute Hurst exponent using multi-scale Rescaled Range (R/S) analysis.
 
-    log_w = np.log(window_sizes[:len(RS)])
-    log_RS = np.log(RS)
+    This implementation follows standard R/S methodology
+    used in EEG time-series analysis.
 
-    slope, _, _, _, _ = linregress(log_w, log_RS)
-    return slope
+    Parameters
+    ----------
+    time_series : np.ndarray
+        1D EEG signal
+
+    Returns
+    -------
+    float
+        Hurst exponent
+    """
+    return float(
+        hurst_rs_multiscale_batch(np.asarray(time_series)[np.newaxis])[0]
+    )
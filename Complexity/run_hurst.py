@@ -1,36 +1,175 @@
-import numpy as np
+import os
 import pandas as pd
+import multiprocessing as mp
 from pathlib import Path
-from Complexity.hurst_rs_analysis import hurst_rs_multiscale
+from tqdm import tqdm
+from Complexity.hurst_rs_analysis import hurst_rs_multiscale_batch
+from preprocessing.epoch_store import (
+    list_subjects,
+    cached_subject_epochs,
+    epoch_name
+)
+from preprocessing.manifest import (
+    MANIFEST_NAME,
+    load_manifest,
+    save_manifest,
+    subject_digests,
+    prune_subjects
+)
 
+HURST_COLUMNS = ["subject", "channel", "epoch", "hurst"]
 
-def compute_hurst_for_dataset(input_root: Path, output_csv: Path):
+
+def process_hurst_shard(args) -> Path:
     """
-    Compute Hurst exponent for all subjects and channels.
+    Atomic processing unit: Hurst exponents of one subject (all
+    channels) or of one subject channel, written to its shard CSV.
     """
+    input_root, subject_id, channel, shard_file = args
+    epochs, channels = cached_subject_epochs(input_root, subject_id)
+    selected = channels if channel is None else [channel]
+
     results = []
+    for channel_id in selected:
+        # All epochs of a channel in one vectorized call
+        hurst = hurst_rs_multiscale_batch(epochs[channels.index(channel_id)])
+
+        for epoch_idx, H in enumerate(hurst):
+            results.append({
+                "subject": subject_id,
+                "channel": channel_id,
+                "epoch": epoch_name(epoch_idx),
+                "hurst": H
+            })
+
+    shard_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp = shard_file.with_suffix(".csv.tmp")
+    pd.DataFrame(results, columns=HURST_COLUMNS).to_csv(tmp, index=False)
+    os.replace(tmp, shard_file)
+    return shard_file
+
+
+def plan_hurst_shards(
+    input_root: Path,
+    shard_root: Path,
+    shard_by: str,
+    manifest: dict
+):
+    """
+    Shard tasks for a dataset, in output order, and the subset that
+    must be (re)computed.
+
+    A shard is pending when the content hashes of its epochs differ
+    from those recorded in the manifest, or its file is missing.
+    Shards of subjects and channels no longer in the store are
+    deleted. manifest is updated to describe the shards as they will
+    be once all pending tasks have run.
+
+    Returns
+    -------
+    tasks : list
+        process_hurst_shard arguments of every shard
+    pending : list
+        Tasks to run
+    """
+    if shard_by not in ("subject", "channel"):
+        raise ValueError(
+            f"shard_by must be 'subject' or 'channel', not {shard_by!r}"
+        )
+
+    subject_ids = list_subjects(input_root)
+    prune_subjects(manifest, input_root, subject_ids)
 
-    for subject_dir in sorted(input_root.iterdir()):
-        if not subject_dir.is_dir():
-            continue
+    tasks = []
+    pending = []
+    units = {}
+    for subject_id in subject_ids:
+        digests = subject_digests(manifest, input_root, subject_id)
 
-        subject_id = subject_dir.name
+        if shard_by == "subject":
+            shards = [(None, f"{subject_id}.csv", digests)]
+        else:
+            shards = [
+                (channel_id, f"{subject_id}/{channel_id}.csv", digests[channel_id])
+                for channel_id in digests
+            ]
 
-        for channel_dir in sorted(subject_dir.iterdir()):
-            if not channel_dir.is_dir():
-                continue
+        for channel_id, key, current in shards:
+            task = (input_root, subject_id, channel_id, shard_root / key)
+            tasks.append(task)
+            units[key] = current
+
+            recorded = manifest["units"].get(key)
+            if not task[3].exists():
+                pending.append(task)
+            elif recorded is None:
+                # Shard finished by an interrupted run, unless the
+                # parameters changed since
+                if manifest.get("invalidated"):
+                    pending.append(task)
+            elif recorded != current:
+                pending.append(task)
+
+    for key in set(manifest["units"]) - set(units):
+        shard_file = shard_root / key
+        shard_file.unlink(missing_ok=True)
+        if shard_file.parent != shard_root and not any(shard_file.parent.iterdir()):
+            shard_file.parent.rmdir()
+    manifest["units"] = units
+
+    return tasks, pending
+
+
+def compute_hurst_for_dataset(
+    input_root: Path,
+    output_csv: Path,
+    n_workers: int = None,
+    shard_by: str = "subject",
+    progress: bool = True
+):
+    """
+    Compute Hurst exponent for all subjects and channels.
+
+    input_root is an epoch store (see preprocessing.epoch_store).
+
+    The work is split into shards per subject (or per subject channel
+    with shard_by="channel") that run on n_workers processes. Each
+    shard is written to <output_csv stem>_shards/ as soon as it
+    finishes. The shards are then streamed into output_csv.
+
+    The run is incremental: <output_csv stem>_shards/manifest.json
+    records the content hash of every epoch behind each shard, so only
+    shards of new or changed subjects and channels are recomputed.
+    Shards left by an interrupted sweep are kept, so it can be
+    restarted.
+
+    n_workers defaults to all cores but two; n_workers=1 runs
+    serially.
+    """
+    shard_root = output_csv.with_name(f"{output_csv.stem}_shards")
+    manifest_file = shard_root / MANIFEST_NAME
+    manifest = load_manifest(manifest_file, {"shard_by": shard_by})
+    tasks, pending = plan_hurst_shards(input_root, shard_root, shard_by, manifest)
 
-            channel_id = channel_dir.name
+    if n_workers is None:
+        n_workers = max(1, mp.cpu_count() - 2)
 
-            for epoch_file in channel_dir.glob("epoch_*.csv"):
-                signal = pd.read_csv(epoch_file, header=None).iloc[:, 0].values
-                H = hurst_rs_multiscale(signal)
+    with tqdm(total=len(pending), desc="Hurst", unit=shard_by,
+              disable=not progress) as bar:
+        if n_workers > 1 and len(pending) > 1:
+            with mp.Pool(processes=min(n_workers, len(pending))) as pool:
+                for _ in pool.imap_unordered(process_hurst_shard, pending):
+                    bar.update()
+        else:
+            for task in pending:
+                process_hurst_shard(task)
+                bar.update()
 
-                results.append({
-                    "subject": subject_id,
-                    "channel": channel_id,
-                    "epoch": epoch_file.stem,
-                    "hurst": H
-                })
+    save_manifest(manifest_file, manifest)
 
-    pd.DataFrame(results).to_csv(output_csv, index=False)
+    output_csv.parent.mkdir(parents=True, exist_ok=True)
+    pd.DataFrame(columns=HURST_COLUMNS).to_csv(output_csv, index=False)
+    for task in tasks:
+        pd.read_csv(task[3]).to_csv(
+            output_csv, mode="a", header=False, index=False
+        )
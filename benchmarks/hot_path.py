@@ -0,0 +1,295 @@
+"""
+Benchmarks for the epoch → VG → metrics → roles hot path.
+
+Every stage runs in isolation on synthetic pink-noise (1/f) epochs at
+several lengths (= VG sizes). Wall time (best and median of repeats)
+and peak traced memory are reported per stage and size; results can
+be saved as a JSON baseline and compared against one.
+
+    python benchmarks/hot_path.py --save benchmarks/baseline.json
+    python benchmarks/hot_path.py --compare benchmarks/baseline.json
+
+With --compare the exit status is 1 if any stage is slower (or uses
+more memory) than the baseline by more than --tolerance.
+"""
+import sys
+import json
+import time
+import argparse
+import platform
+import tracemalloc
+import numpy as np
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+# statistics/ shadows the standard library, so import its module directly
+sys.path[:0] = [str(ROOT), str(ROOT / "statistics")]
+
+from networks.visibility_graph import compute_visibility_graph
+from networks.network_metrics import (
+    compute_network_metrics,
+    participation_coefficient
+)
+from networks.hub_classification import (
+    within_module_degree_zscore,
+    classify_node_role_codes,
+    role_summary
+)
+from Complexity.hurst_rs_analysis import hurst_rs_multiscale
+from permutation_test_fdr import permutation_test, permutation_test_batch
+
+
+DEFAULT_LENGTHS = [500, 1000, 2500]
+
+# Subjects per group and channels for the permutation-test stages
+PERM_SUBJECTS = 30
+PERM_CHANNELS = 16
+
+
+# ---------------- SYNTHETIC SIGNALS ----------------
+def pink_noise(n: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Unit-variance 1/f noise of length n (EEG-like spectrum).
+    """
+    spectrum = np.fft.rfft(rng.standard_normal(n))
+    f = np.fft.rfftfreq(n)
+    f[0] = f[1]
+    x = np.fft.irfft(spectrum / np.sqrt(f), n)
+    return (x - x.mean()) / x.std()
+
+
+# ---------------- STAGES ----------------
+# Each setup builds the stage inputs for one size outside the timed
+# region and returns a zero-argument callable.
+
+def _setup_visibility_graph(n, rng):
+    x = pink_noise(n, rng)
+    return lambda: compute_visibility_graph(x, sparse_output=True)
+
+
+def _graph_inputs(n, rng):
+    adj = compute_visibility_graph(pink_noise(n, rng), sparse_output=True)
+    metrics = compute_network_metrics(adj, backend="sparse")
+    return adj, metrics
+
+
+def _setup_network_metrics(n, rng):
+    adj = compute_visibility_graph(pink_noise(n, rng), sparse_output=True)
+    return lambda: compute_network_metrics(adj, backend="sparse")
+
+
+def _setup_participation(n, rng):
+    adj, metrics = _graph_inputs(n, rng)
+    return lambda: participation_coefficient(adj, metrics["communities"])
+
+
+def _setup_zscore(n, rng):
+    adj, metrics = _graph_inputs(n, rng)
+    return lambda: within_module_degree_zscore(adj, metrics["communities"])
+
+
+def _setup_roles(n, rng):
+    adj, metrics = _graph_inputs(n, rng)
+    z = within_module_degree_zscore(adj, metrics["communities"])
+    P = metrics["participation"]
+    return lambda: role_summary(classify_node_role_codes(P, z))
+
+
+def _setup_hurst(n, rng):
+    x = pink_noise(n, rng)
+    return lambda: hurst_rs_multiscale(x)
+
+
+def _setup_permutation_test(n, rng):
+    # Size is the number of permutations
+    data1 = rng.standard_normal(PERM_SUBJECTS)
+    data2 = rng.standard_normal(PERM_SUBJECTS) + 0.3
+    return lambda: permutation_test(data1, data2, num_permutations=n)
+
+
+def _setup_permutation_test_batch(n, rng):
+    data1 = rng.standard_normal((PERM_SUBJECTS, PERM_CHANNELS))
+    data2 = rng.standard_normal((PERM_SUBJECTS, PERM_CHANNELS)) + 0.3
+    return lambda: permutation_test_batch(
+        data1, data2, num_permutations=n, rng=np.random.default_rng(0)
+    )
+
+
+# name -> (setup, uses epoch lengths as sizes)
+STAGES = {
+    "visibility_graph": (_setup_visibility_graph, True),
+    "network_metrics": (_setup_network_metrics, True),
+    "participation_coefficient": (_setup_participation, True),
+    "within_module_degree_zscore": (_setup_zscore, True),
+    "node_roles": (_setup_roles, True),
+    "hurst_rs_multiscale": (_setup_hurst, True),
+    "permutation_test": (_setup_permutation_test, False),
+    "permutation_test_batch": (_setup_permutation_test_batch, False)
+}
+
+PERMUTATION_SIZES = [1000, 5000]
+
+# Differences below these are timer / allocator noise, not regressions
+MIN_TIME_DELTA = 1e-3     # seconds
+MIN_MEMORY_DELTA = 0.1    # MiB
+
+
+# ---------------- MEASUREMENT ----------------
+def measure(fn, repeat: int) -> dict:
+    """
+    Best and median wall time over repeat calls, and the peak memory
+    traced during one extra call.
+    """
+    fn()   # warm-up (imports, caches)
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "time_s": min(times),
+        "median_s": float(np.median(times)),
+        "peak_mib": peak / 2**20
+    }
+
+
+def run_benchmarks(
+    stages=None,
+    lengths=None,
+    repeat: int = 5,
+    seed: int = 0
+) -> dict:
+    """
+    Run the selected stages at every size.
+
+    Returns
+    -------
+    dict
+        "meta" (environment) and "results": "stage[n=size]" ->
+        time_s, median_s, peak_mib
+    """
+    stages = list(STAGES) if stages is None else stages
+    lengths = DEFAULT_LENGTHS if lengths is None else lengths
+
+    results = {}
+    for stage in stages:
+        setup, by_length = STAGES[stage]
+        for n in (lengths if by_length else PERMUTATION_SIZES):
+            fn = setup(n, np.random.default_rng(seed))
+            results[f"{stage}[n={n}]"] = measure(fn, repeat)
+
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "repeat": repeat,
+            "seed": seed
+        },
+        "results": results
+    }
+
+
+def compare_to_baseline(
+    current: dict,
+    baseline: dict,
+    tolerance: float = 0.2
+) -> list:
+    """
+    Cases whose best time or peak memory exceeds the baseline by more
+    than tolerance (relative) and by more than the noise floor
+    (MIN_TIME_DELTA, MIN_MEMORY_DELTA).
+
+    Returns
+    -------
+    list
+        (case, quantity, baseline, current) tuples
+    """
+    regressions = []
+    for case, now in current["results"].items():
+        before = baseline["results"].get(case)
+        if before is None:
+            continue
+
+        for quantity, floor in (("time_s", MIN_TIME_DELTA),
+                                ("peak_mib", MIN_MEMORY_DELTA)):
+            if (now[quantity] > before[quantity] * (1 + tolerance)
+                    and now[quantity] - before[quantity] > floor):
+                regressions.append(
+                    (case, quantity, before[quantity], now[quantity])
+                )
+
+    return regressions
+
+
+# ---------------- CLI ----------------
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the epoch → VG → metrics → roles hot path."
+    )
+    parser.add_argument(
+        "--stages", nargs="+", choices=list(STAGES), default=None,
+        help="Stages to run (default: all)"
+    )
+    parser.add_argument(
+        "--lengths", nargs="+", type=int, default=DEFAULT_LENGTHS,
+        help="Epoch lengths in samples (VG sizes)"
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--save", type=Path, default=None,
+        help="Write the results as a JSON baseline"
+    )
+    parser.add_argument(
+        "--compare", type=Path, default=None,
+        help="Baseline JSON to check for regressions"
+    )
+    parser.add_argument(
+        "--tolerance", type=float, default=0.2,
+        help="Allowed relative slowdown / memory growth"
+    )
+    args = parser.parse_args(argv)
+
+    current = run_benchmarks(args.stages, args.lengths, args.repeat, args.seed)
+
+    baseline = None
+    if args.compare is not None:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    print(f"{'case':<42}{'best (ms)':>12}{'median (ms)':>14}{'peak (MiB)':>12}"
+          f"{'vs base':>10}")
+    for case, r in current["results"].items():
+        ratio = ""
+        if baseline is not None and case in baseline["results"]:
+            ratio = f"{r['time_s'] / baseline['results'][case]['time_s']:.2f}x"
+        print(f"{case:<42}{1e3 * r['time_s']:>12.2f}{1e3 * r['median_s']:>14.2f}"
+              f"{r['peak_mib']:>12.2f}{ratio:>10}")
+
+    if args.save is not None:
+        args.save.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.save, "w") as f:
+            json.dump(current, f, indent=2)
+
+    if baseline is None:
+        return 0
+
+    regressions = compare_to_baseline(current, baseline, args.tolerance)
+    for case, quantity, before, now in regressions:
+        print(f"REGRESSION {case} {quantity}: {before:.4g} -> {now:.4g}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,35 @@
+import os
+import shutil
 import numpy as np
 import pandas as pd
+import multiprocessing as mp
 from pathlib import Path
-from scipy.signal import butter, filtfilt
+from scipy.signal import filtfilt
 
-from networks.visibility_graph import compute_visibility_graph
-from networks.network_metrics import compute_network_metrics
-from networks.hub_classification import (
-    within_module_degree_zscore,
-    classify_node_roles
+from networks.hub_classification import classify_node_roles, role_thresholds
+from networks.epoch_analysis import analyze_epoch, compute_epoch_network
+from networks.results_writer import partition_path, write_record_batch
+from networks.instrumentation import (
+    stage,
+    epoch_scope,
+    enable_instrumentation,
+    instrumentation_enabled,
+    drain_records,
+    write_instrumentation
+)
+from preprocessing.epoch_store import (
+    list_subjects,
+    iter_subject_epochs,
+    epoch_name
+)
+from preprocessing.filter_bank import butter_bandpass_coefficients
+from preprocessing.manifest import (
+    MANIFEST_NAME,
+    load_manifest,
+    save_manifest,
+    subject_digests,
+    prune_subjects,
+    track_params
 )
 
 
@@ -20,13 +42,9 @@ def bandpass_filter(
     order: int = 4
 ) -> np.ndarray:
     """
-    Apply Butterworth bandpass filter.
+    Apply Butterworth bandpass filter (along the last axis).
     """
-    nyq = fs / 2
-    low = lowcut / nyq
-    high = highcut / nyq
-
-    b, a = butter(order, [low, high], btype="band")
+    b, a = butter_bandpass_coefficients(fs, lowcut, highcut, order)
     return filtfilt(b, a, signal)
 
 
@@ -38,11 +56,60 @@ FREQUENCY_BANDS = {
 }
 
 
+def decompose_bands(
+    channel_epochs: np.ndarray,
+    fs: int,
+    bands: dict = FREQUENCY_BANDS
+) -> dict:
+    """
+    Band-limited epochs of one channel, filtered on the continuous
+    signal.
+
+    The epochs of a channel in the epoch store are consecutive, so
+    they are joined back into the continuous recording, filtered once
+    per band and cut again. This costs one filter pass per band and
+    channel and avoids edge transients at every epoch boundary.
+
+    Returns
+    -------
+    dict
+        band name -> (epochs, samples) array
+    """
+    n_epochs, samples = channel_epochs.shape
+    continuous = np.asarray(channel_epochs).reshape(-1)
+
+    return {
+        band_name: bandpass_filter(
+            continuous, fs, band_range[0], band_range[1]
+        ).reshape(n_epochs, samples)
+        for band_name, band_range in bands.items()
+    }
+
+
 # ---------------- CORE ANALYSIS ----------------
+def band_hub_roles(
+    filtered_signal: np.ndarray,
+    metrics_backend: str = "sparse",
+    vg_options: dict = None
+):
+    """
+    Compute hub roles for one band-limited epoch.
+
+    Same VG and metrics as the batch path (analyze_channel_bands),
+    returned as per-node role names.
+    """
+    network = compute_epoch_network(
+        filtered_signal, metrics_backend, vg_options=vg_options
+    )
+    return classify_node_roles(network["participation"], network["z"])
+
+
 def analyze_frequency_band(
     epoch_signal: np.ndarray,
     fs: int,
-    band: tuple
+    band: tuple,
+    metrics_backend: str = "sparse",
+    vg_options: dict = None
 ):
     """
     Compute hub roles for one epoch and one frequency band.
@@ -50,19 +117,124 @@ def analyze_frequency_band(
     filtered_signal = bandpass_filter(
         epoch_signal, fs, band[0], band[1]
     )
+    return band_hub_roles(filtered_signal, metrics_backend, vg_options)
 
-    adj = compute_visibility_graph(filtered_signal)
-    metrics = compute_network_metrics(adj)
 
-    z = within_module_degree_zscore(
-        adj, metrics["communities"]
-    )
+# ---------------- BATCH ANALYSIS ----------------
+def _analyze_band_epoch(args):
+    """
+    Worker: full metrics and hub counts of one band-limited epoch,
+    with its instrumentation records.
+    """
+    (epoch_idx, band_name, filtered_signal, metrics_backend, vg_options,
+     cache_dir, cache_max_bytes) = args
+    record = {"epoch": epoch_name(epoch_idx), "band": band_name}
 
-    roles = classify_node_roles(
-        metrics["participation"], z
-    )
+    with epoch_scope(epoch=record["epoch"], band=band_name):
+        record.update(analyze_epoch(
+            filtered_signal, metrics_backend, cache_dir, cache_max_bytes,
+            vg_options=vg_options
+        ))
 
-    return roles
+    return record, drain_records()
+
+
+def analyze_channel_bands(
+    channel_epochs: np.ndarray,
+    fs: int,
+    bands=None,
+    band_filtering: str = "epoch",
+    metrics_backend: str = "sparse",
+    n_workers: int = 1,
+    executor=None,
+    stage_records: list = None,
+    vg_options: dict = None,
+    cache_dir: Path = None,
+    cache_max_bytes: int = None
+) -> pd.DataFrame:
+    """
+    VG, network metrics and hub roles for every (epoch, band) of one
+    channel.
+
+    Parameters
+    ----------
+    channel_epochs : np.ndarray
+        (epochs, samples) signals of one channel
+    bands : dict or list, optional
+        band name -> (low, high) Hz, or names from FREQUENCY_BANDS
+        (default: all of FREQUENCY_BANDS)
+    band_filtering : str
+        "epoch" or "continuous" (see run_band_specific_network_analysis)
+    n_workers : int
+        Processes for the (epoch, band) tasks when no executor is given
+    executor : optional
+        Existing pool with map(fn, iterable), reused as is
+    stage_records : list, optional
+        Receives the instrumentation records (band filtering and every
+        (epoch, band) analysis) when instrumentation is enabled
+    vg_options : dict, optional
+        Visibility graph selection passed to compute_visibility_graph,
+        e.g. {"graph": "hvg"} (default: natural VG)
+    cache_dir : Path, optional
+        Result cache for the band-limited networks (see
+        networks.result_cache), bounded by cache_max_bytes
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per (epoch, band) with the same metric columns as the
+        main network pipeline
+    """
+    if bands is None:
+        bands = FREQUENCY_BANDS
+    elif not isinstance(bands, dict):
+        bands = {band_name: FREQUENCY_BANDS[band_name] for band_name in bands}
+
+    with stage("load_channel"):
+        channel_epochs = np.array(channel_epochs)
+
+    with stage("band_filter"):
+        if band_filtering == "continuous":
+            band_epochs = decompose_bands(channel_epochs, fs, bands)
+        elif band_filtering == "epoch":
+            band_epochs = {
+                band_name: bandpass_filter(
+                    channel_epochs, fs, band_range[0], band_range[1]
+                )
+                for band_name, band_range in bands.items()
+            }
+        else:
+            raise ValueError(f"Unknown band_filtering mode {band_filtering!r}")
+
+    tasks = [
+        (
+            epoch_idx, band_name, band_epochs[band_name][epoch_idx],
+            metrics_backend, vg_options, cache_dir, cache_max_bytes
+        )
+        for epoch_idx in range(len(channel_epochs))
+        for band_name in bands
+    ]
+
+    local = drain_records()
+
+    if executor is not None:
+        results = list(executor.map(_analyze_band_epoch, tasks))
+    elif n_workers > 1 and len(tasks) > 1:
+        with mp.Pool(
+            processes=min(n_workers, len(tasks)),
+            initializer=enable_instrumentation,
+            initargs=(instrumentation_enabled(),)
+        ) as pool:
+            results = pool.map(_analyze_band_epoch, tasks)
+    else:
+        results = [_analyze_band_epoch(task) for task in tasks]
+
+    if stage_records is not None:
+        stage_records.extend(local)
+        for _, task_stages in results:
+            stage_records.extend(task_stages)
+
+    return pd.DataFrame([record for record, _ in results])
 
 
 # ---------------- DATASET-LEVEL PIPELINE ----------------
@@ -70,7 +242,15 @@ def run_band_specific_network_analysis(
     input_root: Path,
     output_csv: Path,
     significant_channels: list,
-    fs: int = 250
+    fs: int = 250,
+    band_filtering: str = "epoch",
+    n_workers: int = 1,
+    epoch_csv: Path = None,
+    epoch_dataset: Path = None,
+    instrument: bool = False,
+    vg_options: dict = None,
+    cache_dir: Path = None,
+    cache_max_bytes: int = None
 ):
     """
     Frequency-specific hub analysis for significant channels only.
@@ -78,56 +258,189 @@ def run_band_specific_network_analysis(
     Parameters
     ----------
     input_root : Path
-        Epoch-level EEG directory:
-        subject_X/channel_Y/epoch_Z.csv
+        Epoch store of one group (see preprocessing.epoch_store)
 
     significant_channels : list
-        List of channel folder names (e.g. ["channel_31", "channel_124"])
+        List of channel names (e.g. ["channel_31", "channel_124"])
+
+    band_filtering : str
+        "epoch" filters every epoch separately for each band;
+        "continuous" filters each channel's continuous signal once per
+        band and slices the band-limited epochs from it
+        (see decompose_bands)
+
+    n_workers : int
+        Processes shared by all (epoch, band) tasks
+
+    epoch_csv : Path, optional
+        Also write the full epoch-level table (all metrics per
+        subject, channel, epoch and band)
+
+    epoch_dataset : Path, optional
+        Also write the epoch-level table as a Parquet dataset
+        partitioned by subject, one file per channel (categorical
+        labels, float32 metrics; needs pyarrow)
+
+    Both tables are appended channel by channel as results come in,
+    and the summary is built from running (channel, band) sums, so
+    memory does not grow with the number of subjects.
+
+    The run is incremental: the epoch-level table of every subject
+    channel is kept under <output_csv stem>_shards/, and its manifest
+    records the content hash of every epoch behind it and the analysis
+    parameters. Channels whose epochs and parameters are unchanged are
+    read back instead of recomputed. The hub thresholds are recorded
+    too; when they change every channel is redone.
+
+    instrument : bool
+        Record wall time and memory of every stage (band filtering,
+        VG, Louvain, participation, eigenvector, roles, ...) and write
+        them with a per-stage summary next to output_csv (see
+        networks.instrumentation)
+
+    vg_options : dict, optional
+        Visibility graph family member and its options, e.g.
+        {"graph": "lphvg", "penetrable_distance": 1}
+        (default: natural VG)
+
+    cache_dir : Path, optional
+        Result cache of the band-limited networks (see
+        networks.result_cache, bounded by cache_max_bytes), so that
+        redoing a channel after a hub threshold change only
+        reclassifies its nodes
 
     Returns
     -------
     CSV with average R5, R6, R7 hubs per band and channel.
     """
 
-    results = []
+    if band_filtering not in ("epoch", "continuous"):
+        raise ValueError(f"Unknown band_filtering mode {band_filtering!r}")
+
+    shard_root = output_csv.with_name(f"{output_csv.stem}_shards")
+    manifest_file = shard_root / MANIFEST_NAME
+    manifest = load_manifest(
+        manifest_file,
+        {
+            "fs": fs,
+            "band_filtering": band_filtering,
+            "bands": FREQUENCY_BANDS,
+            "vg_options": vg_options or {}
+        }
+    )
+    rescore = track_params(manifest, "roles", role_thresholds())
+    subject_ids = list_subjects(input_root)
+    for subject_id in prune_subjects(manifest, input_root, subject_ids):
+        shutil.rmtree(shard_root / subject_id, ignore_errors=True)
+    manifest["units"] = {
+        key: digests for key, digests in manifest["units"].items()
+        if key.split("/")[0] in subject_ids
+    }
+
+    pool = mp.Pool(
+        processes=n_workers,
+        initializer=enable_instrumentation,
+        initargs=(instrument,)
+    ) if n_workers > 1 else None
+    hub_columns = ["R5_count", "R6_count", "R7_count"]
+    # Running (channel, band) hub sums and epoch counts
+    totals = None
+    stage_records = []
+    epoch_columns = None
 
-    for subject_dir in sorted(input_root.iterdir()):
-        if not subject_dir.is_dir():
-            continue
+    enable_instrumentation(instrument)
+    try:
+        for subject_id, epochs, channels in iter_subject_epochs(input_root):
+            digests = subject_digests(manifest, input_root, subject_id)
 
-        for channel in significant_channels:
-            channel_dir = subject_dir / channel
-            if not channel_dir.exists():
-                continue
+            for channel in significant_channels:
+                if channel not in channels:
+                    continue
 
-            for epoch_file in channel_dir.glob("epoch_*.csv"):
-                signal = pd.read_csv(
-                    epoch_file, header=None
-                ).iloc[:, 0].values
+                key = f"{subject_id}/{channel}"
+                shard = shard_root / subject_id / f"{channel}.csv"
+                recorded = manifest["units"].get(key)
+                if recorded is None and not manifest.get("invalidated"):
+                    # Shard finished by an interrupted run
+                    recorded = digests[channel]
 
-                for band_name, band_range in FREQUENCY_BANDS.items():
-                    roles = analyze_frequency_band(
-                        signal, fs, band_range
+                channel_stages = []
+                computed = (
+                    rescore or not shard.exists() or recorded != digests[channel]
+                )
+                if computed:
+                    df = analyze_channel_bands(
+                        epochs[channels.index(channel)],
+                        fs,
+                        band_filtering=band_filtering,
+                        executor=pool,
+                        stage_records=channel_stages,
+                        vg_options=vg_options,
+                        cache_dir=cache_dir,
+                        cache_max_bytes=cache_max_bytes
                     )
+                    df.insert(0, "subject", subject_id)
+                    df.insert(1, "channel", channel)
 
-                    results.append({
-                        "subject": subject_dir.name,
-                        "channel": channel,
-                        "epoch": epoch_file.stem,
-                        "band": band_name,
-                        "R5": roles.count("R5"),
-                        "R6": roles.count("R6"),
-                        "R7": roles.count("R7")
-                    })
+                    shard.parent.mkdir(parents=True, exist_ok=True)
+                    tmp = shard.with_suffix(".csv.tmp")
+                    df.to_csv(tmp, index=False)
+                    os.replace(tmp, shard)
+                else:
+                    df = pd.read_csv(shard)
+                manifest["units"][key] = digests[channel]
 
-    df = pd.DataFrame(results)
+                if epoch_csv is not None:
+                    df.to_csv(
+                        epoch_csv,
+                        mode="w" if epoch_columns is None else "a",
+                        header=epoch_columns is None,
+                        index=False
+                    )
+                partition = {"subject": subject_id}
+                if epoch_dataset is not None and (
+                    computed
+                    or not partition_path(epoch_dataset, partition, channel).exists()
+                ):
+                    write_record_batch(
+                        epoch_dataset,
+                        partition,
+                        channel,
+                        df,
+                        list(df.columns)
+                    )
+                epoch_columns = list(df.columns)
+
+                grouped = df.groupby(["channel", "band"])[hub_columns]
+                partial = grouped.sum()
+                partial["n"] = grouped.size()
+                totals = partial if totals is None else totals.add(
+                    partial, fill_value=0
+                )
+
+                stage_records.extend(
+                    {"subject": subject_id, "channel": channel, **r}
+                    for r in channel_stages
+                )
+    finally:
+        enable_instrumentation(False)
+        if pool is not None:
+            pool.terminate()
+
+    save_manifest(manifest_file, manifest)
+
+    if totals is None:
+        raise ValueError("No significant channels found in input_root")
 
     # Average across epochs and subjects (as in paper)
     summary = (
-        df.groupby(["channel", "band"])
-        [["R5", "R6", "R7"]]
-        .mean()
+        totals.sort_index()[hub_columns]
+        .div(totals["n"], axis=0)
+        .rename(columns={"R5_count": "R5", "R6_count": "R6", "R7_count": "R7"})
         .reset_index()
     )
 
-    summary.to_csv(output_csv, index=False)
\ No newline at end of file
+    summary.to_csv(output_csv, index=False)
+
+    if instrument:
+        write_instrumentation(stage_records, output_csv)
@@ -4,6 +4,8 @@ from pathlib import Path
 from scipy.signal import welch
 import matplotlib.pyplot as plt
 
+from preprocessing.preprocessing_pipeline import read_subject_recordings
+
 
 def compute_psd(
     signal: np.ndarray,
@@ -13,57 +15,224 @@ def compute_psd(
 ):
     """
     Compute Power Spectral Density (PSD) using Welch's method.
+
+    signal may be 1D or a (channels, samples) array; Welch runs along
+    the last axis, so all channels are estimated in one call and psd
+    has shape (channels, freqs).
     """
     freqs, psd = welch(
         signal,
         fs=fs,
         nperseg=nperseg,
         noverlap=noverlap,
-        scaling="density"
+        scaling="density",
+        axis=-1
     )
     psd_db = 10 * np.log10(psd + 1e-12)
     return freqs, psd, psd_db
 
 
+def compute_channel_psds(
+    recordings: list,
+    fs: int = 250,
+    nperseg: int = 1024,
+    noverlap: int = 512
+):
+    """
+    PSD of channels that may differ in length.
+
+    Each channel keeps its full recording; channels of equal length
+    (usually all of them) share one batched Welch call.
+
+    Returns
+    -------
+    freqs, psd, psd_db
+        psd and psd_db are (channels, freqs), rows aligned with
+        recordings
+    """
+    psd = psd_db = None
+    for length in sorted({len(r) for r in recordings}):
+        rows = [i for i, r in enumerate(recordings) if len(r) == length]
+        freqs, rows_psd, rows_db = compute_psd(
+            np.stack([recordings[i] for i in rows]), fs, nperseg, noverlap
+        )
+        if psd is None:
+            psd = np.empty((len(recordings), len(freqs)))
+            psd_db = np.empty_like(psd)
+        psd[rows] = rows_psd
+        psd_db[rows] = rows_db
+
+    return freqs, psd, psd_db
+
+
+# ---------------- STREAMING GROUP AVERAGES ----------------
+def init_psd_accumulator(freqs: np.ndarray, channels=None) -> dict:
+    """
+    Empty running accumulator for group-averaged PSD curves.
+
+    Parameters
+    ----------
+    freqs : np.ndarray
+        Frequency axis shared by all PSDs that will be added
+    channels : list, optional
+        Channel names to average over (default: every channel seen)
+    """
+    return {
+        "freqs": np.asarray(freqs),
+        "channels": None if channels is None else list(channels),
+        "channel_sum": {},
+        "channel_count": {},
+        # One channel-averaged curve per subject (needed for percentiles)
+        "subject_curves": []
+    }
+
+
+def update_psd_accumulator(
+    acc: dict,
+    psd: np.ndarray,
+    channels: list
+):
+    """
+    Add the (channels, freqs) PSD of one subject to the accumulator.
+
+    Per-channel sums are kept for channel means; the subject's
+    channel-averaged curve is stored for group means and percentiles.
+    Subjects without any selected channel are ignored.
+    """
+    psd = np.atleast_2d(psd)
+    if psd.shape[-1] != len(acc["freqs"]):
+        raise ValueError("PSD does not match the accumulator frequency axis")
+
+    selected = channels if acc["channels"] is None else acc["channels"]
+    rows = [channels.index(ch) for ch in selected if ch in channels]
+    if not rows:
+        return acc
+
+    for row in rows:
+        ch = channels[row]
+        acc["channel_sum"][ch] = acc["channel_sum"].get(ch, 0) + psd[row]
+        acc["channel_count"][ch] = acc["channel_count"].get(ch, 0) + 1
+
+    acc["subject_curves"].append(psd[rows].mean(axis=0))
+    return acc
+
+
+def summarize_psd_accumulator(
+    acc: dict,
+    percentiles=(25, 75),
+    fs_range=None
+) -> dict:
+    """
+    Group mean and percentile PSD curves across subjects.
+
+    Returns
+    -------
+    dict
+        freqs, mean, lower, upper (percentile curves), n_subjects and
+        channel_mean (channel -> mean PSD over subjects), restricted
+        to fs_range if given
+    """
+    freqs = acc["freqs"]
+    mask = np.ones(len(freqs), dtype=bool)
+    if fs_range is not None:
+        mask = (freqs >= fs_range[0]) & (freqs <= fs_range[1])
+
+    if not acc["subject_curves"]:
+        raise ValueError("No PSDs have been added to the accumulator")
+
+    curves = np.stack(acc["subject_curves"])[:, mask]
+    lower, upper = np.percentile(curves, percentiles, axis=0)
+
+    return {
+        "freqs": freqs[mask],
+        "mean": curves.mean(axis=0),
+        "lower": lower,
+        "upper": upper,
+        "n_subjects": len(curves),
+        "channel_mean": {
+            ch: total[mask] / acc["channel_count"][ch]
+            for ch, total in acc["channel_sum"].items()
+        }
+    }
+
+
+# ---------------- DATASET-LEVEL PIPELINE ----------------
+def plot_psd_summary(psd_for_plot: list, output_file: Path):
+    """
+    Overlay the channel PSDs (dB) of one subject.
+    """
+    plt.figure(figsize=(8, 6))
+    for channel_id, freqs, psd_db in psd_for_plot:
+        plt.plot(freqs, psd_db, linewidth=0.8, alpha=0.6)
+
+    plt.xlabel("Frequency (Hz)")
+    plt.ylabel("Power (dB)")
+    plt.title(output_file.stem)
+    plt.grid(alpha=0.3)
+    plt.tight_layout()
+    plt.savefig(output_file, dpi=150)
+    plt.close()
+
+
 def run_psd_analysis(
     input_root: Path,
     output_root: Path,
-    fs: int = 250
-):
+    fs: int = 250,
+    selected_channels: list = None
+) -> dict:
     """
     Compute PSD for all subjects and channels.
+
+    Every channel is estimated over its full recording, and channels
+    of equal length share one Welch call (see compute_channel_psds). Each
+    subject is added to a running accumulator while it is processed,
+    so the group average needs no second pass over the PSD CSVs.
+
+    Returns
+    -------
+    dict
+        PSD accumulator of the group (see summarize_psd_accumulator),
+        averaged over selected_channels (default: all channels)
     """
     output_root.mkdir(parents=True, exist_ok=True)
+    acc = None
 
     for subject_dir in sorted(input_root.iterdir()):
         if not subject_dir.is_dir():
             continue
 
+        recordings, channels = read_subject_recordings(subject_dir)
+        if not channels:
+            continue
+
         subject_out = output_root / subject_dir.name
         subject_out.mkdir(exist_ok=True)
 
-        psd_for_plot = []
+        freqs, psd, psd_db = compute_channel_psds(recordings, fs)
 
-        for channel_file in sorted(subject_dir.glob("channel_*.csv")):
-            channel_id = channel_file.stem.split("_")[1]
-            signal = pd.read_csv(channel_file, header=None).iloc[:, 0].values
+        if acc is None:
+            acc = init_psd_accumulator(freqs, selected_channels)
+        update_psd_accumulator(acc, psd, channels)
 
-            freqs, psd, psd_db = compute_psd(signal, fs)
+        psd_for_plot = []
+
+        for row, channel in enumerate(channels):
+            channel_id = channel.split("_")[1]
 
             pd.DataFrame({
                 "frequency": freqs,
-                "psd": psd,
-                "psd_db": psd_db
+                "psd": psd[row],
+                "psd_db": psd_db[row]
             }).to_csv(
                 subject_out / f"channel_{channel_id}_psd.csv",
                 index=False
             )
 
-            psd_for_plot.append((channel_id, freqs, psd_db))
+            psd_for_plot.append((channel_id, freqs, psd_db[row]))
 
         plot_psd_summary(
             psd_for_plot,
             subject_out / f"{subject_dir.name}_psd.png"
         )
 
-
+    return acc
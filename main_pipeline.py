@@ -1,19 +1,101 @@
+import os
+import shutil
 import pandas as pd
 import numpy as np
+import multiprocessing as mp
+from collections import defaultdict
 from pathlib import Path
 
-from networks.visibility_graph import compute_visibility_graph
-from networks.network_metrics import compute_network_metrics
-from networks.hub_classification import (
-    within_module_degree_zscore,
-    classify_node_roles
+from networks.epoch_analysis import (
+    compute_epoch_network,
+    summarize_epoch_network
+)
+from networks.hub_classification import role_thresholds
+from networks.node_store import (
+    create_node_store,
+    node_metric_matrix,
+    write_node_metrics
+)
+from networks.results_writer import (
+    partition_path,
+    write_record_batch,
+    read_record_batch
+)
+from networks.instrumentation import (
+    stage,
+    epoch_scope,
+    enable_instrumentation,
+    drain_records,
+    write_instrumentation
+)
+from preprocessing.epoch_store import (
+    list_subjects,
+    open_subject_epochs,
+    cached_subject_epochs,
+    epoch_name
+)
+from preprocessing.manifest import (
+    MANIFEST_NAME,
+    load_manifest,
+    save_manifest,
+    subject_digests,
+    changed_epochs,
+    prune_subjects,
+    track_params
 )
 
 # ---------------- CONFIG ----------------
-DATA_ROOT = Path("data")   # data/mdd/, data/normal/
+DATA_ROOT = Path("data")   # data/mdd/, data/normal/ (epoch stores)
 OUTPUT_FILE = Path("results/network_metrics_results.csv")
 OUTPUT_FILE.parent.mkdir(exist_ok=True)
 
+# One checkpoint CSV per group/subject/channel; reruns skip existing shards
+SHARD_DIR = OUTPUT_FILE.parent / "network_metrics_shards"
+
+# "csv": shards are merged into OUTPUT_FILE.
+# "parquet": each shard is written straight into a Parquet dataset
+# partitioned by group/subject (RESULTS_DATASET); needs pyarrow.
+RESULTS_FORMAT = "csv"
+RESULTS_DATASET = OUTPUT_FILE.parent / "network_metrics_results"
+
+N_WORKERS = max(1, mp.cpu_count() - 2)
+
+METRICS_BACKEND = "sparse"   # or "networkx"
+
+# Visibility graph per epoch (networks.visibility_graph.VG_BUILDERS):
+# "nvg", "hvg", "lpvg" or "lphvg", the latter two with
+# "penetrable_distance"
+VG_OPTIONS = {"graph": "nvg"}
+
+# Louvain settings (see networks.community_detection)
+COMMUNITY_METHOD = "louvain"
+COMMUNITY_SEED = 0
+COMMUNITY_RESOLUTION = 1.0
+
+# Settings the epoch stores in DATA_ROOT were preprocessed with
+# (preprocessing.preprocessing_pipeline); part of the cache key
+PREPROCESSING_PARAMS = {
+    "fs": 250,
+    "notch_freq": 50.0,
+    "lowcut": 1.0,
+    "highcut": 30.0,
+    "epoch_duration": 10
+}
+
+# Content-addressed cache of per-epoch VGs, partitions and node metrics
+# (None disables); LRU entries are evicted beyond CACHE_MAX_BYTES
+CACHE_DIR = OUTPUT_FILE.parent / "epoch_cache"
+CACHE_MAX_BYTES = 20 * 2**30
+
+# Optional node-level export: per group, a float32 memory-mapped array
+# [subject, channel, epoch, node, metric] (see networks.node_store);
+# None disables it
+NODE_STORE_DIR = None   # e.g. OUTPUT_FILE.parent / "node_metrics"
+
+# Record per-stage wall time / memory for every epoch and write
+# <results>_stage_timings.csv and <results>_stage_summary.csv
+INSTRUMENT = False
+
 GROUPS = ["mdd", "normal"]
 
 SIGNIFICANT_CHANNELS = [
@@ -21,80 +103,385 @@ SIGNIFICANT_CHANNELS = [
     "channel_20", "channel_67", "channel_70", "channel_89"
 ]
 
+RESULT_COLUMNS = [
+    "group", "subject", "channel", "epoch",
+    "avg_degree", "avg_clustering", "modularity",
+    "avg_participation", "avg_eigenvector",
+    "R1_count", "R2_count", "R3_count", "R4_count",
+    "R5_count", "R6_count", "R7_count",
+    "hub_percent", "nonhub_percent", "hub_nonhub_ratio"
+]
+
 
-# ---------------- MAIN PIPELINE ----------------
-def run_network_pipeline():
+# ---------------- WORK UNITS ----------------
+def process_work_unit(unit: tuple):
     """
-    Run epoch-level EEG network analysis.
+    Atomic processing unit: one (group, subject, channel, epoch).
 
-    Each EEG epoch is independently processed to construct a visibility
-    graph, compute network metrics, and classify hub roles.
+    Returns (unit, record, stage_records); record is None for epochs
+    too short to analyse, stage_records holds the instrumentation
+    records of the unit (empty unless instrumentation is enabled).
+    """
+    group_dir, group, subject_id, channel, epoch_idx = unit
+
+    with epoch_scope(group=group.upper(), subject=subject_id,
+                     channel=channel, epoch=epoch_name(epoch_idx)):
+        with stage("load_epoch"):
+            epochs, channels = cached_subject_epochs(group_dir, subject_id)
+            signal = np.array(epochs[channels.index(channel), epoch_idx])
+
+        if len(signal) < 10:
+            return unit, None, drain_records()
+
+        record = {
+            "group": group.upper(),
+            "subject": subject_id,
+            "channel": channel,
+            "epoch": epoch_name(epoch_idx)
+        }
+        network = compute_epoch_network(
+            signal, METRICS_BACKEND, CACHE_DIR, CACHE_MAX_BYTES,
+            cache_params=PREPROCESSING_PARAMS,
+            vg_options=VG_OPTIONS,
+            community_method=COMMUNITY_METHOD,
+            seed=COMMUNITY_SEED,
+            resolution=COMMUNITY_RESOLUTION
+        )
+        record.update(summarize_epoch_network(network))
+
+        if NODE_STORE_DIR is not None:
+            with stage("node_export"):
+                write_node_metrics(
+                    NODE_STORE_DIR, group, subject_id, channel, epoch_idx,
+                    node_metric_matrix(network)
+                )
+
+    return unit, record, drain_records()
+
+
+def shard_partition(group: str, subject_id: str) -> dict:
+    """
+    Parquet partition of a subject's shards.
+    """
+    return {"group": group.upper(), "subject": subject_id}
+
+
+def shard_path(group: str, subject_id: str, channel: str) -> Path:
+    """
+    Checkpoint file holding all epochs of one subject channel.
+    """
+    if RESULTS_FORMAT == "parquet":
+        return partition_path(
+            RESULTS_DATASET, shard_partition(group, subject_id), channel
+        )
+    return SHARD_DIR / group / subject_id / f"{channel}.csv"
+
+
+def shard_key(group: str, subject_id: str, channel: str) -> str:
+    """
+    Manifest key of a shard, e.g. "mdd/subject_1/channel_31".
+    """
+    return f"{group}/{subject_id}/{channel}"
+
+
+def read_shard(key: tuple) -> pd.DataFrame:
+    """
+    Rows of one checkpoint shard.
+    """
+    if RESULTS_FORMAT == "parquet":
+        return read_record_batch(shard_path(*key), shard_partition(*key[:2]))
+    return pd.read_csv(shard_path(*key))
+
+
+def write_shard(key: tuple, records: list):
+    """
+    Atomically write one checkpoint shard.
+    """
+    if RESULTS_FORMAT == "parquet":
+        write_record_batch(
+            RESULTS_DATASET,
+            shard_partition(*key[:2]),
+            key[2],
+            records,
+            RESULT_COLUMNS
+        )
+        return
+
+    path = shard_path(*key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".csv.tmp")
+    pd.DataFrame(records, columns=RESULT_COLUMNS).to_csv(tmp, index=False)
+    os.replace(tmp, path)
+
+
+def merge_shard(key: tuple, records: list, recomputed: set, num_epochs: int):
+    """
+    Replace the rows of the recomputed epochs in a shard (keeping the
+    others) and drop epochs beyond num_epochs.
+    """
+    kept = []
+    if shard_path(*key).exists():
+        for record in read_shard(key).to_dict("records"):
+            epoch_idx = int(record["epoch"].split("_")[1]) - 1
+            if epoch_idx not in recomputed and epoch_idx < num_epochs:
+                kept.append((epoch_idx, record))
+
+    merged = sorted(kept + records, key=lambda r: r[0])
+    write_shard(key, [r for _, r in merged])
+
+
+def plan_work_units(manifest: dict, rescore: bool = False):
+    """
+    All shards of the configured dataset and the epoch work units
+    that are new or changed since the manifest was written (all of
+    them with rescore, e.g. after the hub thresholds changed).
+
+    The manifest's unit hashes are updated to describe the shards as
+    they will be once all units have run.
+
+    Returns
+    -------
+    shards : list
+        (group, subject, channel) keys in output order
+    units : dict
+        Shard key -> (pending work units, number of epochs) for every
+        shard that must be (re)written
     """
-    results = []
+    shards = []
+    units = {}
 
     for group in GROUPS:
         group_dir = DATA_ROOT / group
         if not group_dir.exists():
             continue
 
-        for subject_dir in sorted(group_dir.iterdir()):
-            if not subject_dir.is_dir():
-                continue
+        subject_ids = list_subjects(group_dir)
+        for subject_id in prune_subjects(manifest, group_dir, subject_ids):
+            shutil.rmtree(
+                shard_path(group, subject_id, "_").parent, ignore_errors=True
+            )
+            manifest["units"] = {
+                k: v for k, v in manifest["units"].items()
+                if not k.startswith(f"{group}/{subject_id}/")
+            }
 
-            subject_id = subject_dir.name
+        for subject_id in subject_ids:
+            digests = subject_digests(manifest, group_dir, subject_id)
 
             for channel in SIGNIFICANT_CHANNELS:
-                channel_dir = subject_dir / channel
-                if not channel_dir.exists():
+                if channel not in digests:
                     continue
 
-                for epoch_file in sorted(channel_dir.glob("epoch_*.csv")):
-                    # 1️ Load single epoch
-                    signal = pd.read_csv(
-                        epoch_file, header=None
-                    ).iloc[:, 0].values
+                key = (group, subject_id, channel)
+                shards.append(key)
 
-                    if len(signal) < 10:
-                        continue
+                path = shard_path(*key)
+                recorded = manifest["units"].get(shard_key(*key))
+                if rescore or not path.exists():
+                    recorded = None
+                elif recorded is None and not manifest.get("invalidated"):
+                    # Shard finished by an interrupted run
+                    recorded = digests[channel]
 
-                    # 2️ Visibility Graph
-                    adj_matrix = compute_visibility_graph(signal)
+                pending = changed_epochs(recorded, digests[channel])
+                num_epochs = len(digests[channel])
+                manifest["units"][shard_key(*key)] = digests[channel]
 
-                    # 3️ Network metrics
-                    metrics = compute_network_metrics(adj_matrix)
-
-                    # 4️ Within-module z-score
-                    z = within_module_degree_zscore(
-                        adj_matrix,
-                        metrics["communities"]
+                if pending or recorded is None or len(recorded) != num_epochs:
+                    units[key] = (
+                        [
+                            (group_dir, group, subject_id, channel, epoch_idx)
+                            for epoch_idx in pending
+                        ],
+                        num_epochs
                     )
 
-                    # 5️ Hub classification
-                    roles = classify_node_roles(
-                        metrics["participation"],
-                        z
-                    )
+    return shards, units
+
+
+def checkpoint_results(results, units: dict, stage_records: list = None):
+    """
+    Consume (unit, record, stage_records) results and merge each shard
+    as soon as its last pending epoch arrives.
+
+    units maps shard key -> (pending work units, number of epochs);
+    instrumentation records are collected into stage_records if given.
+    """
+    outstanding = {key: len(key_units) for key, (key_units, _) in units.items()}
+    buffers = defaultdict(list)
+
+    def finish(key):
+        done = buffers.pop(key, [])
+        merge_shard(
+            key,
+            [(epoch_idx, r) for epoch_idx, r in done if r is not None],
+            {epoch_idx for epoch_idx, _ in done},
+            units[key][1]
+        )
+        del outstanding[key]
+
+    # Shards that only lose epochs are complete straight away
+    for key in [k for k, n in outstanding.items() if n == 0]:
+        finish(key)
+
+    for unit, record, unit_stages in results:
+        if stage_records is not None:
+            stage_records.extend(unit_stages)
+
+        key = unit[1:4]
+        buffers[key].append((unit[4], record))
+
+        outstanding[key] -= 1
+        if outstanding[key] == 0:
+            finish(key)
+
+
+def prepare_node_stores():
+    """
+    Allocate (or resize) the node-level store of every group, sized
+    for its subjects, SIGNIFICANT_CHANNELS and longest recording.
+    """
+    for group in GROUPS:
+        group_dir = DATA_ROOT / group
+        if not group_dir.exists():
+            continue
+
+        subject_ids = list_subjects(group_dir)
+        num_epochs = num_nodes = 0
+        for subject_id in subject_ids:
+            epochs, _ = open_subject_epochs(group_dir, subject_id)
+            num_epochs = max(num_epochs, epochs.shape[1])
+            num_nodes = max(num_nodes, epochs.shape[2])
+
+        create_node_store(
+            NODE_STORE_DIR, group, subject_ids, SIGNIFICANT_CHANNELS,
+            num_epochs, num_nodes
+        )
+
+
+def merge_results(shards: list, rewritten: set, manifest: dict):
+    """
+    Bring OUTPUT_FILE up to date with the shards.
+
+    Rows of shards that were only added are appended; the file is
+    rebuilt shard by shard when existing rows changed or disappeared,
+    or when the manifest does not say which shards it holds (e.g.
+    after a parameter change).
+    """
+    keys = [shard_key(*key) for key in shards]
+    previous = manifest.get("output", [])
+    stale = set(previous) - set(keys)
+    changed = {shard_key(*key) for key in rewritten} & set(previous)
+
+    if OUTPUT_FILE.exists() and previous and not stale and not changed:
+        added = [key for key in shards if shard_key(*key) not in set(previous)]
+        manifest["output"] = previous + [shard_key(*key) for key in added]
+    else:
+        added = shards
+        manifest["output"] = keys
+        pd.DataFrame(columns=RESULT_COLUMNS).to_csv(OUTPUT_FILE, index=False)
+
+    for key in added:
+        read_shard(key).to_csv(
+            OUTPUT_FILE, mode="a", header=False, index=False
+        )
+
+
+def prune_dataset(shards: list):
+    """
+    Delete Parquet shards that are no longer part of the results
+    (subjects or channels that were dropped).
+    """
+    current = {shard_path(*key) for key in shards}
+    for path in RESULTS_DATASET.glob("*/*/*.parquet"):
+        if path not in current:
+            path.unlink()
+
+
+# ---------------- MAIN PIPELINE ----------------
+def run_network_pipeline(n_workers: int = N_WORKERS, instrument: bool = INSTRUMENT):
+    """
+    Run epoch-level EEG network analysis.
+
+    Each EEG epoch is independently processed to construct a visibility
+    graph, compute network metrics, and classify hub roles.
+
+    Epochs are distributed over n_workers processes (n_workers=1 runs
+    serially). Results are checkpointed per subject channel under
+    SHARD_DIR as soon as all its epochs finish, so an interrupted run
+    resumes where it stopped.
+
+    Processing is incremental: SHARD_DIR/manifest.json records the
+    content hash of every epoch behind each shard, so only new or
+    changed subjects, channels and epochs are computed and merged into
+    their shards and into OUTPUT_FILE. It also records the hub
+    thresholds; when they change every epoch is redone, which with
+    CACHE_DIR only reclassifies the cached node metrics.
+
+    With RESULTS_FORMAT = "parquet" the shards are the result: each is
+    written as it completes into the partitioned RESULTS_DATASET
+    (categorical labels, float32 metrics) instead of being merged into
+    a CSV, so nothing is held in memory beyond the shards in flight.
+
+    With NODE_STORE_DIR set, the node-level degree, clustering,
+    participation, eigenvector centrality, z-score and role of every
+    epoch are also written to memory-mapped per-group arrays.
+
+    With instrument=True, wall time and memory of every stage (epoch
+    load, VG, Louvain, participation, eigenvector, roles, ...) of
+    every computed epoch are written next to OUTPUT_FILE, together
+    with a per-stage summary (see networks.instrumentation).
+    """
+    manifest_file = SHARD_DIR / MANIFEST_NAME
+    manifest = load_manifest(
+        manifest_file,
+        {
+            "metrics_backend": METRICS_BACKEND,
+            "vg_options": VG_OPTIONS,
+            "community": [
+                COMMUNITY_METHOD, COMMUNITY_SEED, COMMUNITY_RESOLUTION
+            ],
+            "columns": RESULT_COLUMNS,
+            "format": RESULTS_FORMAT,
+            "node_metrics": NODE_STORE_DIR is not None
+        }
+    )
+    rescore = track_params(manifest, "roles", role_thresholds())
+    if NODE_STORE_DIR is not None:
+        prepare_node_stores()
+
+    shards, units = plan_work_units(manifest, rescore)
+    all_units = [unit for key_units, _ in units.values() for unit in key_units]
+    stage_records = [] if instrument else None
+
+    if n_workers > 1 and all_units:
+        with mp.Pool(
+            processes=n_workers,
+            initializer=enable_instrumentation,
+            initargs=(instrument,)
+        ) as pool:
+            checkpoint_results(
+                pool.imap_unordered(process_work_unit, all_units),
+                units,
+                stage_records
+            )
+    else:
+        enable_instrumentation(instrument)
+        try:
+            checkpoint_results(
+                map(process_work_unit, all_units), units, stage_records
+            )
+        finally:
+            enable_instrumentation(False)
+
+    if RESULTS_FORMAT == "parquet":
+        prune_dataset(shards)
+    else:
+        merge_results(shards, set(units), manifest)
+    save_manifest(manifest_file, manifest)
 
-                    # 6️ Store epoch-level results
-                    results.append({
-                        "group": group.upper(),
-                        "subject": subject_id,
-                        "channel": channel,
-                        "epoch": epoch_file.stem,
-
-                        "avg_degree": np.mean(metrics["degree"]),
-                        "avg_clustering": metrics["avg_clustering"],
-                        "modularity": metrics["modularity"],
-                        "avg_participation": np.mean(metrics["participation"]),
-                        "avg_eigenvector": np.mean(metrics["eigenvector_centrality"]),
-
-                        "R5_count": roles.count("R5"),
-                        "R6_count": roles.count("R6"),
-                        "R7_count": roles.count("R7")
-                    })
-
-    df = pd.DataFrame(results)
-    df.to_csv(OUTPUT_FILE, index=False)
+    if instrument:
+        write_instrumentation(stage_records, OUTPUT_FILE)
 
 
 if __name__ == "__main__":
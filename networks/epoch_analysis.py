@@ -0,0 +1,153 @@
+import numpy as np
+from pathlib import Path
+
+from networks.visibility_graph import compute_visibility_graph
+from networks.network_metrics import compute_network_metrics
+from networks.hub_classification import (
+    within_module_degree_zscore,
+    classify_node_role_codes,
+    role_summary
+)
+from networks.result_cache import cache_key, cache_get, cache_put
+from networks.instrumentation import stage
+
+
+def compute_epoch_network(
+    signal: np.ndarray,
+    metrics_backend: str = "sparse",
+    cache_dir: Path = None,
+    cache_max_bytes: int = None,
+    cache_params: dict = None,
+    vg_options: dict = None,
+    community_method="louvain",
+    seed: int = 0,
+    resolution: float = 1.0
+) -> dict:
+    """
+    Visibility graph, partition and node-level metrics of one epoch.
+
+    Everything that does not depend on hub thresholds or reporting
+    choices. vg_options are passed to compute_visibility_graph, e.g.
+    {"graph": "hvg"} or {"graph": "lpvg", "penetrable_distance": 2}
+    (default: natural VG); community_method, seed and resolution to
+    compute_network_metrics.
+
+    With cache_dir the result is looked up in (and added to) the
+    content-addressed cache (see networks.result_cache), keyed by the
+    signal, vg_options, metrics_backend, the community settings and
+    cache_params (e.g. preprocessing settings).
+
+    Returns
+    -------
+    dict
+        adj (CSR VG), communities, degree, clustering, participation,
+        eigenvector_centrality, z (within-module degree z-score),
+        avg_clustering, modularity
+    """
+    vg_options = dict(vg_options or {})
+    community_kwargs = {
+        "community_method": community_method,
+        "seed": seed,
+        "resolution": resolution
+    }
+
+    if cache_dir is not None:
+        key = cache_key(
+            signal,
+            graph=vg_options.get("graph", "nvg"),
+            metrics_backend=metrics_backend,
+            # Callables by name; their repr holds a memory address
+            community_method=getattr(
+                community_method, "__qualname__", community_method
+            ),
+            seed=seed,
+            resolution=resolution,
+            **{f"vg_{k}": v for k, v in vg_options.items() if k != "graph"},
+            **(cache_params or {})
+        )
+        with stage("cache_lookup"):
+            cached = cache_get(cache_dir, key)
+        if cached is not None:
+            return cached
+
+    # 1️ Visibility Graph
+    with stage("visibility_graph"):
+        adj_matrix = compute_visibility_graph(
+            signal, sparse_output=True, **vg_options
+        )
+
+    # 2️ Network metrics
+    with stage("network_metrics"):
+        metrics = compute_network_metrics(
+            adj_matrix, backend=metrics_backend, **community_kwargs
+        )
+
+    # 3️ Within-module z-score
+    with stage("zscore"):
+        z = within_module_degree_zscore(
+            adj_matrix,
+            metrics["communities"]
+        )
+
+    network = {
+        "adj": adj_matrix,
+        "communities": np.asarray(metrics["communities"]),
+        "degree": np.asarray(metrics["degree"]),
+        "clustering": np.asarray(metrics["clustering"]),
+        "participation": metrics["participation"],
+        "eigenvector_centrality": metrics["eigenvector_centrality"],
+        "z": z,
+        "avg_clustering": metrics["avg_clustering"],
+        "modularity": metrics["modularity"]
+    }
+
+    if cache_dir is not None:
+        with stage("cache_store"):
+            cache_put(cache_dir, key, network, cache_max_bytes)
+
+    return network
+
+
+def summarize_epoch_network(network: dict) -> dict:
+    """
+    Epoch-level summary columns of the results tables, including the
+    R1–R7 role counts and hub proportions.
+    """
+    # 4️ Hub classification
+    with stage("roles"):
+        role_codes = classify_node_role_codes(
+            network["participation"],
+            network["z"]
+        )
+        roles = role_summary(role_codes)
+
+    summary = {
+        "avg_degree": np.mean(network["degree"]),
+        "avg_clustering": network["avg_clustering"],
+        "modularity": network["modularity"],
+        "avg_participation": np.mean(network["participation"]),
+        "avg_eigenvector": np.mean(network["eigenvector_centrality"])
+    }
+    summary.update(roles)
+    return summary
+
+
+def analyze_epoch(
+    signal: np.ndarray,
+    metrics_backend: str = "sparse",
+    cache_dir: Path = None,
+    cache_max_bytes: int = None,
+    vg_options: dict = None
+) -> dict:
+    """
+    Visibility graph, network metrics and hub roles for one epoch.
+
+    Returns the epoch-level summary columns of the results tables.
+    With cache_dir, the VG, partition and node metrics are reused
+    from earlier runs, so only the hub classification is redone.
+    """
+    network = compute_epoch_network(
+        signal, metrics_backend, cache_dir, cache_max_bytes,
+        vg_options=vg_options
+    )
+    return summarize_epoch_network(network)
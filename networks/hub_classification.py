@@ -1,42 +1,101 @@
 import numpy as np
-from collections import defaultdict
+
+from networks.network_metrics import (
+    community_labels,
+    module_degree_matrix,
+    stack_graphs
+)
+
+
+def _zscore_from_labels(adj_matrix, labels: np.ndarray) -> np.ndarray:
+    N = len(labels)
+    if N == 0:
+        return np.zeros(0)
+
+    # Degree of each node restricted to its own module
+    K = module_degree_matrix(adj_matrix, labels)
+    k_in = np.asarray(K[np.arange(N), labels]).ravel()
+
+    counts = np.bincount(labels)
+    mean_k = np.bincount(labels, weights=k_in) / counts
+    dev = k_in - mean_k[labels]
+    std_k = np.sqrt(np.bincount(labels, weights=dev ** 2) / counts)
+
+    z = np.zeros(N)
+    spread = std_k[labels] > 0
+    z[spread] = dev[spread] / std_k[labels][spread]
+    return z
 
 
 def within_module_degree_zscore(
-    adj_matrix: np.ndarray,
-    communities: dict
+    adj_matrix,
+    communities
 ) -> np.ndarray:
     """
     Compute within-module degree z-score z_i
+
+    adj_matrix may be a dense array or a scipy.sparse matrix;
+    communities a node -> module dict or label array.
     """
-    N = adj_matrix.shape[0]
-    z = np.zeros(N)
+    labels = community_labels(communities, adj_matrix.shape[0])
+    return _zscore_from_labels(adj_matrix, labels)
 
-    # Group nodes by module
-    module_nodes = defaultdict(list)
-    for node, mod in communities.items():
-        module_nodes[mod].append(node)
 
-    for mod, nodes in module_nodes.items():
-        k_s = []
+def within_module_degree_zscore_batch(
+    adj_matrices: list,
+    communities_list: list
+) -> list:
+    """
+    Within-module degree z-scores for a batch of graphs in one product.
+    """
+    if not adj_matrices:
+        return []
 
-        for i in nodes:
-            ki_s = sum(
-                adj_matrix[i, j]
-                for j in nodes
-            )
-            k_s.append(ki_s)
+    adj, labels, splits = stack_graphs(adj_matrices, communities_list)
+    return np.split(_zscore_from_labels(adj, labels), splits)
 
-        mean_k = np.mean(k_s)
-        std_k = np.std(k_s)
 
-        for idx, i in enumerate(nodes):
-            if std_k > 0:
-                z[i] = (k_s[idx] - mean_k) / std_k
-            else:
-                z[i] = 0
+# ---------------- NODE ROLES ----------------
+# Guimerà & Amaral roles, coded 1..7 (R1..R7)
+ROLE_NAMES = ("R1", "R2", "R3", "R4", "R5", "R6", "R7")
 
-    return z
+HUB_Z = 2.5
+# Participation boundaries: R1 | R2 | R3 | R4 for non-hubs,
+# R5 | R6 | R7 for hubs
+NONHUB_P_EDGES = (0.05, 0.62, 0.8)
+HUB_P_EDGES = (0.3, 0.75)
+
+
+def role_thresholds() -> dict:
+    """
+    Current role boundaries, recorded by the pipelines so that stored
+    role columns are redone when they change.
+    """
+    return {
+        "hub_z": HUB_Z,
+        "nonhub_p_edges": list(NONHUB_P_EDGES),
+        "hub_p_edges": list(HUB_P_EDGES)
+    }
+
+
+def classify_node_role_codes(
+    participation: np.ndarray,
+    z: np.ndarray
+) -> np.ndarray:
+    """
+    Vectorized R1–R7 classification as integer codes 1..7.
+
+    Works elementwise, so participation and z may be one epoch or a
+    (epochs, nodes) batch.
+    """
+    P = np.asarray(participation, dtype=float)
+    z = np.asarray(z, dtype=float)
+
+    return np.where(
+        z < HUB_Z,
+        1 + np.digitize(P, NONHUB_P_EDGES),   # Non-hubs
+        5 + np.digitize(P, HUB_P_EDGES)       # Hubs
+    )
 
 
 def classify_node_roles(
@@ -46,24 +105,59 @@ def classify_node_roles(
     """
     Classify nodes into R1–R7 roles (Guimerà & Amaral).
     """
-    roles = []
-
-    for Pi, zi in zip(participation, z):
-        if zi < 2.5:  # Non-hubs
-            if Pi < 0.05:
-                roles.append("R1")  # Ultra-peripheral non-hub
-            elif Pi < 0.62:
-                roles.append("R2")  # Peripheral non-hub
-            elif Pi < 0.8:
-                roles.append("R3")  # Connector non-hub
-            else:
-                roles.append("R4")  # Kinless non-hub
-        else:  # Hubs
-            if Pi < 0.3:
-                roles.append("R5")  # Provincial hub
-            elif Pi < 0.75:
-                roles.append("R6")  # Connector hub
-            else:
-                roles.append("R7")  # Kinless hub
-
-    return roles
+    codes = classify_node_role_codes(participation, z)
+    return [ROLE_NAMES[c - 1] for c in codes.tolist()]
+
+
+def role_summary_batch(role_codes: list) -> dict:
+    """
+    Role counts and hub proportions for a batch of epochs at once.
+
+    Parameters
+    ----------
+    role_codes : list or np.ndarray
+        Code arrays (see classify_node_role_codes), one per epoch;
+        epochs may differ in size
+
+    Returns
+    -------
+    dict
+        R1_count..R7_count, hub_percent, nonhub_percent and
+        hub_nonhub_ratio (NaN without non-hubs), one value per epoch
+    """
+    sizes = np.array([len(codes) for codes in role_codes], dtype=int)
+    n = len(sizes)
+    flat = np.concatenate([np.asarray(c, dtype=int) for c in role_codes]) \
+        if n else np.zeros(0, dtype=int)
+    epoch_ids = np.repeat(np.arange(n), sizes)
+
+    # (epochs, 8) counts; column 0 is unused
+    counts = np.bincount(
+        epoch_ids * 8 + flat, minlength=n * 8
+    ).reshape(n, 8)[:, 1:]
+
+    hubs = counts[:, 4:].sum(axis=1)
+    nonhubs = counts[:, :4].sum(axis=1)
+    total = np.maximum(sizes, 1)
+
+    summary = {
+        f"{name}_count": counts[:, i] for i, name in enumerate(ROLE_NAMES)
+    }
+    summary["hub_percent"] = 100 * hubs / total
+    summary["nonhub_percent"] = 100 * nonhubs / total
+    summary["hub_nonhub_ratio"] = np.divide(
+        hubs, nonhubs,
+        out=np.full(n, np.nan), where=nonhubs > 0
+    )
+    return summary
+
+
+def role_summary(role_codes: np.ndarray) -> dict:
+    """
+    All seven role counts, hub/non-hub percentages and the hub/non-hub
+    ratio of one epoch.
+    """
+    return {
+        name: value[0].item()
+        for name, value in role_summary_batch([role_codes]).items()
+    }
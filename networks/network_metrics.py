@@ -1,21 +1,31 @@
 import numpy as np
 import networkx as nx
+from scipy import sparse
+from scipy.sparse.linalg import eigsh
 from community import community_louvain
 
+from networks.community_detection import detect_communities
+from networks.instrumentation import stage
 
-def build_graph(adj_matrix: np.ndarray) -> nx.Graph:
+METRIC_BACKENDS = ("networkx", "sparse")
+
+
+def build_graph(adj_matrix) -> nx.Graph:
     """
-    Build an undirected NetworkX graph from adjacency matrix.
+    Build an undirected NetworkX graph from a dense or sparse
+    adjacency matrix.
     """
+    if sparse.issparse(adj_matrix):
+        return nx.from_scipy_sparse_array(adj_matrix)
     return nx.from_numpy_array(adj_matrix)
 
 
 # ---------------- DEGREE ----------------
-def degree(adj_matrix: np.ndarray) -> np.ndarray:
+def degree(adj_matrix) -> np.ndarray:
     """
     Degree k_i = sum_j A_ij
     """
-    return np.sum(adj_matrix, axis=1)
+    return np.asarray(adj_matrix.sum(axis=1)).ravel()
 
 
 # ---------------- CLUSTERING COEFFICIENT ----------------
@@ -33,53 +43,170 @@ def average_clustering(G: nx.Graph) -> float:
     return nx.average_clustering(G)
 
 
+def clustering_coefficient_sparse(
+    adj_matrix: sparse.csr_matrix,
+    k: np.ndarray = None
+) -> np.ndarray:
+    """
+    Node-wise clustering coefficient C_i from a CSR adjacency.
+
+    (A^2 ∘ A) summed over rows gives twice the triangles at each node,
+    so C_i = 2 t_i / (k_i (k_i - 1)) without any graph object.
+    """
+    if k is None:
+        k = degree(adj_matrix)
+
+    closed = np.asarray(
+        (adj_matrix @ adj_matrix).multiply(adj_matrix).sum(axis=1)
+    ).ravel()
+
+    C = np.zeros(len(k))
+    wedges = k * (k - 1)
+    has_wedges = closed > 0
+    C[has_wedges] = closed[has_wedges] / wedges[has_wedges]
+    return C
+
+
 # ---------------- COMMUNITY & MODULARITY ----------------
-def compute_communities(G: nx.Graph) -> dict:
+def compute_communities(
+    adj_matrix,
+    method="louvain",
+    seed: int = 0,
+    resolution: float = 1.0
+) -> np.ndarray:
     """
-    Louvain community detection.
-    Returns node -> community mapping.
+    Community detection (seeded CSR Louvain by default, see
+    networks.community_detection).
+    Returns an integer community label per node.
     """
-    return community_louvain.best_partition(G)
+    if isinstance(adj_matrix, nx.Graph):
+        adj_matrix = nx.to_scipy_sparse_array(adj_matrix)
+    return detect_communities(adj_matrix, method, seed, resolution)
 
 
-def modularity(G: nx.Graph, communities: dict) -> float:
+def modularity(G: nx.Graph, communities) -> float:
     """
     Modularity Q
     """
+    if not isinstance(communities, dict):
+        communities = dict(enumerate(np.asarray(communities).tolist()))
     return community_louvain.modularity(communities, G)
 
 
-# ---------------- PARTICIPATION COEFFICIENT ----------------
-def participation_coefficient(
-    G: nx.Graph,
-    communities: dict
-) -> np.ndarray:
+# ---------------- MODULE DEGREES ----------------
+def community_labels(communities, N: int) -> np.ndarray:
     """
-    Participation coefficient P_i
+    Integer module label (0..M-1) per node, from a node -> module
+    dict or an array of labels.
     """
-    degrees = dict(G.degree())
-    modules = set(communities.values())
-    P = np.zeros(len(G.nodes()))
+    if isinstance(communities, dict):
+        communities = [communities[i] for i in range(N)]
+    _, labels = np.unique(np.asarray(communities), return_inverse=True)
+    return labels.ravel()
 
-    for i in G.nodes():
-        ki = degrees[i]
-        if ki == 0:
-            P[i] = 0
-            continue
 
-        sum_frac = 0
-        for m in modules:
-            kis = sum(
-                1 for j in G.neighbors(i)
-                if communities[j] == m
-            )
-            sum_frac += (kis / ki) ** 2
+def module_degree_matrix(adj_matrix, labels: np.ndarray) -> sparse.csr_matrix:
+    """
+    Node x module degree matrix K_im = sum_{j in m} A_ij, as one
+    sparse product of the adjacency with the module indicator matrix.
+    """
+    N = adj_matrix.shape[0]
+    membership = sparse.csr_matrix(
+        (np.ones(N), (np.arange(N), labels)),
+        shape=(N, labels.max() + 1 if N else 0)
+    )
+    return (sparse.csr_matrix(adj_matrix) @ membership).tocsr()
 
-        P[i] = 1 - sum_frac
 
+def stack_graphs(adj_matrices: list, communities_list: list):
+    """
+    Combine a batch of graphs into one block-diagonal graph.
+
+    Module labels are offset per graph so no module is shared.
+
+    Returns
+    -------
+    adj : scipy.sparse.csr_matrix
+        Block-diagonal adjacency
+    labels : np.ndarray
+        Module label per node of the combined graph
+    splits : np.ndarray
+        Node offsets for np.split back into per-graph arrays
+    """
+    labels = []
+    offset = 0
+
+    for adj, communities in zip(adj_matrices, communities_list):
+        graph_labels = community_labels(communities, adj.shape[0])
+        labels.append(graph_labels + offset)
+        offset += graph_labels.max() + 1 if len(graph_labels) else 0
+
+    sizes = [adj.shape[0] for adj in adj_matrices]
+    adj = sparse.block_diag(
+        [sparse.csr_matrix(a) for a in adj_matrices], format="csr"
+    )
+    labels = np.concatenate(labels) if labels else np.zeros(0, dtype=int)
+    return adj, labels, np.cumsum(sizes)[:-1]
+
+
+def modularity_sparse(adj_matrix, labels: np.ndarray) -> float:
+    """
+    Modularity Q = sum_m [L_m / L - (d_m / 2L)^2] from a CSR
+    adjacency and integer module labels.
+    """
+    N = len(labels)
+    K = module_degree_matrix(adj_matrix, labels)
+    k = np.asarray(K.sum(axis=1)).ravel()
+    two_L = k.sum()
+    if two_L == 0:
+        return 0.0
+
+    k_in = np.asarray(K[np.arange(N), labels]).ravel()
+    internal = np.bincount(labels, weights=k_in)
+    d = np.bincount(labels, weights=k)
+    return float(np.sum(internal / two_L - (d / two_L) ** 2))
+
+
+# ---------------- PARTICIPATION COEFFICIENT ----------------
+def _participation_from_labels(adj_matrix, labels: np.ndarray) -> np.ndarray:
+    K = module_degree_matrix(adj_matrix, labels)
+    k = np.asarray(K.sum(axis=1)).ravel()
+    sum_sq = np.asarray(K.multiply(K).sum(axis=1)).ravel()
+
+    P = np.zeros(len(k))
+    nonzero = k > 0
+    P[nonzero] = 1 - sum_sq[nonzero] / k[nonzero] ** 2
     return P
 
 
+def participation_coefficient(adj_matrix, communities) -> np.ndarray:
+    """
+    Participation coefficient P_i = 1 - sum_m (k_im / k_i)^2
+
+    adj_matrix may be a dense array, a scipy.sparse matrix or a
+    NetworkX graph; communities a node -> module dict or label array.
+    """
+    if isinstance(adj_matrix, nx.Graph):
+        adj_matrix = nx.to_scipy_sparse_array(adj_matrix)
+
+    labels = community_labels(communities, adj_matrix.shape[0])
+    return _participation_from_labels(adj_matrix, labels)
+
+
+def participation_coefficient_batch(
+    adj_matrices: list,
+    communities_list: list
+) -> list:
+    """
+    Participation coefficients for a batch of graphs in one product.
+    """
+    if not adj_matrices:
+        return []
+
+    adj, labels, splits = stack_graphs(adj_matrices, communities_list)
+    return np.split(_participation_from_labels(adj, labels), splits)
+
+
 # ---------------- EIGENVECTOR CENTRALITY ----------------
 def eigenvector_centrality(G: nx.Graph) -> np.ndarray:
     """
@@ -89,20 +216,106 @@ def eigenvector_centrality(G: nx.Graph) -> np.ndarray:
     return np.array(list(ec.values()))
 
 
+def eigenvector_centrality_sparse(adj_matrix: sparse.csr_matrix) -> np.ndarray:
+    """
+    Eigenvector centrality v_i via scipy.sparse.linalg.eigsh,
+    normalised like nx.eigenvector_centrality_numpy (unit L2 norm,
+    positive sum). A fixed start vector keeps repeated runs (and
+    cached results) bit-identical.
+    """
+    A = adj_matrix.astype(float)
+    if A.shape[0] <= 2:
+        _, vectors = np.linalg.eigh(A.toarray())
+        v = vectors[:, -1]
+    else:
+        _, vectors = eigsh(A, k=1, which="LA", v0=np.ones(A.shape[0]))
+        v = vectors[:, 0]
+
+    return v / (np.sign(v.sum()) * np.linalg.norm(v))
+
+
 # ---------------- MASTER FUNCTION ----------------
-def compute_network_metrics(adj_matrix: np.ndarray) -> dict:
+def _network_metrics_sparse(adj_matrix, community_kwargs: dict) -> dict:
+    """
+    All metrics from one CSR adjacency; the degree vector is shared.
+    """
+    A = sparse.csr_matrix(adj_matrix)
+    with stage("clustering"):
+        k = degree(A)
+        clustering = clustering_coefficient_sparse(A, k)
+
+    with stage("louvain"):
+        communities = compute_communities(A, **community_kwargs)
+        labels = community_labels(communities, A.shape[0])
+
+    with stage("modularity"):
+        Q = modularity_sparse(A, labels)
+    with stage("participation"):
+        P = _participation_from_labels(A, labels)
+    with stage("eigenvector"):
+        ec = eigenvector_centrality_sparse(A)
+
+    return {
+        "degree": k,
+        "clustering": clustering,
+        "avg_clustering": float(np.mean(clustering)) if len(k) else 0.0,
+        "modularity": Q,
+        "participation": P,
+        "eigenvector_centrality": ec,
+        "communities": communities
+    }
+
+
+def compute_network_metrics(
+    adj_matrix,
+    backend: str = "networkx",
+    community_method="louvain",
+    seed: int = 0,
+    resolution: float = 1.0
+) -> dict:
     """
     Compute all network metrics for one visibility graph.
+
+    adj_matrix may be a dense array or a scipy.sparse matrix.
+    backend "networkx" uses the NetworkX routines; "sparse" computes
+    clustering, modularity, participation and eigenvector centrality
+    directly on CSR arrays. Communities are detected with
+    community_method (see compute_communities) and returned as an
+    integer label array; a fixed seed makes them reproducible.
     """
+    community_kwargs = {
+        "method": community_method,
+        "seed": seed,
+        "resolution": resolution
+    }
+
+    if backend == "sparse":
+        return _network_metrics_sparse(adj_matrix, community_kwargs)
+    if backend != "networkx":
+        raise ValueError(
+            f"Unknown metrics backend {backend!r}; expected one of {METRIC_BACKENDS}"
+        )
+
     G = build_graph(adj_matrix)
-    communities = compute_communities(G)
+    with stage("louvain"):
+        communities = compute_communities(G, **community_kwargs)
+
+    with stage("clustering"):
+        clustering = clustering_coefficient(G)
+        avg_clustering = average_clustering(G)
+    with stage("modularity"):
+        Q = modularity(G, communities)
+    with stage("participation"):
+        P = participation_coefficient(adj_matrix, communities)
+    with stage("eigenvector"):
+        ec = eigenvector_centrality(G)
 
     return {
         "degree": degree(adj_matrix),
-        "clustering": clustering_coefficient(G),
-        "avg_clustering": average_clustering(G),
-        "modularity": modularity(G, communities),
-        "participation": participation_coefficient(G, communities),
-        "eigenvector_centrality": eigenvector_centrality(G),
+        "clustering": clustering,
+        "avg_clustering": avg_clustering,
+        "modularity": Q,
+        "participation": P,
+        "eigenvector_centrality": ec,
         "communities": communities
     }
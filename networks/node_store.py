@@ -0,0 +1,205 @@
+import os
+import json
+import numpy as np
+from pathlib import Path
+
+from networks.hub_classification import classify_node_role_codes
+
+
+# ---------------- LAYOUT ----------------
+# Node-level metrics of one group in a single preallocated float32
+# array, indexed [subject, channel, epoch, node, metric]:
+#
+#   store_root/
+#       mdd.npy
+#       mdd.json     {"subjects": [...], "channels": [...],
+#                     "metrics": [...], "num_epochs": E, "num_nodes": N}
+#
+# Entries never written (missing epochs, nodes beyond a shorter epoch)
+# are NaN. Slices are read through a memory map, so only the
+# requested part is loaded.
+
+NODE_METRICS = (
+    "degree",
+    "clustering",
+    "participation",
+    "eigenvector_centrality",
+    "z",
+    "role"
+)
+
+DATA_SUFFIX = ".npy"
+META_SUFFIX = ".json"
+
+
+def node_metric_matrix(network: dict, metrics=NODE_METRICS) -> np.ndarray:
+    """
+    (nodes, metrics) float32 matrix of one epoch network
+    (see networks.epoch_analysis.compute_epoch_network); "role" is the
+    R1–R7 code.
+    """
+    columns = []
+    for metric in metrics:
+        if metric == "role":
+            columns.append(
+                classify_node_role_codes(network["participation"], network["z"])
+            )
+        else:
+            columns.append(np.asarray(network[metric]))
+    return np.column_stack(columns).astype(np.float32)
+
+
+# ---------------- WRITER ----------------
+def create_node_store(
+    store_root: Path,
+    name: str,
+    subjects: list,
+    channels: list,
+    num_epochs: int,
+    num_nodes: int,
+    metrics=NODE_METRICS
+):
+    """
+    Preallocate (or resize) the node-level store of a group.
+
+    If a store with the same metrics already exists, the values of
+    every (subject, channel) present in both are carried over, so
+    enrolling subjects or adding channels keeps earlier results.
+    Returns the metadata of the store.
+    """
+    store_root.mkdir(parents=True, exist_ok=True)
+    data_file = store_root / f"{name}{DATA_SUFFIX}"
+
+    meta = {
+        "subjects": list(subjects),
+        "channels": list(channels),
+        "metrics": list(metrics),
+        "num_epochs": int(num_epochs),
+        "num_nodes": int(num_nodes)
+    }
+
+    old = None
+    if data_file.exists():
+        old, old_meta = open_node_store(store_root, name)
+        if old_meta == meta:
+            return meta
+        if old_meta["metrics"] != meta["metrics"]:
+            old = None
+
+    tmp = store_root / f"{name}.tmp{DATA_SUFFIX}"
+    data = np.lib.format.open_memmap(
+        tmp,
+        mode="w+",
+        dtype=np.float32,
+        shape=(len(subjects), len(channels), num_epochs, num_nodes, len(metrics))
+    )
+    data[:] = np.nan
+
+    if old is not None:
+        E = min(num_epochs, old_meta["num_epochs"])
+        N = min(num_nodes, old_meta["num_nodes"])
+        for s, subject_id in enumerate(subjects):
+            if subject_id not in old_meta["subjects"]:
+                continue
+            s_old = old_meta["subjects"].index(subject_id)
+            for c, channel in enumerate(channels):
+                if channel in old_meta["channels"]:
+                    c_old = old_meta["channels"].index(channel)
+                    data[s, c, :E, :N] = old[s_old, c_old, :E, :N]
+        del old
+
+    data.flush()
+    del data
+
+    os.replace(tmp, data_file)
+    with open(store_root / f"{name}{META_SUFFIX}", "w") as f:
+        json.dump(meta, f)
+    return meta
+
+
+def write_node_metrics(
+    store_root: Path,
+    name: str,
+    subject_id: str,
+    channel: str,
+    epoch_idx: int,
+    values: np.ndarray
+):
+    """
+    Store the (nodes, metrics) matrix of one epoch. Nodes beyond the
+    store's node axis are dropped, missing ones left NaN.
+
+    Different epochs may be written concurrently from several
+    processes.
+    """
+    data, meta = open_node_store(store_root, name, mode="r+")
+    s = meta["subjects"].index(subject_id)
+    c = meta["channels"].index(channel)
+
+    n = min(len(values), meta["num_nodes"])
+    data[s, c, epoch_idx, :n] = values[:n]
+    data[s, c, epoch_idx, n:] = np.nan
+    data.flush()
+
+
+# ---------------- READER ----------------
+def open_node_store(store_root: Path, name: str, mode: str = "r"):
+    """
+    Memory-map the node-level store of a group.
+
+    Returns
+    -------
+    data : np.memmap
+        float32 array [subject, channel, epoch, node, metric]
+    meta : dict
+        subjects, channels, metrics, num_epochs, num_nodes
+    """
+    with open(store_root / f"{name}{META_SUFFIX}") as f:
+        meta = json.load(f)
+
+    data = np.load(store_root / f"{name}{DATA_SUFFIX}", mmap_mode=mode)
+    return data, meta
+
+
+def read_node_metrics(
+    store_root: Path,
+    name: str,
+    subjects=None,
+    channels=None,
+    epochs=slice(None),
+    nodes=slice(None),
+    metrics=None
+) -> np.ndarray:
+    """
+    Read a slice of the store by name; only that slice is loaded.
+
+    subjects, channels and metrics are lists of names (default: all),
+    epochs and nodes are slices, index lists or single indices of
+    the epoch and node axes. The result keeps all five axes.
+    """
+    data, meta = open_node_store(store_root, name)
+
+    def positions(selected, names):
+        if selected is None:
+            return slice(None)
+        return [names.index(x) for x in selected]
+
+    index = [
+        positions(subjects, meta["subjects"]),
+        positions(channels, meta["channels"]),
+        epochs,
+        nodes,
+        positions(metrics, meta["metrics"])
+    ]
+    # Keep every axis for single indices
+    index = [[i] if isinstance(i, (int, np.integer)) else i for i in index]
+
+    # Slices first (memory-map views), then the name lists one axis at
+    # a time (numpy would broadcast several of them together)
+    out = data[tuple(
+        slice(None) if isinstance(idx, list) else idx for idx in index
+    )]
+    for axis, idx in enumerate(index):
+        if isinstance(idx, list):
+            out = out[(slice(None),) * axis + (idx,)]
+    return np.asarray(out)
@@ -0,0 +1,171 @@
+import os
+import json
+import time
+import hashlib
+import zipfile
+import numpy as np
+from pathlib import Path
+from scipy import sparse
+
+
+# Bump when the cached content or its meaning changes
+CACHE_VERSION = 1
+
+# Eviction trims the cache to this fraction of max_bytes, so it does
+# not rescan the directory on every write
+LOW_WATER = 0.9
+
+# Each process only sees its own writes, so the size is rescanned
+# from disk after this many puts or seconds; the bound then holds
+# across pool workers, overshooting by at most a few entries each
+RESCAN_PUTS = 100
+RESCAN_SECONDS = 30.0
+
+# Per-process estimate of the cache size:
+# root -> [bytes, puts since the last scan, time of the last scan]
+_size_estimate = {}
+
+
+# ---------------- KEYS ----------------
+def cache_key(signal: np.ndarray, **params) -> str:
+    """
+    Content hash of an epoch signal and the parameters that produced
+    its results (preprocessing, VG and community settings).
+
+    Equal signals analysed with equal parameters get the same key,
+    wherever they are stored in the dataset.
+    """
+    signal = np.ascontiguousarray(signal, dtype=np.float64)
+    h = hashlib.sha256()
+    h.update(str(signal.shape).encode())
+    h.update(signal.tobytes())
+    h.update(json.dumps(
+        {"version": CACHE_VERSION, **params}, sort_keys=True, default=str
+    ).encode())
+    return h.hexdigest()
+
+
+def _entry_path(cache_dir: Path, key: str) -> Path:
+    return Path(cache_dir) / key[:2] / f"{key}.npz"
+
+
+# ---------------- ENTRIES ----------------
+def cache_get(cache_dir: Path, key: str):
+    """
+    Load a cached epoch network, or None on a miss.
+
+    A hit refreshes the entry's modification time, which is what the
+    LRU eviction orders by.
+    """
+    path = _entry_path(cache_dir, key)
+    try:
+        with np.load(path) as f:
+            entry = {name: f[name] for name in f.files}
+        os.utime(path)
+    except (OSError, ValueError, EOFError, zipfile.BadZipFile):
+        # Missing, evicted meanwhile or truncated: recompute
+        return None
+
+    entry["adj"] = sparse.csr_matrix(
+        (entry.pop("adj_data"), entry.pop("adj_indices"), entry.pop("adj_indptr")),
+        shape=tuple(entry.pop("adj_shape"))
+    )
+    for name in ("avg_clustering", "modularity"):
+        entry[name] = float(entry[name])
+    return entry
+
+
+def cache_put(
+    cache_dir: Path,
+    key: str,
+    entry: dict,
+    max_bytes: int = None
+):
+    """
+    Store an epoch network (sparse VG, partition and node-level
+    metrics) under key, written atomically.
+
+    entry holds "adj" (sparse matrix) and array/scalar values. If
+    max_bytes is given, least recently used entries are evicted once
+    the cache grows past it. Processes sharing the cache rescan its
+    size every RESCAN_PUTS puts or RESCAN_SECONDS, so together they
+    exceed max_bytes by at most that many recent entries each.
+    """
+    path = _entry_path(cache_dir, key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    adj = sparse.csr_matrix(entry["adj"])
+    arrays = {name: value for name, value in entry.items() if name != "adj"}
+    arrays.update({
+        "adj_data": adj.data,
+        "adj_indices": adj.indices,
+        "adj_indptr": adj.indptr,
+        "adj_shape": np.array(adj.shape)
+    })
+
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        np.savez_compressed(f, **arrays)
+    os.replace(tmp, path)
+
+    if max_bytes is not None:
+        root = str(Path(cache_dir))
+        state = _size_estimate.get(root)
+        if (state is None or state[1] >= RESCAN_PUTS
+                or time.monotonic() - state[2] >= RESCAN_SECONDS):
+            # Includes what other processes wrote meanwhile
+            state = [cache_size(cache_dir), 0, time.monotonic()]
+        else:
+            state[0] += path.stat().st_size
+            state[1] += 1
+
+        if state[0] > max_bytes:
+            state = [
+                evict_lru(cache_dir, int(max_bytes * LOW_WATER)),
+                0,
+                time.monotonic()
+            ]
+        _size_estimate[root] = state
+
+
+# ---------------- SIZE BOUND ----------------
+def _entries(cache_dir: Path) -> list:
+    """
+    (mtime, size, path) of every cache entry.
+    """
+    entries = []
+    for path in Path(cache_dir).glob("*/*.npz"):
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((st.st_mtime, st.st_size, path))
+    return entries
+
+
+def cache_size(cache_dir: Path) -> int:
+    """
+    Total size of the cache entries in bytes.
+    """
+    return sum(size for _, size, _ in _entries(cache_dir))
+
+
+def evict_lru(cache_dir: Path, max_bytes: int) -> int:
+    """
+    Delete least recently used entries until the cache fits in
+    max_bytes. Returns the remaining size.
+    """
+    entries = sorted(_entries(cache_dir), key=lambda e: e[0])
+    total = sum(size for _, size, _ in entries)
+
+    for _, size, path in entries:
+        if total <= max_bytes:
+            break
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            # Already evicted by another worker
+            pass
+        total -= size
+
+    return total
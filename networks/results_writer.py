@@ -0,0 +1,137 @@
+import os
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:   # optional: only needed for RESULTS_FORMAT = "parquet"
+    pa = None
+    pq = None
+
+
+# ---------------- LAYOUT ----------------
+# Epoch-level results as a hive-partitioned Parquet dataset, one file
+# per completed unit of work (e.g. subject channel):
+#
+#   root/
+#       group=MDD/
+#           subject=subject_1/
+#               channel_31.parquet
+#
+# Files are written atomically as work completes, so memory stays
+# bounded and a rewritten unit simply replaces its file. Partition
+# columns live in the path; readers get them back as categoricals.
+
+# Label columns stored as dictionary-encoded categoricals
+CATEGORICAL_COLUMNS = ("group", "subject", "channel", "epoch", "band")
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError(
+            "Parquet results need pyarrow (pip install pyarrow)"
+        )
+
+
+def compact_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Compact dtypes: categorical labels, int32 counts and float32
+    metrics.
+    """
+    df = df.copy()
+    for column in df.columns:
+        if column in CATEGORICAL_COLUMNS:
+            df[column] = df[column].astype("category")
+        elif column.endswith("_count"):
+            df[column] = df[column].astype(np.int32)
+        elif pd.api.types.is_float_dtype(df[column]):
+            df[column] = df[column].astype(np.float32)
+    return df
+
+
+def partition_path(root: Path, partition: dict, name: str) -> Path:
+    """
+    File of one unit inside the dataset, e.g.
+    root/group=MDD/subject=subject_1/channel_31.parquet.
+    """
+    path = Path(root)
+    for key, value in partition.items():
+        path = path / f"{key}={value}"
+    return path / f"{name}.parquet"
+
+
+# ---------------- WRITER ----------------
+def write_record_batch(
+    root: Path,
+    partition: dict,
+    name: str,
+    records,
+    columns: list
+) -> Path:
+    """
+    Atomically write one batch of epoch records as a Parquet file of
+    the dataset at root, replacing an earlier file of the same unit.
+
+    Parameters
+    ----------
+    partition : dict
+        Partition column -> value, e.g. {"group": "MDD",
+        "subject": "subject_1"}; these columns are not stored in the
+        file itself
+    name : str
+        File name of the unit within its partition (e.g. channel)
+    records : list of dict or pd.DataFrame
+    columns : list
+        Full column order of the results table
+    """
+    _require_pyarrow()
+
+    stored = [c for c in columns if c not in partition]
+    df = pd.DataFrame(records, columns=columns)[stored]
+
+    path = partition_path(root, partition, name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    tmp = path.with_suffix(".parquet.tmp")
+    pq.write_table(
+        pa.Table.from_pandas(compact_frame(df), preserve_index=False),
+        tmp
+    )
+    os.replace(tmp, path)
+    return path
+
+
+def read_record_batch(path: Path, partition: dict) -> pd.DataFrame:
+    """
+    One unit file with its partition columns restored (plain dtypes,
+    as the CSV shards).
+    """
+    _require_pyarrow()
+
+    df = pq.read_table(path).to_pandas()
+    for column in df.columns:
+        if isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype(object)
+    for i, (key, value) in enumerate(partition.items()):
+        df.insert(i, key, value)
+    return df
+
+
+# ---------------- READER ----------------
+def read_results(
+    root: Path,
+    columns: list = None,
+    filters=None
+) -> pd.DataFrame:
+    """
+    Load (selected columns of) a results dataset.
+
+    Only the requested columns are read from disk; filters are
+    pyarrow predicates, e.g. [("group", "==", "MDD")].
+    """
+    _require_pyarrow()
+    return pd.read_parquet(
+        root, engine="pyarrow", columns=columns, filters=filters
+    )
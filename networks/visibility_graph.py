@@ -1,17 +1,58 @@
 import numpy as np
-import pandas as pd
 import multiprocessing as mp
+from scipy import sparse
 from pathlib import Path
 import shutil
 
+from preprocessing.epoch_store import (
+    list_subjects,
+    open_subject_epochs,
+    cached_subject_epochs,
+    epoch_name
+)
+from preprocessing.manifest import (
+    MANIFEST_NAME,
+    load_manifest,
+    save_manifest,
+    subject_digests,
+    changed_epochs,
+    prune_subjects
+)
+
 
 # ---------- Core NVG ----------
-def compute_visibility_graph(time_series: np.ndarray) -> np.ndarray:
+NVG_ENGINES = ("vectorized", "divide_conquer", "loop")
+
+
+def _visible_forward(slopes: np.ndarray) -> np.ndarray:
+    """
+    Offsets (0-based) of the samples visible along a row of slopes.
+
+    A sample is visible when no intermediate sample has a larger slope.
+    """
+    prev_max = np.empty_like(slopes)
+    prev_max[0] = -np.inf
+    np.maximum.accumulate(slopes[:-1], out=prev_max[1:])
+    return np.flatnonzero(prev_max <= slopes)
+
+
+def _as_edge_array(rows: list, cols: list) -> np.ndarray:
     """
-    Optimized Natural Visibility Graph (NVG) using max-slope criterion.
+    Stack per-node neighbour lists into an (E, 2) edge array.
+    """
+    if not rows:
+        return np.empty((0, 2), dtype=np.int64)
+    return np.column_stack([
+        np.concatenate(rows), np.concatenate(cols)
+    ]).astype(np.int64)
+
+
+def _nvg_edges_loop(time_series: np.ndarray) -> np.ndarray:
+    """
+    Reference NVG: pure-Python double loop with the max-slope criterion.
     """
     N = len(time_series)
-    adj = np.zeros((N, N), dtype=int)
+    edges = []
 
     for i in range(N - 1):
         max_slope = float("-inf")
@@ -23,89 +64,463 @@ def compute_visibility_graph(time_series: np.ndarray) -> np.ndarray:
                 max_slope = max(max_slope, prev_slope)
 
             if max_slope <= slope_ij:
-                adj[i, j] = adj[j, i] = 1
+                edges.append((i, j))
+
+    return np.array(edges, dtype=np.int64).reshape(-1, 2)
+
+
+def _nvg_edges_vectorized(time_series: np.ndarray) -> np.ndarray:
+    """
+    NVG by a NumPy running-max-slope sweep, one row per node.
+
+    Slopes are evaluated from the lower-index node exactly as in the
+    reference loop, so the edge set is bit-identical.
+    """
+    N = len(time_series)
+    rows, cols = [], []
+
+    for i in range(N - 1):
+        slopes = (time_series[i + 1:] - time_series[i]) / np.arange(1, N - i)
+        visible = _visible_forward(slopes) + i + 1
+        rows.append(np.full(len(visible), i))
+        cols.append(visible)
+
+    return _as_edge_array(rows, cols)
+
+
+def _nvg_edges_divide_conquer(time_series: np.ndarray) -> np.ndarray:
+    """
+    NVG by the divide-and-conquer (max-pivot) algorithm.
+
+    The highest sample of a segment blocks every line of sight that
+    crosses it, so only the pivot's own edges are computed before the
+    segment is split in two (O(N log N) on average). Visibility is
+    evaluated from the pivot, so samples that are collinear up to
+    floating-point rounding may be resolved differently than by the
+    reference loop.
+    """
+    rows, cols = [], []
+    stack = [(0, len(time_series) - 1)]
+
+    while stack:
+        lo, hi = stack.pop()
+        if lo >= hi:
+            continue
+
+        # First occurrence, so no pair straddling the pivot can tie with it
+        k = lo + int(np.argmax(time_series[lo:hi + 1]))
+
+        if k < hi:
+            slopes = (time_series[k + 1:hi + 1] - time_series[k]) / np.arange(1, hi - k + 1)
+            right = _visible_forward(slopes) + k + 1
+            rows.append(np.full(len(right), k))
+            cols.append(right)
+
+        if k > lo:
+            # Mirror the left half so the same forward sweep applies
+            slopes = (time_series[lo:k][::-1] - time_series[k]) / np.arange(1, k - lo + 1)
+            left = k - 1 - _visible_forward(slopes)
+            rows.append(left)
+            cols.append(np.full(len(left), k))
+
+        stack.append((lo, k - 1))
+        stack.append((k + 1, hi))
+
+    return _as_edge_array(rows, cols)
+
+
+# ---------- HVG and limited-penetrable variants ----------
+def _hvg_edges_stack(time_series: np.ndarray) -> np.ndarray:
+    """
+    Horizontal VG in O(N) with a monotone stack.
+
+    i and j are linked when every sample between them is strictly
+    lower than both. The stack holds the samples still visible from
+    the right (non-increasing values); a new sample links to every
+    lower one it pops and to the first one at least as high.
+    """
+    values = time_series.tolist()
+    stack = []
+    rows, cols = [], []
+
+    for j, xj in enumerate(values):
+        while stack and values[stack[-1]] < xj:
+            rows.append(stack.pop())
+            cols.append(j)
+
+        if stack:
+            rows.append(stack[-1])
+            cols.append(j)
+            # An equal sample is hidden behind j from now on
+            if values[stack[-1]] == xj:
+                stack.pop()
+
+        stack.append(j)
+
+    return np.array([rows, cols], dtype=np.int64).T.reshape(-1, 2)
+
+
+def _limited_penetrable_edges(
+    time_series: np.ndarray,
+    penetrable_distance: int,
+    horizontal: bool
+) -> np.ndarray:
+    """
+    Limited-penetrable NVG/HVG: i and j are linked when at most
+    penetrable_distance samples between them block the line of sight.
+
+    All pairs at the same distance d = j - i are handled at once, and
+    every row i keeps the L + 1 largest "heights" seen between i and
+    j (slopes from i for the NVG, sample values for the HVG), so a
+    pair is visible when the (L + 1)-th largest is below it. N sweeps
+    of O(N L) vector work; with L = 0 the NVG edge set equals the
+    running-max-slope engines.
+    """
+    x = time_series
+    N = len(x)
+    L = penetrable_distance
+    top = np.full((N, L + 1), -np.inf)   # descending per row
+    rows, cols = [], []
+
+    for d in range(1, N):
+        i = np.arange(N - d)
+        T = top[:N - d]
+
+        if horizontal:
+            # Blocked by samples >= min(x_i, x_j)
+            visible = T[:, L] < np.minimum(x[:N - d], x[d:])
+            height = x[d:]
+        else:
+            # Blocked by samples above the i-j line (larger slope)
+            slopes = (x[d:] - x[:N - d]) / d
+            visible = T[:, L] <= slopes
+            height = slopes
+
+        rows.append(i[visible])
+        cols.append(i[visible] + d)
+
+        # Insert the new height into each sorted top-(L + 1) row
+        new = T.copy()
+        new[:, 0] = np.maximum(T[:, 0], height)
+        for c in range(1, L + 1):
+            new[:, c] = np.maximum(T[:, c], np.minimum(T[:, c - 1], height))
+        top[:N - d] = new
+
+    return _as_edge_array(rows, cols)
+
+
+def _hvg_edges(time_series: np.ndarray, **_) -> np.ndarray:
+    return _hvg_edges_stack(time_series)
+
+
+def _lpvg_edges(time_series: np.ndarray, penetrable_distance: int = 1, **_):
+    return _limited_penetrable_edges(time_series, penetrable_distance, False)
+
+
+def _lphvg_edges(time_series: np.ndarray, penetrable_distance: int = 1, **_):
+    return _limited_penetrable_edges(time_series, penetrable_distance, True)
+
+
+def _nvg_edges(time_series: np.ndarray, engine: str = "vectorized", **_):
+    if engine == "vectorized":
+        return _nvg_edges_vectorized(time_series)
+    if engine == "divide_conquer":
+        return _nvg_edges_divide_conquer(time_series)
+    if engine == "loop":
+        return _nvg_edges_loop(time_series)
+    raise ValueError(
+        f"Unknown NVG engine {engine!r}; expected one of {NVG_ENGINES}"
+    )
+
+
+# Builders share one signature: f(time_series, **options) -> (E, 2) edges
+VG_BUILDERS = {
+    "nvg": _nvg_edges,
+    "hvg": _hvg_edges,
+    "lpvg": _lpvg_edges,
+    "lphvg": _lphvg_edges
+}
+
+
+def edges_to_adjacency(edges: np.ndarray, N: int) -> sparse.csr_matrix:
+    """
+    Symmetric N x N CSR adjacency matrix from an (E, 2) edge array.
+    """
+    rows = np.concatenate([edges[:, 0], edges[:, 1]])
+    cols = np.concatenate([edges[:, 1], edges[:, 0]])
+    data = np.ones(len(rows), dtype=int)
+    return sparse.csr_matrix((data, (rows, cols)), shape=(N, N))
+
+
+def compute_visibility_graph(
+    time_series: np.ndarray,
+    engine: str = "vectorized",
+    sparse_output: bool = False,
+    graph: str = "nvg",
+    penetrable_distance: int = 1
+):
+    """
+    Optimized Natural Visibility Graph (NVG) using max-slope criterion,
+    or one of the other visibility graphs of VG_BUILDERS.
+
+    Parameters
+    ----------
+    time_series : np.ndarray
+        1D EEG signal
+    engine : str
+        NVG engine: "vectorized" (NumPy running-max-slope sweep,
+        default), "divide_conquer" (max-pivot recursion) or "loop"
+        (pure-Python reference)
+    sparse_output : bool
+        Return a scipy.sparse CSR matrix instead of a dense array.
+        NVGs have an average degree of about 10, so this keeps a
+        2500-sample epoch at a few hundred kB instead of ~50 MB.
+    graph : str
+        "nvg" (natural), "hvg" (horizontal, O(N)), "lpvg" / "lphvg"
+        (limited-penetrable natural / horizontal)
+    penetrable_distance : int
+        Number of blocking samples a limited-penetrable edge may
+        cross
+
+    Returns
+    -------
+    np.ndarray or scipy.sparse.csr_matrix
+        N x N binary adjacency matrix
+    """
+    if graph not in VG_BUILDERS:
+        raise ValueError(
+            f"Unknown visibility graph {graph!r}; expected one of {tuple(VG_BUILDERS)}"
+        )
+
+    time_series = np.asarray(time_series, dtype=float)
+    N = len(time_series)
+
+    edges = VG_BUILDERS[graph](
+        time_series, engine=engine, penetrable_distance=penetrable_distance
+    )
+
+    if sparse_output:
+        return edges_to_adjacency(edges, N)
+
+    adj = np.zeros((N, N), dtype=int)
+    adj[edges[:, 0], edges[:, 1]] = 1
+    adj[edges[:, 1], edges[:, 0]] = 1
 
     return adj
 
 
-# ---------- Epoch-level ----------
-def load_epoch(file_path: Path) -> np.ndarray:
+def save_visibility_graph(output_file: Path, adj) -> None:
+    """
+    Store an adjacency matrix in compressed sparse (.npz) form.
+    """
+    sparse.save_npz(output_file, sparse.csr_matrix(adj))
+
+
+def load_visibility_graph(file_path: Path) -> sparse.csr_matrix:
     """
-    Load a single EEG epoch (1D signal).
+    Load an adjacency matrix written by save_visibility_graph.
     """
-    return pd.read_csv(file_path, header=None, skiprows=1).iloc[:, 0].values
+    return sparse.load_npz(file_path).tocsr()
 
 
+# ---------- Epoch-level ----------
 def process_epoch(args):
     """
     Atomic processing unit:
-    One epoch → Visibility Graph → Adjacency matrix
+    One epoch → Visibility Graph → Sparse adjacency (.npz)
     """
-    epoch_file, output_file = args
-    signal = load_epoch(epoch_file)
-    adj = compute_visibility_graph(signal)
-    np.savetxt(output_file, adj, delimiter=",", fmt="%d")
+    (store_root, subject_id, channel_idx, epoch_idx, output_file,
+     vg_options) = args
+    epochs, _ = cached_subject_epochs(store_root, subject_id)
+    adj = compute_visibility_graph(
+        epochs[channel_idx, epoch_idx], sparse_output=True, **vg_options
+    )
+    save_visibility_graph(output_file, adj)
+
 
+# ---------- Task queue ----------
+# Vectorized NVG work grows with samples²; about five 2500-sample epochs
+# per chunk keeps IPC overhead negligible without starving workers.
+CHUNK_COST = 5 * 2500 ** 2
 
-# ---------- Channel-level ----------
-def process_channel(channel_input_dir: Path, channel_output_dir: Path):
+
+def epoch_cost(samples: int, vg_options: dict = None) -> int:
     """
-    Process all epochs of a single channel.
-    Epochs are parallelized.
+    Relative cost of building one graph, in the units of CHUNK_COST:
+    samples² for the NVG, samples for the O(N) HVG stack and
+    (L + 1)·samples² for the limited-penetrable sweeps.
     """
-    channel_output_dir.mkdir(parents=True, exist_ok=True)
+    vg_options = vg_options or {}
+    graph = vg_options.get("graph", "nvg")
+    if graph == "hvg":
+        return samples
+    if graph in ("lpvg", "lphvg"):
+        return (vg_options.get("penetrable_distance", 1) + 1) * samples ** 2
+    return samples ** 2
 
-    epoch_files = sorted(
-        channel_input_dir.glob("*.csv"),
-        key=lambda x: int(x.stem.split("_")[-1])
-    )
 
-    tasks = [
-        (epoch_file, channel_output_dir / f"vg_{epoch_file.name}")
-        for epoch_file in epoch_files
-    ]
+def epoch_chunksize(
+    n_tasks: int,
+    n_workers: int,
+    samples: int,
+    vg_options: dict = None
+) -> int:
+    """
+    Tasks per chunk: as many as the cost budget allows, but at least
+    four chunks per worker so the queue stays load-balanced.
+    """
+    by_cost = max(1, CHUNK_COST // max(1, epoch_cost(samples, vg_options)))
+    by_balance = max(1, n_tasks // (4 * n_workers))
+    return min(by_cost, by_balance)
+
 
-    with mp.Pool(processes=max(1, mp.cpu_count() - 2)) as pool:
-        pool.map(process_epoch, tasks)
+def executor_workers(executor, default: int = None) -> int:
+    """
+    Worker count of a pool (multiprocessing.Pool or
+    concurrent.futures executor), or default if it does not say.
+    """
+    for attr in ("_processes", "_max_workers"):
+        workers = getattr(executor, attr, None)
+        if isinstance(workers, int) and workers > 0:
+            return workers
+    return default if default is not None else max(1, mp.cpu_count() - 2)
 
 
-# ---------- Subject-level ----------
-def process_subject(subject_input_dir: Path, subject_output_dir: Path):
+def build_epoch_tasks(
+    input_root: Path,
+    output_root: Path,
+    manifest: dict,
+    vg_options: dict = None
+):
     """
-    Process all channels of a subject.
+    Flat list of epoch tasks over all subjects and channels, limited
+    to epochs that are new or changed since the manifest was written.
+
+    Output directories are created here, once, rather than in workers.
+    Outputs of subjects, channels and epochs that disappeared from the
+    store are deleted. manifest is updated to describe the outputs as
+    they will be once all tasks have run.
+
+    Returns
+    -------
+    tasks : list
+        process_epoch arguments
+    samples : int
+        Longest epoch length, used to size chunks
     """
-    subject_output_dir.mkdir(exist_ok=True)
+    tasks = []
+    samples = 0
+    subject_ids = list_subjects(input_root)
 
-    channel_dirs = sorted(
-        subject_input_dir.iterdir(),
-        key=lambda x: int(x.name.split("_")[-1])
-    )
+    for subject_id in prune_subjects(manifest, input_root, subject_ids):
+        shutil.rmtree(output_root / subject_id, ignore_errors=True)
 
-    for channel_dir in channel_dirs:
-        if channel_dir.is_dir():
-            process_channel(
-                channel_dir,
-                subject_output_dir / channel_dir.name
-            )
+    units = {}
+    for subject_id in subject_ids:
+        digests = subject_digests(manifest, input_root, subject_id)
+        epochs, channels = open_subject_epochs(input_root, subject_id)
+
+        for channel_idx, channel in enumerate(channels):
+            key = f"{subject_id}/{channel}"
+            recorded = manifest["units"].get(key)
+            pending = changed_epochs(recorded, digests[channel])
+            units[key] = digests[channel]
+
+            channel_output_dir = output_root / subject_id / channel
+            channel_output_dir.mkdir(parents=True, exist_ok=True)
+
+            # Epochs dropped from the store
+            for epoch_idx in range(len(digests[channel]), len(recorded or [])):
+                (channel_output_dir / f"vg_{epoch_name(epoch_idx)}.npz").unlink(
+                    missing_ok=True
+                )
+
+            if pending:
+                samples = max(samples, epochs.shape[2])
+
+            for epoch_idx in pending:
+                tasks.append((
+                    input_root,
+                    subject_id,
+                    channel_idx,
+                    epoch_idx,
+                    channel_output_dir / f"vg_{epoch_name(epoch_idx)}.npz",
+                    vg_options or {}
+                ))
+
+    # Channels dropped from a subject
+    for key in set(manifest["units"]) - set(units):
+        shutil.rmtree(output_root / key, ignore_errors=True)
+    manifest["units"] = units
+
+    return tasks, samples
 
 
 # ---------- Pipeline ----------
-def run_visibility_graph_pipeline(input_root: Path, output_root: Path):
+def run_visibility_graph_pipeline(
+    input_root: Path,
+    output_root: Path,
+    n_workers: int = None,
+    executor=None,
+    vg_options: dict = None
+):
     """
-    Full NVG pipeline with hierarchy:
-    Epochs → Channels → Subjects
+    Full visibility graph pipeline over all epochs of all channels and subjects.
 
     (Epochs are the fundamental computational unit)
+
+    Every epoch is queued in one flat, load-balanced task list that
+    a single long-lived worker pool consumes.
+
+    The run is incremental: output_root/manifest.json records the
+    content hash of every epoch behind the stored graphs, so only new
+    or changed subjects, channels and epochs are recomputed. The
+    manifest is written once all tasks have finished; an interrupted
+    run is redone in full for the subjects it touched.
+
+    Parameters
+    ----------
+    input_root : Path
+        Epoch store (see preprocessing.epoch_store)
+    output_root : Path
+        Receives subject_X/channel_Y/vg_epoch_Z.npz
+    n_workers : int
+        Size of the worker pool (default: all cores but two)
+    executor : optional
+        Existing pool to reuse instead (anything with
+        map(fn, iterable, chunksize=...), e.g. multiprocessing.Pool
+        or concurrent.futures.ProcessPoolExecutor); it is left open.
+        Chunks are sized for its own worker count (n_workers if it
+        cannot be determined)
+    vg_options : dict, optional
+        compute_visibility_graph options, e.g. {"graph": "hvg"}
+        (default: natural VG); changing them recomputes every graph
     """
-    if output_root.exists():
-        shutil.rmtree(output_root)
-    output_root.mkdir(parents=True)
+    vg_options = dict(vg_options or {})
+    output_root.mkdir(parents=True, exist_ok=True)
+    manifest_file = output_root / MANIFEST_NAME
+    manifest = load_manifest(
+        manifest_file, {"graph": "nvg", **vg_options}
+    )
+
+    tasks, samples = build_epoch_tasks(
+        input_root, output_root, manifest, vg_options
+    )
+
+    if tasks:
+        if executor is not None:
+            # Balance chunks over the workers that actually run them
+            n_workers = executor_workers(executor, n_workers)
+        elif n_workers is None:
+            n_workers = max(1, mp.cpu_count() - 2)
+        chunksize = epoch_chunksize(
+            len(tasks), n_workers, samples, vg_options
+        )
 
-    subject_dirs = sorted(input_root.iterdir())
+        if executor is not None:
+            list(executor.map(process_epoch, tasks, chunksize=chunksize))
+        else:
+            with mp.Pool(processes=n_workers) as pool:
+                pool.map(process_epoch, tasks, chunksize=chunksize)
 
-    for subject_dir in subject_dirs:
-        if subject_dir.is_dir():
-            process_subject(
-                subject_dir,
-                output_root / subject_dir.name
-            )
+    save_manifest(manifest_file, manifest)
@@ -1,7 +1,9 @@
 import numpy as np
 import pandas as pd
 from pathlib import Path
-from scipy.signal import firwin, filtfilt
+from scipy.signal import filtfilt
+
+from preprocessing.filter_bank import fir_bandpass_taps, fir_filtfilt
 
 
 def bandpass_filter(
@@ -9,7 +11,8 @@ def bandpass_filter(
     fs: int,
     lowcut: float = 1.0,
     highcut: float = 30.0,
-    numtaps: int = 401
+    numtaps: int = 401,
+    method: str = "fft"
 ) -> np.ndarray:
     """
     Apply FIR bandpass filter to EEG signal.
@@ -17,7 +20,8 @@ def bandpass_filter(
     Parameters
     ----------
     signal : np.ndarray
-        1D EEG signal
+        1D EEG signal, or (channels, samples) array filtered along
+        the last axis
     fs : int
         Sampling frequency (Hz)
     lowcut : float
@@ -26,18 +30,21 @@ def bandpass_filter(
         Upper cutoff frequency (Hz)
     numtaps : int
         Filter order (should be odd)
+    method : str
+        "fft" (overlap-add zero-phase filtering) or "direct"
+        (time-domain filtfilt); both give the same result
 
     Returns
     -------
     np.ndarray
         Bandpass filtered signal
     """
-    nyquist = fs / 2
-    taps = firwin(
-        numtaps,
-        [lowcut / nyquist, highcut / nyquist],
-        pass_zero=False
-    )
+    taps = fir_bandpass_taps(fs, lowcut, highcut, numtaps)
+
+    if method == "fft":
+        return fir_filtfilt(taps, signal)
+    if method != "direct":
+        raise ValueError(f"Unknown filtering method {method!r}")
     return filtfilt(taps, [1.0], signal)
 
 
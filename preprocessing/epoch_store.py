@@ -0,0 +1,217 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+from functools import lru_cache
+from pathlib import Path
+
+
+# ---------------- LAYOUT ----------------
+# One memory-mapped array per subject, indexed [channel, epoch, sample]:
+#
+#   store_root/
+#       subject_X.npy
+#       subject_X.json      {"channels": [...], "fs": 250}
+#
+# Epoch i of a channel corresponds to the former epoch_{i + 1}.csv.
+
+DATA_SUFFIX = ".npy"
+META_SUFFIX = ".json"
+
+
+def epoch_name(epoch_idx: int) -> str:
+    """
+    Epoch label used in result tables (0-based index -> "epoch_1", ...).
+    """
+    return f"epoch_{epoch_idx + 1}"
+
+
+# ---------------- WRITER ----------------
+def create_subject_store(
+    store_root: Path,
+    subject_id: str,
+    channels: list,
+    num_epochs: int,
+    samples_per_epoch: int,
+    fs: int = 250,
+    dtype=np.float64
+) -> np.memmap:
+    """
+    Preallocate the epoch array of one subject on disk.
+
+    Returns a writable memory map of shape
+    (channels, epochs, samples); flush it (or drop the reference)
+    once filled.
+    """
+    store_root.mkdir(parents=True, exist_ok=True)
+
+    with open(store_root / f"{subject_id}{META_SUFFIX}", "w") as f:
+        json.dump({"channels": list(channels), "fs": fs}, f)
+
+    return np.lib.format.open_memmap(
+        store_root / f"{subject_id}{DATA_SUFFIX}",
+        mode="w+",
+        dtype=dtype,
+        shape=(len(channels), num_epochs, samples_per_epoch)
+    )
+
+
+def write_subject_epochs(
+    store_root: Path,
+    subject_id: str,
+    channels: list,
+    signals: np.ndarray,
+    samples_per_epoch: int,
+    num_epochs: int,
+    fs: int = 250
+):
+    """
+    Cut (channels, samples) continuous signals into epochs and store
+    them for one subject.
+    """
+    epochs = create_subject_store(
+        store_root,
+        subject_id,
+        channels,
+        num_epochs,
+        samples_per_epoch,
+        fs,
+        signals.dtype
+    )
+    epochs[:] = signals[:, :num_epochs * samples_per_epoch].reshape(
+        len(channels), num_epochs, samples_per_epoch
+    )
+    epochs.flush()
+    del epochs
+
+
+def remove_subject_store(store_root: Path, subject_id: str):
+    """
+    Delete the data and metadata files of one subject, if present.
+    """
+    for suffix in (DATA_SUFFIX, META_SUFFIX):
+        (Path(store_root) / f"{subject_id}{suffix}").unlink(missing_ok=True)
+
+
+# ---------------- READER ----------------
+def list_subjects(store_root: Path) -> list:
+    """
+    Sorted subject IDs available in an epoch store.
+    """
+    return sorted(
+        p.stem for p in store_root.glob(f"*{DATA_SUFFIX}")
+        if (store_root / f"{p.stem}{META_SUFFIX}").exists()
+    )
+
+
+def open_subject_epochs(store_root: Path, subject_id: str):
+    """
+    Open the epochs of one subject without reading them into memory.
+
+    Returns
+    -------
+    data : np.memmap
+        Read-only array of shape (channels, epochs, samples);
+        data[c, e] is a zero-copy view of one epoch
+    channels : list
+        Channel names, aligned with the first axis of data
+    """
+    with open(store_root / f"{subject_id}{META_SUFFIX}") as f:
+        meta = json.load(f)
+
+    data = np.load(store_root / f"{subject_id}{DATA_SUFFIX}", mmap_mode="r")
+    return data, meta["channels"]
+
+
+def files_fingerprint(paths) -> list:
+    """
+    Size and mtime (ns) of every file, flattened.
+    """
+    fingerprint = []
+    for path in paths:
+        st = os.stat(path)
+        fingerprint += [st.st_size, st.st_mtime_ns]
+    return fingerprint
+
+
+def store_fingerprint(store_root: Path, subject_id: str) -> list:
+    """
+    Size and mtime of a subject's data and metadata files.
+    """
+    return files_fingerprint(
+        Path(store_root) / f"{subject_id}{suffix}"
+        for suffix in (DATA_SUFFIX, META_SUFFIX)
+    )
+
+
+@lru_cache(maxsize=4)
+def _cached_open(store_root: Path, subject_id: str, fingerprint: tuple):
+    return open_subject_epochs(store_root, subject_id)
+
+
+def cached_subject_epochs(store_root: Path, subject_id: str):
+    """
+    Memoised open_subject_epochs, so that worker processes handling
+    many epoch tasks map each subject only once.
+
+    The cache is keyed by the store fingerprint as well, so a subject
+    rewritten in the same process is mapped again rather than served
+    stale.
+    """
+    return _cached_open(
+        store_root, subject_id,
+        tuple(store_fingerprint(store_root, subject_id))
+    )
+
+
+def iter_subject_epochs(store_root: Path):
+    """
+    Yield (subject_id, data, channels) for every subject in a store.
+    """
+    for subject_id in list_subjects(store_root):
+        data, channels = open_subject_epochs(store_root, subject_id)
+        yield subject_id, data, channels
+
+
+# ---------------- MIGRATION ----------------
+def _sorted_epoch_files(channel_dir: Path) -> list:
+    return sorted(
+        channel_dir.glob("epoch_*.csv"),
+        key=lambda x: int(x.stem.split("_")[-1])
+    )
+
+
+def convert_csv_epochs(input_root: Path, store_root: Path, fs: int = 250):
+    """
+    Convert the legacy subject_X/channel_Y/epoch_Z.csv layout into an
+    epoch store. Channels must have equal epoch counts and lengths.
+    """
+    for subject_dir in sorted(input_root.iterdir()):
+        if not subject_dir.is_dir():
+            continue
+
+        channel_dirs = sorted(
+            (d for d in subject_dir.iterdir() if d.is_dir()),
+            key=lambda d: int(d.name.split("_")[-1])
+        )
+        if not channel_dirs:
+            continue
+
+        first = _sorted_epoch_files(channel_dirs[0])
+        samples = len(pd.read_csv(first[0]).iloc[:, 0])
+
+        data = create_subject_store(
+            store_root,
+            subject_dir.name,
+            [d.name for d in channel_dirs],
+            len(first),
+            samples,
+            fs
+        )
+
+        for c, channel_dir in enumerate(channel_dirs):
+            for e, epoch_file in enumerate(_sorted_epoch_files(channel_dir)):
+                data[c, e] = pd.read_csv(epoch_file).iloc[:, 0].values
+
+        data.flush()
+        del data
@@ -1,6 +1,8 @@
 import pandas as pd
 from pathlib import Path
 
+from preprocessing.epoch_store import create_subject_store
+
 
 def split_into_epochs(
     input_root: Path,
@@ -17,13 +19,10 @@ def split_into_epochs(
         subject_X/
             channel_Y.csv
 
-    Output structure:
+    Output structure (epoch store, see preprocessing.epoch_store):
     output_root/
-        subject_X/
-            channel_Y/
-                epoch_1.csv
-                epoch_2.csv
-                ...
+        subject_X.npy      [channel, epoch, sample]
+        subject_X.json     channel names and sampling rate
 
     Parameters
     ----------
@@ -33,39 +32,49 @@ def split_into_epochs(
         Epoch length in seconds
     total_samples : int
         Number of samples to read from each channel
+
+    Only complete epochs are stored. If a channel is shorter than
+    total_samples, every channel of that subject is cut to the
+    complete epochs of the shortest one.
     """
 
     samples_per_epoch = fs * epoch_duration
-    num_epochs = total_samples // samples_per_epoch
 
     for subject_dir in sorted(input_root.iterdir()):
         if not subject_dir.is_dir():
             continue
 
-        subject_output_dir = output_root / subject_dir.name
-        subject_output_dir.mkdir(parents=True, exist_ok=True)
-
-        for channel_file in sorted(subject_dir.glob("channel_*.csv")):
-            channel_id = channel_file.stem
-            channel_output_dir = subject_output_dir / channel_id
-            channel_output_dir.mkdir(exist_ok=True)
+        channel_files = sorted(subject_dir.glob("channel_*.csv"))
+        if not channel_files:
+            continue
 
-            eeg_data = pd.read_csv(
+        recordings = [
+            pd.read_csv(
                 channel_file,
                 usecols=[0],
                 nrows=total_samples,
                 header=None
-            )
+            ).iloc[:, 0].values
+            for channel_file in channel_files
+        ]
 
-            for epoch_idx in range(num_epochs):
-                start = epoch_idx * samples_per_epoch
-                end = (epoch_idx + 1) * samples_per_epoch
+        # The store holds the same number of epochs for every channel:
+        # as many complete epochs as the shortest recording provides
+        num_epochs = min(len(r) for r in recordings) // samples_per_epoch
 
-                epoch_data = eeg_data.iloc[start:end]
-                epoch_file = channel_output_dir / f"epoch_{epoch_idx + 1}.csv"
+        epochs = create_subject_store(
+            output_root,
+            subject_dir.name,
+            [channel_file.stem for channel_file in channel_files],
+            num_epochs,
+            samples_per_epoch,
+            fs
+        )
+
+        for c, eeg_data in enumerate(recordings):
+            epochs[c] = eeg_data[:num_epochs * samples_per_epoch].reshape(
+                num_epochs, samples_per_epoch
+            )
 
-                epoch_data.to_csv(
-                    epoch_file,
-                    index=False,
-                    header=[channel_id]
-                )
+        epochs.flush()
+        del epochs
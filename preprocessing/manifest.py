@@ -0,0 +1,160 @@
+import os
+import json
+import hashlib
+import numpy as np
+from pathlib import Path
+
+from preprocessing.epoch_store import (
+    open_subject_epochs,
+    store_fingerprint
+)
+
+
+# ---------------- LAYOUT ----------------
+# A manifest records what a pipeline stage has already processed:
+#
+#   {
+#     "params":   {...},                      stage parameters
+#     "subjects": {"mdd/subject_1": {         epoch store inputs
+#         "fingerprint": [...],               size / mtime of the files
+#         "digests": {channel: [hash, ...]}   content hash per epoch
+#     }},
+#     "units":    {unit key: [hash, ...]}     epochs behind each output
+#     "roles":    {...}                       hub thresholds (track_params)
+#   }
+#
+# Stages reading raw recordings instead record, per output, the size /
+# mtime fingerprint of its source files under "units".
+#
+# Subjects whose files are untouched are skipped without reading
+# them; for the others, per-epoch hashes show which epochs are new or
+# changed. A change of parameters invalidates the whole manifest.
+# Downstream parameters (e.g. hub thresholds) are tracked separately,
+# so that a change only redoes the steps that depend on them.
+
+MANIFEST_NAME = "manifest.json"
+
+
+def load_manifest(path: Path, params: dict) -> dict:
+    """
+    Manifest at path, or an empty one if it is missing or was written
+    with different parameters (then flagged "invalidated", so callers
+    do not trust existing outputs).
+    """
+    empty = {"params": params, "subjects": {}, "units": {}}
+    if not path.exists():
+        return empty
+
+    with open(path) as f:
+        manifest = json.load(f)
+
+    # Round-trip params so tuples/lists compare equal
+    if manifest.get("params") != json.loads(json.dumps(params)):
+        # Outputs on disk were produced with other parameters
+        empty["invalidated"] = True
+        return empty
+    return manifest
+
+
+def track_params(manifest: dict, name: str, params: dict) -> bool:
+    """
+    Record parameters of a downstream step under manifest[name].
+
+    Unlike the parameters given to load_manifest they do not
+    invalidate the recorded hashes, so callers can redo only the
+    steps that depend on them. Returns True when they differ from the
+    recorded ones (or none were recorded).
+    """
+    params = json.loads(json.dumps(params))
+    changed = manifest.get(name) != params
+    manifest[name] = params
+    return changed
+
+
+def save_manifest(path: Path, manifest: dict):
+    """
+    Atomically write a manifest.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".json.tmp")
+    manifest.pop("invalidated", None)
+    with open(tmp, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, path)
+
+
+# ---------------- FINGERPRINTS ----------------
+def subject_key(store_root: Path, subject_id: str) -> str:
+    """
+    Manifest key of a subject, e.g. "mdd/subject_1".
+    """
+    return f"{Path(store_root).name}/{subject_id}"
+
+
+def epoch_digests(epochs: np.ndarray) -> list:
+    """
+    Content hash of every epoch of a (channels, epochs, samples) array.
+    """
+    return [
+        [
+            hashlib.blake2b(
+                np.ascontiguousarray(epoch).tobytes(), digest_size=8
+            ).hexdigest()
+            for epoch in channel_epochs
+        ]
+        for channel_epochs in epochs
+    ]
+
+
+def subject_digests(manifest: dict, store_root: Path, subject_id: str) -> dict:
+    """
+    Channel -> per-epoch content hashes of one subject.
+
+    Reuses the hashes recorded in the manifest while the store files
+    are unchanged; otherwise rehashes the epochs and records them.
+    """
+    key = subject_key(store_root, subject_id)
+    fingerprint = store_fingerprint(store_root, subject_id)
+
+    entry = manifest["subjects"].get(key)
+    if entry is not None and entry["fingerprint"] == fingerprint:
+        return entry["digests"]
+
+    epochs, channels = open_subject_epochs(store_root, subject_id)
+    digests = dict(zip(channels, epoch_digests(epochs)))
+    manifest["subjects"][key] = {
+        "fingerprint": fingerprint,
+        "digests": digests
+    }
+    return digests
+
+
+def changed_epochs(recorded, digests: list) -> list:
+    """
+    Indices of epochs that are new or differ from the recorded hashes
+    (all of them when nothing was recorded).
+    """
+    if recorded is None:
+        return list(range(len(digests)))
+
+    return [
+        epoch_idx for epoch_idx, digest in enumerate(digests)
+        if epoch_idx >= len(recorded) or recorded[epoch_idx] != digest
+    ]
+
+
+def prune_subjects(manifest: dict, store_root: Path, subject_ids: list) -> list:
+    """
+    Drop manifest entries of subjects no longer in the store.
+
+    Returns the removed subject IDs.
+    """
+    prefix = f"{Path(store_root).name}/"
+    present = set(subject_ids)
+    removed = [
+        key for key in manifest["subjects"]
+        if key.startswith(prefix) and key[len(prefix):] not in present
+    ]
+    for key in removed:
+        del manifest["subjects"][key]
+    return [key[len(prefix):] for key in removed]
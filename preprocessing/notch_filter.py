@@ -1,7 +1,9 @@
 import numpy as np
 import pandas as pd
 from pathlib import Path
-from scipy.signal import iirnotch, filtfilt
+from scipy.signal import filtfilt
+
+from preprocessing.filter_bank import notch_coefficients
 
 
 def notch_filter(
@@ -16,7 +18,8 @@ def notch_filter(
     Parameters
     ----------
     signal : np.ndarray
-        1D EEG signal
+        1D EEG signal, or (channels, samples) array filtered along
+        the last axis
     fs : int
         Sampling frequency (Hz)
     notch_freq : float
@@ -29,9 +32,7 @@ def notch_filter(
     np.ndarray
         Notch filtered signal
     """
-    nyquist = fs / 2
-    w0 = notch_freq / nyquist
-    b, a = iirnotch(w0, quality_factor)
+    b, a = notch_coefficients(fs, notch_freq, quality_factor)
     return filtfilt(b, a, signal)
 
 
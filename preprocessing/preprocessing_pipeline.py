@@ -0,0 +1,150 @@
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+from preprocessing.filter_bank import FilterBank
+from preprocessing.epoch_store import (
+    DATA_SUFFIX,
+    write_subject_epochs,
+    remove_subject_store,
+    files_fingerprint
+)
+from preprocessing.manifest import MANIFEST_NAME, load_manifest, save_manifest
+
+
+def read_subject_recordings(subject_dir: Path):
+    """
+    Read all channel_*.csv recordings of a subject, each at its full
+    length.
+
+    Returns
+    -------
+    recordings : list
+        One 1D float array per channel
+    channels : list
+        Channel names (file stems), aligned with recordings
+    """
+    channel_files = sorted(subject_dir.glob("channel_*.csv"))
+    recordings = [
+        pd.read_csv(channel_file, header=None).iloc[:, 0].to_numpy(dtype=float)
+        for channel_file in channel_files
+    ]
+    return recordings, [channel_file.stem for channel_file in channel_files]
+
+
+def load_subject_channels(subject_dir: Path):
+    """
+    Load all channel_*.csv recordings of a subject at once.
+
+    Returns
+    -------
+    signals : np.ndarray
+        (channels, samples) array; channels are truncated to the
+        shortest recording
+    channels : list
+        Channel names (file stems), aligned with the first axis
+    """
+    recordings, channels = read_subject_recordings(subject_dir)
+
+    if not recordings:
+        return np.empty((0, 0)), []
+
+    length = min(len(r) for r in recordings)
+    signals = np.stack([r[:length] for r in recordings])
+    return signals, channels
+
+
+def run_preprocessing_pipeline(
+    input_root: Path,
+    output_root: Path,
+    fs: int = 250,
+    epoch_duration: int = 10,
+    total_samples: int = 75000,
+    notch_freq: float = 50.0,
+    lowcut: float = 1.0,
+    highcut: float = 30.0
+):
+    """
+    Notch filter → bandpass filter → epoching in one pass per subject.
+
+    Each subject is read once, filtered in memory and written
+    straight into the epoch store, so no intermediate CSVs are
+    materialised.
+
+    The run is incremental: output_root/manifest.json records the
+    size and mtime of every subject's channel files, so subjects whose
+    recordings and parameters are unchanged keep their store files
+    untouched (and downstream stages skip them too). Stores of
+    subjects removed from input_root are deleted.
+
+    Directory structure expected:
+    input_root/
+        subject_X/
+            channel_Y.csv
+
+    Output: epoch store (see preprocessing.epoch_store)
+
+    Parameters
+    ----------
+    fs : int
+        Sampling frequency (Hz)
+    epoch_duration : int
+        Epoch length in seconds
+    total_samples : int
+        Number of (filtered) samples per channel to epoch
+    notch_freq, lowcut, highcut : float
+        Powerline notch and bandpass edges (Hz)
+    """
+    samples_per_epoch = fs * epoch_duration
+    filter_bank = FilterBank(
+        fs, notch_freq, lowcut=lowcut, highcut=highcut
+    )
+
+    manifest_file = output_root / MANIFEST_NAME
+    manifest = load_manifest(
+        manifest_file,
+        {
+            "fs": fs,
+            "epoch_duration": epoch_duration,
+            "total_samples": total_samples,
+            "notch_freq": notch_freq,
+            "lowcut": lowcut,
+            "highcut": highcut
+        }
+    )
+
+    subject_dirs = [d for d in sorted(input_root.iterdir()) if d.is_dir()]
+    for subject_id in set(manifest["units"]) - {d.name for d in subject_dirs}:
+        remove_subject_store(output_root, subject_id)
+        del manifest["units"][subject_id]
+
+    for subject_dir in subject_dirs:
+        channel_files = sorted(subject_dir.glob("channel_*.csv"))
+        source = {
+            "channels": [channel_file.stem for channel_file in channel_files],
+            "fingerprint": files_fingerprint(channel_files)
+        }
+        if (manifest["units"].get(subject_dir.name) == source
+                and (output_root / f"{subject_dir.name}{DATA_SUFFIX}").exists()):
+            continue
+
+        signals, channels = load_subject_channels(subject_dir)
+        if not channels:
+            continue
+
+        filtered = filter_bank.preprocess(signals)
+        num_epochs = min(total_samples, filtered.shape[1]) // samples_per_epoch
+
+        write_subject_epochs(
+            output_root,
+            subject_dir.name,
+            channels,
+            filtered,
+            samples_per_epoch,
+            num_epochs,
+            fs
+        )
+        manifest["units"][subject_dir.name] = source
+        save_manifest(manifest_file, manifest)
+
+    save_manifest(manifest_file, manifest)
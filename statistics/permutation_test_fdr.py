@@ -1,7 +1,15 @@
+import argparse
+import multiprocessing as mp
 import numpy as np
 import pandas as pd
+from pathlib import Path
+from scipy.stats import beta
 from statsmodels.stats.multitest import multipletests
 
+# Channels per parallel task; fixed so results do not depend on the
+# number of workers
+CHANNEL_CHUNK = 16
+
 
 def permutation_test(
     data1,
@@ -38,41 +46,366 @@ def permutation_test(
     p_value = extreme_count / num_permutations
     return p_value, observed_diff
 
-# Align channels
-common_cols = data1.columns.intersection(data2.columns)
 
-data1 = data1[common_cols]
-data2 = data2[common_cols]
+def _group_mean_difference(sums1, total, n1, n2):
+    return sums1 / n1 - (total - sums1) / n2
+
+
+def permutation_test_batch(
+    data1,
+    data2,
+    num_permutations=5000,
+    alternative="two-sided",
+    rng=None,
+    block_size=1000,
+    early_stop_alpha=None,
+    early_stop_risk=1e-3
+):
+    """
+    Vectorized permutation test (mean difference) for many channels.
+
+    Permutations are drawn in blocks as a (block, n) group-membership
+    matrix, so the mean difference of every permutation and channel
+    comes from one matrix product.
+
+    Parameters
+    ----------
+    data1, data2 : np.ndarray
+        (subjects, channels) values of each group; 1D arrays are
+        treated as a single channel
+    rng : np.random.Generator or int, optional
+        Random generator (or seed) for reproducible permutations
+    block_size : int
+        Permutations evaluated per matrix product
+    early_stop_alpha : float, optional
+        If given, a channel stops drawing permutations once a
+        Clopper-Pearson interval for its p-value lies entirely above
+        or below this level
+    early_stop_risk : float
+        Probability that such an interval is wrong
+
+    Returns
+    -------
+    p_value : np.ndarray
+        Fraction of permutations at least as extreme as observed
+    observed_diff : np.ndarray
+        mean(data1) - mean(data2) per channel
+    num_used : np.ndarray
+        Permutations actually evaluated per channel
+    """
+    squeeze = np.ndim(data1) == 1
+    data1 = np.asarray(data1, dtype=float).reshape(len(data1), -1)
+    data2 = np.asarray(data2, dtype=float).reshape(len(data2), -1)
+    rng = np.random.default_rng(rng)
+
+    n1, n2 = len(data1), len(data2)
+    n = n1 + n2
+    combined = np.concatenate([data1, data2])
+    total = combined.sum(axis=0)
+
+    observed_diff = _group_mean_difference(data1.sum(axis=0), total, n1, n2)
+    # Tolerance so that permutations tying with the observed split
+    # are not lost to rounding in the summation order
+    gamma = np.abs(observed_diff) * np.finfo(float).eps * 100
+
+    n_channels = combined.shape[1]
+    extreme_count = np.zeros(n_channels)
+    num_used = np.zeros(n_channels, dtype=int)
+    active = np.arange(n_channels)
+
+    while len(active) and num_used[active[0]] < num_permutations:
+        block = min(block_size, num_permutations - num_used[active[0]])
+
+        order = rng.permuted(np.tile(np.arange(n), (block, 1)), axis=1)
+        membership = np.zeros((block, n))
+        np.put_along_axis(membership, order[:, :n1], 1.0, axis=1)
+
+        perm_diff = _group_mean_difference(
+            membership @ combined[:, active], total[active], n1, n2
+        )
+        obs = observed_diff[active]
+        tol = gamma[active]
+
+        if alternative == "two-sided":
+            extreme = np.abs(perm_diff) >= np.abs(obs) - tol
+        elif alternative == "greater":
+            extreme = perm_diff >= obs - tol
+        elif alternative == "less":
+            extreme = perm_diff <= obs + tol
+        else:
+            raise ValueError(f"Unknown alternative {alternative!r}")
+
+        extreme_count[active] += extreme.sum(axis=0)
+        num_used[active] += block
+
+        if early_stop_alpha is not None:
+            c = extreme_count[active]
+            b = num_used[active]
+            lower = np.nan_to_num(beta.ppf(early_stop_risk / 2, c, b - c + 1))
+            upper = np.nan_to_num(
+                beta.ppf(1 - early_stop_risk / 2, c + 1, b - c), nan=1.0
+            )
+            decided = (upper < early_stop_alpha) | (lower > early_stop_alpha)
+            active = active[~decided]
+
+    p_value = extreme_count / num_used
+
+    if squeeze:
+        return p_value[0], observed_diff[0], num_used[0]
+    return p_value, observed_diff, num_used
+
+# ---------------- INPUT TABLES ----------------
+def subject_channel_table(
+    results: pd.DataFrame,
+    value_column: str
+) -> pd.DataFrame:
+    """
+    Average epoch-level results (run_hurst / main_pipeline output)
+    into a subjects x channels table.
+    """
+    return (
+        results.groupby(["subject", "channel"], observed=True)[value_column]
+        .mean()
+        .unstack("channel")
+    )
+
+
+def read_results_table(
+    path: Path,
+    value_column: str,
+    extra_columns: list = ()
+) -> pd.DataFrame:
+    """
+    Subject, channel and value columns of a results table: a CSV, or
+    a Parquet file/dataset directory (main_pipeline with
+    RESULTS_FORMAT = "parquet"), of which only these columns are read.
+    """
+    columns = list(extra_columns) + ["subject", "channel", value_column]
+    path = Path(path)
+
+    if path.is_dir() or path.suffix == ".parquet":
+        return pd.read_parquet(path, columns=columns)
+    return pd.read_csv(path, usecols=columns)
+
+
+def load_group_tables(
+    value_column: str,
+    results_csv: Path = None,
+    groups: tuple = ("MDD", "NORMAL"),
+    group_csvs: tuple = None
+):
+    """
+    Subjects x channels tables for the two groups being compared.
+
+    Either results_csv holds both groups in a "group" column
+    (main_pipeline output), or group_csvs gives one file per group
+    (e.g. compute_hurst_for_dataset run on data/mdd and data/normal).
+    Parquet results datasets are accepted in place of CSVs.
+    """
+    if group_csvs is not None:
+        frames = [read_results_table(path, value_column) for path in group_csvs]
+    else:
+        df = read_results_table(results_csv, value_column, ["group"])
+        frames = [df[df["group"] == group] for group in groups]
+
+    return tuple(subject_channel_table(f, value_column) for f in frames)
+
+
+# ---------------- CHANNEL-WISE TEST ----------------
+def _test_channel_chunk(args):
+    """
+    Worker: test a block of channels with its own random stream.
+
+    Channels without missing subjects are tested together; the rest
+    one by one on their available subjects. Channels without any
+    value in one of the groups get NaN.
+    """
+    values1, values2, seed, kwargs = args
+    rng = np.random.default_rng(seed)
+    n_channels = values1.shape[1]
+
+    p_value = np.empty(n_channels)
+    observed_diff = np.empty(n_channels)
+    num_used = np.empty(n_channels, dtype=int)
+
+    complete = ~(np.isnan(values1).any(axis=0) | np.isnan(values2).any(axis=0))
+    if complete.any():
+        p_value[complete], observed_diff[complete], num_used[complete] = (
+            permutation_test_batch(
+                values1[:, complete], values2[:, complete], rng=rng, **kwargs
+            )
+        )
+
+    for c in np.flatnonzero(~complete):
+        x1 = values1[~np.isnan(values1[:, c]), c]
+        x2 = values2[~np.isnan(values2[:, c]), c]
+        if len(x1) == 0 or len(x2) == 0:
+            p_value[c] = observed_diff[c] = np.nan
+            num_used[c] = 0
+            continue
+        p_value[c], observed_diff[c], num_used[c] = permutation_test_batch(
+            x1, x2, rng=rng, **kwargs
+        )
+
+    return p_value, observed_diff, num_used
+
+
+def channelwise_permutation_fdr(
+    data1: pd.DataFrame,
+    data2: pd.DataFrame,
+    num_permutations: int = 5000,
+    alpha: float = 0.05,
+    alternative: str = "two-sided",
+    seed=None,
+    n_workers: int = 1,
+    early_stop: bool = False
+) -> pd.DataFrame:
+    """
+    Channel-wise permutation tests with FDR correction
+    (Benjamini–Hochberg).
+
+    Parameters
+    ----------
+    data1, data2 : pd.DataFrame
+        Subjects x channels values of each group; only channels
+        present in both are tested
+    seed : int, optional
+        Seed for reproducible p-values (independent of n_workers)
+    n_workers : int
+        Processes testing blocks of channels in parallel
+    early_stop : bool
+        Stop permuting channels whose p-value is clearly away
+        from alpha
+
+    Returns
+    -------
+    pd.DataFrame
+        Channel, mean_difference, p_value, p_value_fdr, significant,
+        num_permutations; channels without values in one group have
+        NaN p-values, are left out of the correction and are not
+        significant
+    """
+    # Align channels
+    common_cols = data1.columns.intersection(data2.columns)
+
+    values1 = data1[common_cols].to_numpy(dtype=float)
+    values2 = data2[common_cols].to_numpy(dtype=float)
+
+    kwargs = {
+        "num_permutations": num_permutations,
+        "alternative": alternative,
+        "early_stop_alpha": alpha if early_stop else None
+    }
+
+    starts = range(0, len(common_cols), CHANNEL_CHUNK)
+    seeds = np.random.SeedSequence(seed).spawn(len(starts))
+    tasks = [
+        (
+            values1[:, start:start + CHANNEL_CHUNK],
+            values2[:, start:start + CHANNEL_CHUNK],
+            chunk_seed,
+            kwargs
+        )
+        for start, chunk_seed in zip(starts, seeds)
+    ]
+
+    if n_workers > 1 and len(tasks) > 1:
+        with mp.Pool(processes=min(n_workers, len(tasks))) as pool:
+            chunks = pool.map(_test_channel_chunk, tasks)
+    else:
+        chunks = [_test_channel_chunk(task) for task in tasks]
+
+    if chunks:
+        p_values, mean_diffs, num_used = (
+            np.concatenate(parts) for parts in zip(*chunks)
+        )
+    else:
+        p_values = mean_diffs = np.zeros(0)
+        num_used = np.zeros(0, dtype=int)
+
+    results_df = pd.DataFrame({
+        "Channel": common_cols,
+        "mean_difference": mean_diffs,
+        "p_value": p_values
+    })
+
+    # FDR correction (Benjamini–Hochberg) over the testable channels
+    tested = ~np.isnan(p_values)
+    reject = np.zeros(len(p_values), dtype=bool)
+    pvals_fdr = np.full(len(p_values), np.nan)
+    if tested.any():
+        reject[tested], pvals_fdr[tested], _, _ = multipletests(
+            p_values[tested],
+            alpha=alpha,
+            method="fdr_bh"
+        )
 
-results = []
-p_values = []
+    results_df["p_value_fdr"] = pvals_fdr
+    results_df["significant"] = reject
+    results_df["num_permutations"] = num_used
 
-for col in data1.columns:
-    p_val, mean_diff = permutation_test(
-        data1[col].values,
-        data2[col].values,
-        num_permutations=5000
+    return results_df
+
+
+# ---------------- CLI ----------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Channel-wise permutation test with FDR correction "
+                    "on Hurst or network-metric results."
+    )
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument(
+        "--results", type=Path,
+        help="Epoch-level CSV or Parquet dataset with a 'group' column "
+             "(main_pipeline output)"
+    )
+    source.add_argument(
+        "--group-csvs", type=Path, nargs=2, metavar=("GROUP1", "GROUP2"),
+        help="One epoch-level CSV per group (e.g. run_hurst output)"
+    )
+    parser.add_argument(
+        "--groups", nargs=2, default=["MDD", "NORMAL"],
+        help="Group labels to compare when using --results"
     )
-    p_values.append(p_val)
-    results.append([col, mean_diff, p_val])
-
-# FDR correction (Benjamini–Hochberg)
-reject, pvals_fdr, _, _ = multipletests(
-    p_values,
-    alpha=0.05,
-    method="fdr_bh"
-)
-
-results_df = pd.DataFrame(
-    results,
-    columns=["Channel", "mean_difference", "p_value"]
-)
-results_df["p_value_fdr"] = pvals_fdr
-results_df["significant"] = reject
-
-results_df.to_csv(
-    "permutation_test_fdr_5000.csv",
-    index=False
-)
-
-print("Permutation test with FDR correction completed.")
\ No newline at end of file
+    parser.add_argument(
+        "--metric", required=True,
+        help="Value column to test, e.g. hurst or avg_clustering"
+    )
+    parser.add_argument("--output", type=Path, required=True)
+    parser.add_argument("--permutations", type=int, default=5000)
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument(
+        "--alternative", default="two-sided",
+        choices=["two-sided", "greater", "less"]
+    )
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--early-stop", action="store_true")
+    args = parser.parse_args(argv)
+
+    data1, data2 = load_group_tables(
+        args.metric,
+        results_csv=args.results,
+        groups=tuple(args.groups),
+        group_csvs=args.group_csvs
+    )
+
+    results_df = channelwise_permutation_fdr(
+        data1,
+        data2,
+        num_permutations=args.permutations,
+        alpha=args.alpha,
+        alternative=args.alternative,
+        seed=args.seed,
+        n_workers=args.workers,
+        early_stop=args.early_stop
+    )
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    results_df.to_csv(args.output, index=False)
+
+    print("Permutation test with FDR correction completed.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+# statistics/ shadows the standard library, so import its module directly
+sys.path[:0] = [str(ROOT), str(ROOT / "statistics")]
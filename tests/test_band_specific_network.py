@@ -0,0 +1,132 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import frequency_analysis.band_specific_network as band_network
+from frequency_analysis.band_specific_network import (
+    FREQUENCY_BANDS,
+    analyze_channel_bands,
+    analyze_frequency_band,
+    bandpass_filter,
+    decompose_bands,
+    run_band_specific_network_analysis
+)
+from preprocessing.epoch_store import create_subject_store
+
+CHANNELS = ["channel_31", "channel_124", "channel_5"]
+SIGNIFICANT = ["channel_31", "channel_124"]
+
+
+@pytest.fixture
+def store(tmp_path):
+    rng = np.random.default_rng(0)
+    root = tmp_path / "mdd"
+    for s in range(2):
+        epochs = create_subject_store(root, f"subject_{s + 1}", CHANNELS, 2, 250)
+        epochs[:] = np.cumsum(rng.standard_normal(epochs.shape), axis=-1)
+        epochs.flush()
+        del epochs
+    return root
+
+
+def run(store, out, **kwargs):
+    """Band analysis of store into out/; returns (summary, epoch table)"""
+    out.mkdir(exist_ok=True)
+    run_band_specific_network_analysis(
+        store, out / "bands.csv", SIGNIFICANT,
+        epoch_csv=out / "epochs.csv", **kwargs
+    )
+    return pd.read_csv(out / "bands.csv"), pd.read_csv(out / "epochs.csv")
+
+
+def channel_epochs(n_epochs=3, samples=250, seed=1):
+    rng = np.random.default_rng(seed)
+    return np.cumsum(rng.standard_normal((n_epochs, samples)), axis=-1)
+
+
+# ---------------- CHANNEL ANALYSIS ----------------
+def test_epoch_mode_matches_per_epoch_roles():
+    epochs = channel_epochs()
+    table = analyze_channel_bands(epochs, 250, band_filtering="epoch")
+    assert len(table) == len(epochs) * len(FREQUENCY_BANDS)
+
+    for row in table.itertuples():
+        epoch_idx = int(row.epoch.split("_")[1]) - 1
+        roles = analyze_frequency_band(epochs[epoch_idx], 250, FREQUENCY_BANDS[row.band])
+        for name in ("R1", "R2", "R3", "R4", "R5", "R6", "R7"):
+            assert getattr(row, f"{name}_count") == roles.count(name)
+
+
+def test_continuous_mode_filters_the_joined_signal():
+    epochs = channel_epochs()
+    bands = decompose_bands(epochs, 250)
+    for band_name, (low, high) in FREQUENCY_BANDS.items():
+        expected = bandpass_filter(epochs.reshape(-1), 250, low, high)
+        np.testing.assert_allclose(bands[band_name].reshape(-1), expected)
+
+    table = analyze_channel_bands(epochs, 250, bands=["alpha"], band_filtering="continuous")
+    assert list(table["band"]) == ["alpha"] * len(epochs)
+
+    with pytest.raises(ValueError, match="band_filtering"):
+        analyze_channel_bands(epochs, 250, band_filtering="welch")
+
+
+# ---------------- DATASET PIPELINE ----------------
+@pytest.mark.parametrize("band_filtering", ["epoch", "continuous"])
+def test_results_independent_of_worker_count(store, tmp_path, band_filtering):
+    serial = run(store, tmp_path / "serial", band_filtering=band_filtering)
+    parallel = run(store, tmp_path / "parallel", band_filtering=band_filtering, n_workers=2)
+
+    for expected, got in zip(serial, parallel):
+        pd.testing.assert_frame_equal(got, expected)
+    summary, epochs = serial
+    assert len(summary) == len(SIGNIFICANT) * len(FREQUENCY_BANDS)
+    assert len(epochs) == 2 * len(SIGNIFICANT) * 2 * len(FREQUENCY_BANDS)
+
+
+def test_unchanged_rerun_reads_shards(store, tmp_path, monkeypatch):
+    summary, epochs = run(store, tmp_path / "run")
+
+    with monkeypatch.context() as m:
+        m.setattr(band_network, "analyze_channel_bands", None)
+        again = run(store, tmp_path / "run")
+    pd.testing.assert_frame_equal(again[0], summary)
+    pd.testing.assert_frame_equal(again[1], epochs)
+
+    # A changed recording redoes only its channels
+    data = np.load(store / "subject_2.npy", mmap_mode="r+")
+    data[0, 1] = data[0, 1][::-1].copy()
+    data.flush()
+    del data
+
+    computed = []
+    analyze = band_network.analyze_channel_bands
+
+    def recording(channel_epochs, *args, **kwargs):
+        computed.append(channel_epochs)
+        return analyze(channel_epochs, *args, **kwargs)
+
+    monkeypatch.setattr(band_network, "analyze_channel_bands", recording)
+    _, changed = run(store, tmp_path / "run")
+    assert len(computed) == 1
+    differs = (changed != epochs).any(axis=1)
+    assert set(changed.loc[differs, "subject"]) == {"subject_2"}
+    assert set(changed.loc[differs, "channel"]) == {"channel_31"}
+
+
+def test_threshold_change_reclassifies_from_cache(store, tmp_path, monkeypatch):
+    import networks.epoch_analysis
+    import networks.hub_classification
+
+    cache = {"cache_dir": tmp_path / "cache"}
+    _, before = run(store, tmp_path / "run", **cache)
+
+    monkeypatch.setattr(networks.hub_classification, "HUB_Z", 1.0)
+    with monkeypatch.context() as m:
+        m.setattr(networks.epoch_analysis, "compute_visibility_graph", None)
+        summary, rescored = run(store, tmp_path / "run", **cache)
+
+    fresh_summary, fresh = run(store, tmp_path / "fresh")
+    pd.testing.assert_frame_equal(rescored, fresh)
+    pd.testing.assert_frame_equal(summary, fresh_summary)
+    assert (rescored["R5_count"] != before["R5_count"]).any()
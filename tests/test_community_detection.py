@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+from scipy import sparse
+
+from networks.visibility_graph import compute_visibility_graph
+from networks.network_metrics import modularity_sparse
+from networks.community_detection import (
+    detect_communities,
+    louvain_communities,
+    python_louvain_communities
+)
+
+
+def walk_graph(seed, n=400):
+    rng = np.random.default_rng(seed)
+    return sparse.csr_matrix(compute_visibility_graph(np.cumsum(rng.standard_normal(n))))
+
+
+def planted_cliques(n_cliques=4, size=8):
+    blocks = [np.ones((size, size)) - np.eye(size)] * n_cliques
+    adj = sparse.block_diag(blocks, format="lil")
+    # Chain the cliques with single bridging edges
+    for c in range(n_cliques - 1):
+        i, j = c * size, (c + 1) * size
+        adj[i, j] = adj[j, i] = 1
+    return adj.tocsr()
+
+
+def test_seeded_louvain_is_deterministic():
+    adj = walk_graph(0)
+    first = louvain_communities(adj, seed=7)
+    for _ in range(3):
+        np.testing.assert_array_equal(louvain_communities(adj, seed=7), first)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_labels_are_contiguous(seed):
+    labels = louvain_communities(walk_graph(seed), seed=seed)
+    assert labels.dtype.kind == "i"
+    np.testing.assert_array_equal(np.unique(labels), np.arange(labels.max() + 1))
+
+
+def test_recovers_planted_cliques():
+    adj = planted_cliques()
+    labels = louvain_communities(adj)
+    expected = np.repeat(np.arange(4), 8)
+    # Same partition up to relabelling
+    assert len(set(zip(labels, expected))) == 4
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_modularity_close_to_python_louvain(seed):
+    adj = walk_graph(seed)
+    ours = modularity_sparse(adj, louvain_communities(adj, seed=seed))
+    reference = modularity_sparse(adj, python_louvain_communities(adj, seed=seed))
+    assert ours >= reference - 0.02
+
+
+def test_resolution_controls_community_count():
+    adj = walk_graph(1)
+    coarse = louvain_communities(adj, resolution=0.5).max()
+    fine = louvain_communities(adj, resolution=2.0).max()
+    assert fine > coarse
+
+
+def test_edgeless_graph_keeps_singletons():
+    np.testing.assert_array_equal(
+        louvain_communities(sparse.csr_matrix((5, 5))), np.arange(5)
+    )
+
+
+def test_detect_communities_dispatch():
+    adj = planted_cliques()
+    np.testing.assert_array_equal(
+        detect_communities(adj, "louvain", seed=3), louvain_communities(adj, seed=3)
+    )
+    custom = detect_communities(adj, lambda a, seed, resolution: np.zeros(a.shape[0]))
+    assert custom.dtype.kind == "i" and not custom.any()
+
+    with pytest.raises(ValueError, match="community method"):
+        detect_communities(adj, "leiden")
@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+from scipy.signal import filtfilt, firwin, iirnotch
+
+from preprocessing.filter_bank import (
+    FilterBank,
+    fir_bandpass_taps,
+    fir_filtfilt,
+    notch_coefficients
+)
+from preprocessing.bandpass_filter import bandpass_filter
+from preprocessing.notch_filter import notch_filter
+
+
+@pytest.fixture
+def signals():
+    rng = np.random.default_rng(0)
+    return np.cumsum(rng.standard_normal((3, 5000)), axis=-1)
+
+
+@pytest.mark.parametrize("numtaps", [31, 101, 401])
+def test_fir_filtfilt_matches_filtfilt(signals, numtaps):
+    taps = fir_bandpass_taps(250, 1.0, 30.0, numtaps)
+    expected = filtfilt(taps, [1.0], signals)
+    np.testing.assert_allclose(fir_filtfilt(taps, signals), expected, atol=1e-10)
+
+
+def test_fir_filtfilt_1d(signals):
+    taps = fir_bandpass_taps(250, 1.0, 30.0, 101)
+    np.testing.assert_allclose(
+        fir_filtfilt(taps, signals[0]), filtfilt(taps, [1.0], signals[0]),
+        atol=1e-10
+    )
+
+
+def test_fir_filtfilt_just_above_padding(signals):
+    taps = fir_bandpass_taps(250, 1.0, 30.0, 101)
+    x = signals[:, :3 * len(taps) + 1]
+    np.testing.assert_allclose(
+        fir_filtfilt(taps, x), filtfilt(taps, [1.0], x), atol=1e-10
+    )
+
+
+@pytest.mark.parametrize("length", [10, 3 * 101])
+def test_fir_filtfilt_shorter_than_padding_raises_like_filtfilt(signals, length):
+    taps = fir_bandpass_taps(250, 1.0, 30.0, 101)
+    x = signals[0, :length]
+    with pytest.raises(ValueError):
+        filtfilt(taps, [1.0], x)
+    with pytest.raises(ValueError):
+        fir_filtfilt(taps, x)
+
+
+def test_cached_designs_match_scipy():
+    np.testing.assert_array_equal(
+        fir_bandpass_taps(250, 1.0, 30.0, 401),
+        firwin(401, [1.0 / 125, 30.0 / 125], pass_zero=False)
+    )
+    b, a = notch_coefficients(250, 50.0, 30.0)
+    b_ref, a_ref = iirnotch(50.0 / 125, 30.0)
+    np.testing.assert_array_equal(b, b_ref)
+    np.testing.assert_array_equal(a, a_ref)
+    assert fir_bandpass_taps(250, 1.0, 30.0, 401) is fir_bandpass_taps(250, 1.0, 30.0, 401)
+
+
+def test_bandpass_methods_agree(signals):
+    np.testing.assert_allclose(
+        bandpass_filter(signals, 250, method="fft"),
+        bandpass_filter(signals, 250, method="direct"),
+        atol=1e-10
+    )
+
+
+def test_filter_bank_matches_per_channel_filters(signals):
+    bank = FilterBank(250)
+    expected = np.stack([
+        bandpass_filter(notch_filter(x, 250), 250, method="direct")
+        for x in signals
+    ])
+    np.testing.assert_allclose(bank.preprocess(signals), expected, atol=1e-10)
@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+
+from networks.hub_classification import (
+    HUB_Z,
+    HUB_P_EDGES,
+    NONHUB_P_EDGES,
+    ROLE_NAMES,
+    classify_node_role_codes,
+    classify_node_roles,
+    role_summary,
+    role_summary_batch
+)
+
+
+def reference_roles(participation, z):
+    """The per-node if/elif classifier the codes replaced"""
+    roles = []
+    for P, zi in zip(participation, z):
+        if zi < 2.5:
+            if P < 0.05:
+                roles.append("R1")
+            elif P < 0.62:
+                roles.append("R2")
+            elif P < 0.8:
+                roles.append("R3")
+            else:
+                roles.append("R4")
+        else:
+            if P < 0.3:
+                roles.append("R5")
+            elif P < 0.75:
+                roles.append("R6")
+            else:
+                roles.append("R7")
+    return roles
+
+
+def role_inputs(n=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    P = rng.random(n)
+    z = rng.normal(1.0, 1.5, n)
+    # Exact thresholds, where < versus <= matters, and NaNs
+    edges = np.array([0.0, *NONHUB_P_EDGES, *HUB_P_EDGES, 1.0, np.nan])
+    P[:len(edges) * 3] = np.repeat(edges, 3)
+    z[:len(edges) * 3] = np.tile([HUB_Z, np.nextafter(HUB_Z, 0), np.nan], len(edges))
+    return P, z
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_roles_match_reference(seed):
+    P, z = role_inputs(seed=seed)
+    expected = reference_roles(P, z)
+
+    assert classify_node_roles(P, z) == expected
+    codes = classify_node_role_codes(P, z)
+    assert [ROLE_NAMES[c - 1] for c in codes] == expected
+
+
+def test_codes_are_elementwise_over_batches():
+    P, z = role_inputs()
+    batch = classify_node_role_codes(P.reshape(4, -1), z.reshape(4, -1))
+    np.testing.assert_array_equal(batch.ravel(), classify_node_role_codes(P, z))
+
+
+def test_role_summary_matches_counts():
+    P, z = role_inputs(n=500)
+    roles = reference_roles(P, z)
+    summary = role_summary(classify_node_role_codes(P, z))
+
+    for name in ROLE_NAMES:
+        assert summary[f"{name}_count"] == roles.count(name)
+    hubs = sum(roles.count(name) for name in ("R5", "R6", "R7"))
+    assert summary["hub_percent"] == pytest.approx(100 * hubs / len(roles))
+    assert summary["hub_nonhub_ratio"] == pytest.approx(hubs / (len(roles) - hubs))
+
+
+def test_role_summary_batch_of_uneven_epochs():
+    P, z = role_inputs()
+    codes = [
+        classify_node_role_codes(P[start:stop], z[start:stop])
+        for start, stop in ((0, 40), (40, 115), (115, 115))
+    ]
+    batch = role_summary_batch(codes)
+
+    for i, epoch_codes in enumerate(codes[:2]):
+        single = role_summary(epoch_codes)
+        for name, value in single.items():
+            assert batch[name][i] == pytest.approx(value, nan_ok=True)
+
+    # An empty epoch has no roles and no ratio
+    assert batch["R1_count"][2] == 0 and np.isnan(batch["hub_nonhub_ratio"][2])
+    all_hubs = role_summary(np.full(5, 6))
+    assert all_hubs["hub_percent"] == 100 and np.isnan(all_hubs["hub_nonhub_ratio"])
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+from scipy.stats import linregress
+
+from Complexity.hurst_rs_analysis import (
+    hurst_rs_multiscale,
+    hurst_rs_multiscale_batch,
+    rescaled_range_batch
+)
+
+
+def reference_hurst(time_series):
+    """The per-segment loop the batch implementation replaced"""
+    N = len(time_series)
+    window_sizes = np.floor(
+        np.logspace(np.log10(10), np.log10(N // 2), num=10)
+    ).astype(int)
+
+    RS = []
+    for w in window_sizes:
+        if w < 10:
+            continue
+        rs_vals = []
+        for i in range(N // w):
+            segment = time_series[i * w:(i + 1) * w]
+            cum_dev = np.cumsum(segment - np.mean(segment))
+            S = np.std(segment, ddof=1)
+            if S > 0:
+                rs_vals.append((np.max(cum_dev) - np.min(cum_dev)) / S)
+        if rs_vals:
+            RS.append(np.mean(rs_vals))
+
+    return linregress(np.log(window_sizes[:len(RS)]), np.log(RS)).slope
+
+
+def epochs(n_epochs=6, n_samples=500, seed=0):
+    rng = np.random.default_rng(seed)
+    noise = rng.standard_normal((n_epochs, n_samples))
+    return np.vstack([noise[: n_epochs // 2], np.cumsum(noise[n_epochs // 2:], axis=1)])
+
+
+@pytest.mark.parametrize("n_samples", [100, 257, 1000])
+def test_batch_matches_reference(n_samples):
+    X = epochs(n_samples=n_samples)
+    expected = [reference_hurst(x) for x in X]
+
+    np.testing.assert_allclose(hurst_rs_multiscale_batch(X), expected)
+    np.testing.assert_allclose([hurst_rs_multiscale(x) for x in X], expected)
+
+
+def test_flat_stretches_drop_scales_like_reference():
+    X = epochs(n_epochs=2)
+    # Flat first half: the small windows there have zero deviation
+    X[:, :250] = 1.0
+    np.testing.assert_allclose(
+        hurst_rs_multiscale_batch(X), [reference_hurst(x) for x in X]
+    )
+
+
+def test_constant_and_short_signals_are_nan():
+    assert np.isnan(hurst_rs_multiscale(np.ones(500)))
+    assert np.isnan(hurst_rs_multiscale(np.arange(19.0)))
+
+
+def test_rescaled_range_batch_rows():
+    X = epochs()
+    rs = rescaled_range_batch(X, 50)
+    for x, value in zip(X, rs):
+        segments = x.reshape(10, 50)
+        cum_dev = np.cumsum(segments - segments.mean(axis=1, keepdims=True), axis=1)
+        ratios = np.ptp(cum_dev, axis=1) / segments.std(axis=1, ddof=1)
+        assert value == pytest.approx(ratios.mean())
@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import main_pipeline
+from preprocessing.epoch_store import create_subject_store
+
+CHANNELS = ["channel_31", "channel_124", "channel_5"]
+
+
+def write_dataset(data_root, num_epochs=3, samples=150):
+    rng = np.random.default_rng(0)
+    for group in main_pipeline.GROUPS:
+        for s in range(2):
+            epochs = create_subject_store(
+                data_root / group, f"subject_{s + 1}", CHANNELS, num_epochs, samples
+            )
+            epochs[:] = np.cumsum(rng.standard_normal(epochs.shape), axis=-1)
+            epochs.flush()
+            del epochs
+
+
+@pytest.fixture
+def pipeline(tmp_path, monkeypatch):
+    """main_pipeline configured for a small dataset under tmp_path"""
+    write_dataset(tmp_path / "data")
+
+    def configure(name):
+        out = tmp_path / name
+        monkeypatch.setattr(main_pipeline, "DATA_ROOT", tmp_path / "data")
+        monkeypatch.setattr(main_pipeline, "OUTPUT_FILE", out / "results.csv")
+        monkeypatch.setattr(main_pipeline, "SHARD_DIR", out / "shards")
+        monkeypatch.setattr(main_pipeline, "CACHE_DIR", None)
+        return out / "results.csv"
+
+    return configure
+
+
+def recorded_units(monkeypatch):
+    units = []
+    process = main_pipeline.process_work_unit
+
+    def recording(unit):
+        units.append(unit[1:])
+        return process(unit)
+
+    monkeypatch.setattr(main_pipeline, "process_work_unit", recording)
+    return units
+
+
+def test_results_independent_of_worker_count(pipeline):
+    serial = pipeline("serial")
+    main_pipeline.run_network_pipeline(n_workers=1)
+    parallel = pipeline("parallel")
+    main_pipeline.run_network_pipeline(n_workers=2)
+
+    expected = pd.read_csv(serial)
+    # Only the significant channels, every epoch of every subject
+    assert len(expected) == 2 * 2 * 2 * 3
+    assert set(expected["channel"]) == {"channel_31", "channel_124"}
+    pd.testing.assert_frame_equal(pd.read_csv(parallel), expected)
+
+
+def test_rerun_is_incremental(pipeline, tmp_path, monkeypatch):
+    output = pipeline("run")
+    main_pipeline.run_network_pipeline(n_workers=2)
+    full = pd.read_csv(output)
+
+    units = recorded_units(monkeypatch)
+    main_pipeline.run_network_pipeline(n_workers=1)
+    assert units == []
+    pd.testing.assert_frame_equal(pd.read_csv(output), full)
+
+    # Change one epoch: only it is recomputed, and the merged table
+    # matches a fresh run on the new data
+    store = np.load(tmp_path / "data" / "normal" / "subject_2.npy", mmap_mode="r+")
+    store[1, 2] = store[1, 2][::-1].copy()
+    store.flush()
+    del store
+
+    main_pipeline.run_network_pipeline(n_workers=1)
+    assert [u[1:] for u in units] == [("subject_2", "channel_124", 2)]
+
+    updated = pd.read_csv(output)
+    pipeline("fresh")
+    main_pipeline.run_network_pipeline(n_workers=1)
+    pd.testing.assert_frame_equal(updated, pd.read_csv(tmp_path / "fresh" / "results.csv"))
+    assert (updated != full).any(axis=1).sum() == 1
+
+
+def test_threshold_change_reclassifies_from_cache(pipeline, tmp_path, monkeypatch):
+    import networks.epoch_analysis
+    import networks.hub_classification
+
+    output = pipeline("run")
+    monkeypatch.setattr(main_pipeline, "CACHE_DIR", tmp_path / "cache")
+    main_pipeline.run_network_pipeline(n_workers=1)
+    before = pd.read_csv(output)
+
+    monkeypatch.setattr(networks.hub_classification, "HUB_Z", 1.0)
+    with monkeypatch.context() as m:
+        # Graphs and node metrics must come from the cache
+        m.setattr(networks.epoch_analysis, "compute_visibility_graph", None)
+        main_pipeline.run_network_pipeline(n_workers=1)
+    rescored = pd.read_csv(output)
+
+    pipeline("fresh")
+    main_pipeline.run_network_pipeline(n_workers=1)
+    pd.testing.assert_frame_equal(rescored, pd.read_csv(tmp_path / "fresh" / "results.csv"))
+    assert (rescored["R5_count"] != before["R5_count"]).any()
+    pd.testing.assert_series_equal(rescored["modularity"], before["modularity"])
@@ -0,0 +1,209 @@
+import json
+import numpy as np
+import pandas as pd
+import pytest
+
+from preprocessing.epoch_store import (
+    create_subject_store,
+    cached_subject_epochs,
+    remove_subject_store
+)
+from preprocessing.manifest import (
+    MANIFEST_NAME,
+    load_manifest,
+    save_manifest,
+    subject_digests,
+    changed_epochs,
+    prune_subjects,
+    track_params
+)
+from networks.visibility_graph import run_visibility_graph_pipeline
+from Complexity import run_hurst
+
+CHANNELS = ["channel_1", "channel_2"]
+
+
+def write_subject(store_root, subject_id, seed=0, num_epochs=3, samples=120):
+    rng = np.random.default_rng(seed)
+    epochs = create_subject_store(store_root, subject_id, CHANNELS, num_epochs, samples)
+    epochs[:] = np.cumsum(rng.standard_normal(epochs.shape), axis=-1)
+    epochs.flush()
+    del epochs
+
+
+def rewrite_epoch(store_root, subject_id, channel_idx, epoch_idx):
+    epochs = np.load(store_root / f"{subject_id}.npy", mmap_mode="r+")
+    epochs[channel_idx, epoch_idx] += 1.0
+    epochs.flush()
+    del epochs
+
+
+@pytest.fixture
+def store(tmp_path):
+    root = tmp_path / "mdd"
+    for s in range(2):
+        write_subject(root, f"subject_{s + 1}", seed=s)
+    return root
+
+
+class RecordingExecutor:
+    """Serial stand-in for a worker pool that remembers its tasks"""
+    _processes = 2
+
+    def __init__(self):
+        self.tasks = []
+
+    def map(self, fn, tasks, chunksize=1):
+        tasks = list(tasks)
+        self.tasks += tasks
+        return [fn(task) for task in tasks]
+
+
+# ---------------- MANIFEST ----------------
+def test_changed_epochs():
+    assert changed_epochs(None, ["a", "b"]) == [0, 1]
+    assert changed_epochs(["a", "b"], ["a", "b"]) == []
+    assert changed_epochs(["a", "b"], ["a", "x", "c"]) == [1, 2]
+    assert changed_epochs(["a", "b", "c"], ["a"]) == []
+
+
+def test_load_manifest_invalidates_on_new_params(tmp_path):
+    path = tmp_path / MANIFEST_NAME
+    assert load_manifest(path, {"graph": "nvg"})["units"] == {}
+
+    manifest = load_manifest(path, {"graph": "nvg", "bands": (1, 4)})
+    manifest["units"]["subject_1/channel_1"] = ["abc"]
+    save_manifest(path, manifest)
+
+    # Tuples and lists round-trip to the same params
+    assert load_manifest(path, {"graph": "nvg", "bands": [1, 4]})["units"]
+    reloaded = load_manifest(path, {"graph": "hvg", "bands": (1, 4)})
+    assert reloaded["invalidated"] and reloaded["units"] == {}
+
+    save_manifest(path, reloaded)
+    assert "invalidated" not in json.loads(path.read_text())
+
+
+def test_track_params_survives_reload(tmp_path):
+    path = tmp_path / MANIFEST_NAME
+    manifest = load_manifest(path, {})
+    assert track_params(manifest, "roles", {"hub_z": 2.5, "edges": (0.3, 0.75)})
+    save_manifest(path, manifest)
+
+    manifest = load_manifest(path, {})
+    assert not track_params(manifest, "roles", {"hub_z": 2.5, "edges": (0.3, 0.75)})
+    assert track_params(manifest, "roles", {"hub_z": 1.0, "edges": (0.3, 0.75)})
+    # Downstream parameters leave the recorded hashes alone
+    assert "invalidated" not in manifest
+
+
+def test_subject_digests_reuse_and_refresh(store, monkeypatch):
+    manifest = {"subjects": {}, "units": {}}
+    digests = subject_digests(manifest, store, "subject_1")
+    assert set(digests) == set(CHANNELS) and len(digests["channel_1"]) == 3
+
+    # Unchanged files: recorded hashes are reused without reading data
+    import preprocessing.manifest as manifest_module
+    monkeypatch.setattr(manifest_module, "open_subject_epochs", None)
+    assert subject_digests(manifest, store, "subject_1") == digests
+    monkeypatch.undo()
+
+    rewrite_epoch(store, "subject_1", 1, 2)
+    updated = subject_digests(manifest, store, "subject_1")
+    assert updated["channel_1"] == digests["channel_1"]
+    assert changed_epochs(digests["channel_2"], updated["channel_2"]) == [2]
+
+
+def test_prune_subjects(store):
+    manifest = {"subjects": {}, "units": {}}
+    for subject_id in ("subject_1", "subject_2"):
+        subject_digests(manifest, store, subject_id)
+    manifest["subjects"]["normal/subject_1"] = {}
+
+    assert prune_subjects(manifest, store, ["subject_2"]) == ["subject_1"]
+    assert set(manifest["subjects"]) == {"mdd/subject_2", "normal/subject_1"}
+
+
+def test_cached_subject_epochs_sees_rewrites(store):
+    first, _ = cached_subject_epochs(store, "subject_1")
+    value = float(first[0, 0, 0])
+
+    write_subject(store, "subject_1", seed=9, num_epochs=4)
+    epochs, _ = cached_subject_epochs(store, "subject_1")
+    assert epochs.shape[1] == 4 and epochs[0, 0, 0] != value
+
+
+# ---------------- INCREMENTAL VG PIPELINE ----------------
+def run_vg(store, output_root, **kwargs):
+    executor = RecordingExecutor()
+    run_visibility_graph_pipeline(store, output_root, executor=executor, **kwargs)
+    return {(t[1], t[2], t[3]) for t in executor.tasks}
+
+
+def test_vg_pipeline_is_incremental(store, tmp_path):
+    out = tmp_path / "vg"
+    assert len(run_vg(store, out)) == 2 * 2 * 3
+    assert run_vg(store, out) == set()
+
+    rewrite_epoch(store, "subject_2", 0, 1)
+    assert run_vg(store, out) == {("subject_2", 0, 1)}
+
+    write_subject(store, "subject_3", seed=3, num_epochs=2)
+    assert run_vg(store, out) == {("subject_3", c, e) for c in range(2) for e in range(2)}
+
+    remove_subject_store(store, "subject_1")
+    assert run_vg(store, out) == set()
+    assert not (out / "subject_1").exists()
+
+    # New graph options recompute everything
+    assert len(run_vg(store, out, vg_options={"graph": "hvg"})) == 2 * 3 + 2 * 2
+
+
+def test_vg_pipeline_drops_removed_epochs(store, tmp_path):
+    out = tmp_path / "vg"
+    run_vg(store, out)
+    kept = np.load(store / "subject_1.npy")[:, :2].copy()
+    epochs = create_subject_store(store, "subject_1", CHANNELS, 2, kept.shape[2])
+    epochs[:] = kept
+    epochs.flush()
+    del epochs
+
+    assert run_vg(store, out) == set()
+    assert sorted(p.name for p in (out / "subject_1" / "channel_1").iterdir()) == [
+        "vg_epoch_1.npz", "vg_epoch_2.npz"
+    ]
+
+
+# ---------------- INCREMENTAL HURST ----------------
+@pytest.mark.parametrize("shard_by", ["subject", "channel"])
+def test_hurst_is_incremental(store, tmp_path, monkeypatch, shard_by):
+    ran = []
+    process = run_hurst.process_hurst_shard
+
+    def recording(task):
+        ran.append(task[1:3])
+        return process(task)
+
+    monkeypatch.setattr(run_hurst, "process_hurst_shard", recording)
+    output_csv = tmp_path / "hurst.csv"
+
+    def run():
+        ran.clear()
+        run_hurst.compute_hurst_for_dataset(
+            store, output_csv, n_workers=1, shard_by=shard_by, progress=False
+        )
+        return pd.read_csv(output_csv)
+
+    full = run()
+    assert len(full) == 2 * 2 * 3 and len(ran) == (2 if shard_by == "subject" else 4)
+
+    pd.testing.assert_frame_equal(run(), full)
+    assert ran == []
+
+    rewrite_epoch(store, "subject_2", 1, 0)
+    changed = run()
+    assert ran == [("subject_2", None if shard_by == "subject" else "channel_2")]
+    assert (changed["hurst"] != full["hurst"]).sum() == 1
+
+    remove_subject_store(store, "subject_1")
+    assert set(run()["subject"]) == {"subject_2"} and ran == []
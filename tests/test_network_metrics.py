@@ -0,0 +1,140 @@
+import numpy as np
+import networkx as nx
+import pytest
+from collections import defaultdict
+
+from networks.visibility_graph import compute_visibility_graph
+from networks.network_metrics import (
+    compute_network_metrics,
+    participation_coefficient,
+    participation_coefficient_batch
+)
+from networks.hub_classification import (
+    within_module_degree_zscore,
+    within_module_degree_zscore_batch
+)
+
+
+# ---------------- REFERENCE LOOPS ----------------
+# The per-node implementations the vectorized versions replaced
+
+def reference_participation(adj, communities):
+    G = nx.from_numpy_array(adj)
+    modules = set(communities.values())
+    P = np.zeros(len(G))
+    for i in G.nodes():
+        ki = G.degree(i)
+        if ki == 0:
+            continue
+        P[i] = 1 - sum(
+            (sum(1 for j in G.neighbors(i) if communities[j] == m) / ki) ** 2
+            for m in modules
+        )
+    return P
+
+
+def reference_zscore(adj, communities):
+    z = np.zeros(adj.shape[0])
+    module_nodes = defaultdict(list)
+    for node, mod in communities.items():
+        module_nodes[mod].append(node)
+
+    for nodes in module_nodes.values():
+        k_s = [sum(adj[i, j] for j in nodes) for i in nodes]
+        mean_k, std_k = np.mean(k_s), np.std(k_s)
+        for idx, i in enumerate(nodes):
+            z[i] = (k_s[idx] - mean_k) / std_k if std_k > 0 else 0
+    return z
+
+
+def graph_and_partition(seed, n=300, n_modules=6):
+    rng = np.random.default_rng(seed)
+    adj = compute_visibility_graph(np.cumsum(rng.standard_normal(n)))
+    # Contiguous modules, as Louvain finds on VGs, plus some noise
+    labels = np.minimum(np.arange(n) * n_modules // n + (rng.random(n) < 0.05), n_modules - 1)
+    return adj, {i: int(m) for i, m in enumerate(labels)}
+
+
+# ---------------- PARTICIPATION / Z-SCORE ----------------
+@pytest.mark.parametrize("seed", range(3))
+def test_participation_matches_reference(seed):
+    adj, communities = graph_and_partition(seed)
+    expected = reference_participation(adj, communities)
+
+    np.testing.assert_allclose(participation_coefficient(adj, communities), expected)
+    labels = np.array([communities[i] for i in range(len(adj))])
+    np.testing.assert_allclose(
+        participation_coefficient(nx.from_numpy_array(adj), labels), expected
+    )
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_zscore_matches_reference(seed):
+    from scipy import sparse
+
+    adj, communities = graph_and_partition(seed)
+    expected = reference_zscore(adj, communities)
+
+    np.testing.assert_allclose(within_module_degree_zscore(adj, communities), expected)
+    np.testing.assert_allclose(
+        within_module_degree_zscore(sparse.csr_matrix(adj), communities), expected
+    )
+
+
+def test_isolated_nodes_and_single_node_modules():
+    adj = np.zeros((4, 4), dtype=int)
+    adj[0, 1] = adj[1, 0] = 1
+    communities = {0: 0, 1: 1, 2: 2, 3: 2}
+
+    np.testing.assert_allclose(
+        participation_coefficient(adj, communities),
+        reference_participation(adj, communities)
+    )
+    np.testing.assert_allclose(
+        within_module_degree_zscore(adj, communities),
+        reference_zscore(adj, communities)
+    )
+
+
+def test_batches_match_single_graphs():
+    graphs = [graph_and_partition(seed, n=100 + 50 * seed) for seed in range(3)]
+    adjs = [adj for adj, _ in graphs]
+    parts = [communities for _, communities in graphs]
+
+    for got, (adj, communities) in zip(participation_coefficient_batch(adjs, parts), graphs):
+        np.testing.assert_allclose(got, participation_coefficient(adj, communities))
+    for got, (adj, communities) in zip(within_module_degree_zscore_batch(adjs, parts), graphs):
+        np.testing.assert_allclose(got, within_module_degree_zscore(adj, communities))
+
+
+# ---------------- BACKENDS ----------------
+@pytest.mark.parametrize("seed", range(3))
+def test_sparse_backend_matches_networkx(seed):
+    from scipy import sparse
+
+    adj, _ = graph_and_partition(seed)
+    dense = compute_network_metrics(adj, backend="networkx", seed=seed)
+    csr = compute_network_metrics(sparse.csr_matrix(adj), backend="sparse", seed=seed)
+
+    np.testing.assert_array_equal(csr["communities"], dense["communities"])
+    np.testing.assert_array_equal(csr["degree"], dense["degree"])
+    for key in ("clustering", "avg_clustering", "modularity", "participation"):
+        np.testing.assert_allclose(csr[key], dense[key], err_msg=key)
+    np.testing.assert_allclose(
+        csr["eigenvector_centrality"], dense["eigenvector_centrality"], atol=1e-5
+    )
+
+
+def test_sparse_eigenvector_centrality_is_reproducible():
+    from scipy import sparse
+    from networks.network_metrics import eigenvector_centrality_sparse
+
+    adj = sparse.csr_matrix(graph_and_partition(0)[0])
+    np.testing.assert_array_equal(
+        eigenvector_centrality_sparse(adj), eigenvector_centrality_sparse(adj)
+    )
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError, match="backend"):
+        compute_network_metrics(np.zeros((3, 3)), backend="igraph")
@@ -0,0 +1,139 @@
+import numpy as np
+import pytest
+
+from networks.node_store import (
+    NODE_METRICS,
+    create_node_store,
+    node_metric_matrix,
+    open_node_store,
+    read_node_metrics,
+    write_node_metrics
+)
+
+SUBJECTS = ["subject_1", "subject_2", "subject_3"]
+CHANNELS = ["channel_31", "channel_124"]
+
+
+def epoch_values(s, c, e, num_nodes=6):
+    """Distinct (nodes, metrics) values per subject, channel and epoch"""
+    base = 1000 * s + 100 * c + 10 * e
+    return (base + np.arange(num_nodes * len(NODE_METRICS))).reshape(
+        num_nodes, len(NODE_METRICS)
+    ).astype(np.float32)
+
+
+@pytest.fixture
+def store(tmp_path):
+    create_node_store(tmp_path, "mdd", SUBJECTS, CHANNELS, 4, 6)
+    for s, subject_id in enumerate(SUBJECTS):
+        for c, channel in enumerate(CHANNELS):
+            for e in range(4):
+                write_node_metrics(tmp_path, "mdd", subject_id, channel, e,
+                                   epoch_values(s, c, e))
+    return tmp_path
+
+
+def full_array(store):
+    data, _ = open_node_store(store, "mdd")
+    return np.asarray(data)
+
+
+# ---------------- READING ----------------
+def test_read_everything(store):
+    data = read_node_metrics(store, "mdd")
+    assert data.shape == (3, 2, 4, 6, len(NODE_METRICS))
+    np.testing.assert_array_equal(data[1, 0, 2], epoch_values(1, 0, 2))
+
+
+@pytest.mark.parametrize("selection, index", [
+    ({"subjects": ["subject_3", "subject_1"]}, np.s_[[2, 0]]),
+    ({"channels": ["channel_124"]}, np.s_[:, [1]]),
+    ({"epochs": slice(1, 3)}, np.s_[:, :, 1:3]),
+    ({"epochs": [3, 0]}, np.s_[:, :, [3, 0]]),
+    ({"epochs": 2}, np.s_[:, :, [2]]),
+    ({"nodes": slice(None, None, 2)}, np.s_[:, :, :, ::2]),
+    ({"nodes": np.int64(5)}, np.s_[:, :, :, [5]]),
+    ({"metrics": ["z", "degree"]}, np.s_[:, :, :, :, [4, 0]]),
+])
+def test_read_single_axis(store, selection, index):
+    np.testing.assert_array_equal(
+        read_node_metrics(store, "mdd", **selection), full_array(store)[index]
+    )
+
+
+def test_read_several_axes_by_name_and_index(store):
+    got = read_node_metrics(
+        store, "mdd",
+        subjects=["subject_2", "subject_3"],
+        channels=["channel_124", "channel_31"],
+        epochs=[0, 3],
+        nodes=slice(2, 5),
+        metrics=["role", "participation", "z"]
+    )
+    expected = full_array(store)[[1, 2]][:, [1, 0]][:, :, [0, 3]][:, :, :, 2:5][..., [5, 2, 4]]
+    assert got.shape == (2, 2, 2, 3, 3)
+    np.testing.assert_array_equal(got, expected)
+
+
+# ---------------- WRITING ----------------
+def test_short_and_long_epochs(tmp_path):
+    create_node_store(tmp_path, "mdd", SUBJECTS, CHANNELS, 2, 6)
+    write_node_metrics(tmp_path, "mdd", "subject_1", "channel_31", 0, epoch_values(0, 0, 0, 8))
+    write_node_metrics(tmp_path, "mdd", "subject_1", "channel_31", 1, epoch_values(0, 0, 1, 4))
+
+    data = read_node_metrics(tmp_path, "mdd", subjects=["subject_1"], channels=["channel_31"])[0, 0]
+    np.testing.assert_array_equal(data[0], epoch_values(0, 0, 0, 8)[:6])
+    np.testing.assert_array_equal(data[1, :4], epoch_values(0, 0, 1, 4))
+    assert np.isnan(data[1, 4:]).all()
+    # Never written
+    assert np.isnan(read_node_metrics(tmp_path, "mdd", subjects=["subject_2"])).all()
+
+
+def test_node_metric_matrix_roles():
+    network = {
+        "degree": np.array([3, 1]), "clustering": np.array([0.5, 0.0]),
+        "participation": np.array([0.0, 0.9]), "eigenvector_centrality": np.array([0.7, 0.1]),
+        "z": np.array([3.0, 0.0])
+    }
+    matrix = node_metric_matrix(network)
+    assert matrix.dtype == np.float32 and matrix.shape == (2, len(NODE_METRICS))
+    np.testing.assert_array_equal(matrix[:, -1], [5, 4])
+
+
+# ---------------- RESIZING ----------------
+def test_unchanged_layout_keeps_the_file(store):
+    before = (store / "mdd.npy").stat().st_mtime_ns
+    create_node_store(store, "mdd", SUBJECTS, CHANNELS, 4, 6)
+    assert (store / "mdd.npy").stat().st_mtime_ns == before
+
+
+def test_resize_carries_values_over(store):
+    old = full_array(store)
+    subjects = ["subject_0", "subject_1", "subject_3"]     # one new, one dropped
+    channels = ["channel_124", "channel_5", "channel_31"]   # reordered, one new
+    meta = create_node_store(store, "mdd", subjects, channels, 5, 4)
+
+    data, stored_meta = open_node_store(store, "mdd")
+    assert stored_meta == meta and data.shape == (3, 3, 5, 4, len(NODE_METRICS))
+
+    for s, subject_id in enumerate(subjects):
+        for c, channel in enumerate(channels):
+            if subject_id in SUBJECTS and channel in CHANNELS:
+                s_old, c_old = SUBJECTS.index(subject_id), CHANNELS.index(channel)
+                # Fewer nodes, more epochs than before
+                np.testing.assert_array_equal(data[s, c, :4], old[s_old, c_old, :, :4])
+                assert np.isnan(data[s, c, 4]).all()
+            else:
+                assert np.isnan(data[s, c]).all()
+
+    # The new entries can be written
+    write_node_metrics(store, "mdd", "subject_0", "channel_5", 4, epoch_values(9, 9, 9, 4))
+    np.testing.assert_array_equal(
+        read_node_metrics(store, "mdd", ["subject_0"], ["channel_5"], 4)[0, 0, 0],
+        epoch_values(9, 9, 9, 4)
+    )
+
+
+def test_new_metrics_start_empty(store):
+    create_node_store(store, "mdd", SUBJECTS, CHANNELS, 4, 6, metrics=("degree", "z"))
+    assert np.isnan(read_node_metrics(store, "mdd")).all()
@@ -0,0 +1,180 @@
+import numpy as np
+import pytest
+import pandas as pd
+from itertools import combinations
+
+from permutation_test_fdr import (
+    channelwise_permutation_fdr,
+    load_group_tables,
+    permutation_test,
+    permutation_test_batch
+)
+
+
+def exact_p_value(x1, x2, alternative="two-sided"):
+    """p-value over every split of the pooled sample"""
+    combined = np.concatenate([x1, x2])
+    observed = x1.mean() - x2.mean()
+    diffs = []
+    for idx in combinations(range(len(combined)), len(x1)):
+        mask = np.zeros(len(combined), dtype=bool)
+        mask[list(idx)] = True
+        diffs.append(combined[mask].mean() - combined[~mask].mean())
+    diffs = np.array(diffs)
+    tol = 1e-12
+    if alternative == "two-sided":
+        return np.mean(np.abs(diffs) >= abs(observed) - tol)
+    if alternative == "greater":
+        return np.mean(diffs >= observed - tol)
+    return np.mean(diffs <= observed + tol)
+
+
+def groups(n1=12, n2=10, n_channels=20, shift=0.5, seed=0):
+    rng = np.random.default_rng(seed)
+    data1 = rng.standard_normal((n1, n_channels)) + shift * (np.arange(n_channels) % 3 == 0)
+    data2 = rng.standard_normal((n2, n_channels))
+    return data1, data2
+
+
+# ---------------- BATCHED TEST ----------------
+@pytest.mark.parametrize("alternative", ["two-sided", "greater", "less"])
+def test_batch_matches_exact_enumeration(alternative):
+    data1, data2 = groups(n1=5, n2=5, n_channels=4, shift=1.0)
+    p, diff, used = permutation_test_batch(
+        data1, data2, num_permutations=20000, alternative=alternative, rng=0
+    )
+    expected = [exact_p_value(data1[:, c], data2[:, c], alternative) for c in range(4)]
+
+    np.testing.assert_allclose(diff, data1.mean(axis=0) - data2.mean(axis=0))
+    np.testing.assert_allclose(p, expected, atol=0.015)
+    assert (used == 20000).all()
+
+
+def test_batch_agrees_with_per_channel_loop():
+    data1, data2 = groups(n_channels=3, shift=1.0)
+    p, _, _ = permutation_test_batch(data1, data2, num_permutations=5000, rng=1)
+
+    np.random.seed(1)
+    for c in range(3):
+        p_loop, _ = permutation_test(data1[:, c], data2[:, c], num_permutations=5000)
+        assert abs(p[c] - p_loop) < 0.03
+
+
+def test_channels_do_not_affect_each_other():
+    data1, data2 = groups()
+    p_all, diff_all, _ = permutation_test_batch(data1, data2, 2000, rng=3)
+    subset = [2, 5, 11]
+    p_sub, diff_sub, _ = permutation_test_batch(
+        data1[:, subset], data2[:, subset], 2000, rng=3
+    )
+
+    np.testing.assert_array_equal(p_sub, p_all[subset])
+    np.testing.assert_allclose(diff_sub, diff_all[subset])
+
+
+def test_seed_reproducibility_and_block_size():
+    data1, data2 = groups()
+    first = permutation_test_batch(data1, data2, 3000, rng=42)
+    again = permutation_test_batch(data1, data2, 3000, rng=42)
+    for a, b in zip(first, again):
+        np.testing.assert_array_equal(a, b)
+
+    other_blocks, _, used = permutation_test_batch(data1, data2, 3000, rng=42, block_size=700)
+    assert (used == 3000).all()
+    np.testing.assert_allclose(other_blocks, first[0], atol=0.05)
+
+
+def test_single_channel_and_ties():
+    x = np.array([1.0, 2.0, 3.0, 4.0])
+    p, diff, used = permutation_test_batch(x, x.copy(), 500, rng=0)
+    assert np.ndim(p) == 0 and diff == 0
+    # Every permutation ties or beats a zero difference
+    assert p == 1.0 and used == 500
+
+    with pytest.raises(ValueError, match="alternative"):
+        permutation_test_batch(x, x, 10, alternative="both", rng=0)
+
+
+def test_early_stop_keeps_decisions():
+    data1, data2 = groups(n1=20, n2=20, shift=2.0)
+    full, _, _ = permutation_test_batch(data1, data2, 10000, rng=5)
+    early, _, used = permutation_test_batch(
+        data1, data2, 10000, rng=5, early_stop_alpha=0.05
+    )
+
+    # Clear-cut channels stop early, with the same decision
+    assert used.min() < 10000
+    stopped = used < 10000
+    np.testing.assert_array_equal((early < 0.05)[stopped], (full < 0.05)[stopped])
+
+
+# ---------------- CHANNEL-WISE FDR ----------------
+def group_frames(n_channels=40, seed=0):
+    data1, data2 = groups(n_channels=n_channels, shift=1.5, seed=seed)
+    columns = [f"channel_{c}" for c in range(n_channels)]
+    return pd.DataFrame(data1, columns=columns), pd.DataFrame(data2, columns=columns)
+
+
+def test_fdr_independent_of_worker_count():
+    df1, df2 = group_frames()
+    serial = channelwise_permutation_fdr(df1, df2, 2000, seed=11, n_workers=1)
+    parallel = channelwise_permutation_fdr(df1, df2, 2000, seed=11, n_workers=2)
+
+    pd.testing.assert_frame_equal(serial, parallel)
+    assert serial["significant"].any() and not serial["significant"].all()
+
+
+def test_fdr_missing_subjects_and_channel_alignment():
+    df1, df2 = group_frames(n_channels=5)
+    df1.iloc[0, 1] = np.nan
+    df2 = df2.drop(columns="channel_4")
+
+    results = channelwise_permutation_fdr(df1, df2, 1000, seed=0)
+    assert list(results["Channel"]) == [f"channel_{c}" for c in range(4)]
+    assert results["p_value"].notna().all()
+
+    # The incomplete channel is tested on its remaining subjects only
+    _, diff, _ = permutation_test_batch(
+        df1["channel_1"].dropna().to_numpy(), df2["channel_1"].to_numpy(), 1000, rng=0
+    )
+    assert results.loc[1, "mean_difference"] == pytest.approx(diff)
+
+
+def test_fdr_channel_without_values_in_one_group():
+    from statsmodels.stats.multitest import multipletests
+
+    df1, df2 = group_frames(n_channels=4)
+    # e.g. a flat electrode whose Hurst exponent is NaN in every epoch
+    df1["channel_2"] = np.nan
+
+    results = channelwise_permutation_fdr(df1, df2, 1000, seed=0)
+    flat = results["Channel"] == "channel_2"
+    assert results.loc[flat, ["mean_difference", "p_value", "p_value_fdr"]].isna().all(axis=None)
+    assert not results.loc[flat, "significant"].item()
+    assert results.loc[flat, "num_permutations"].item() == 0
+
+    # The correction only spans the testable channels
+    _, expected, _, _ = multipletests(results.loc[~flat, "p_value"], method="fdr_bh")
+    np.testing.assert_allclose(results.loc[~flat, "p_value_fdr"], expected)
+
+    # Nothing testable at all
+    df1[:] = np.nan
+    assert channelwise_permutation_fdr(df1, df2, 100, seed=0)["p_value"].isna().all()
+
+
+def test_load_group_tables(tmp_path):
+    rows = [
+        {"group": group, "subject": f"{group}_{s}", "channel": f"channel_{c}",
+         "epoch": e, "hurst": s + c + e}
+        for group in ("MDD", "NORMAL") for s in range(3)
+        for c in range(2) for e in range(2)
+    ]
+    df = pd.DataFrame(rows)
+    df.to_csv(tmp_path / "results.csv", index=False)
+    df.to_parquet(tmp_path / "results.parquet")
+
+    for path in ("results.csv", "results.parquet"):
+        mdd, normal = load_group_tables("hurst", results_csv=tmp_path / path)
+        assert mdd.shape == normal.shape == (3, 2)
+        # Epochs are averaged per subject and channel
+        assert mdd.loc["MDD_1", "channel_1"] == 2.5
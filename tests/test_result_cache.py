@@ -0,0 +1,139 @@
+import os
+import numpy as np
+import pytest
+from scipy import sparse
+
+from networks.epoch_analysis import compute_epoch_network
+from networks.result_cache import (
+    cache_key,
+    cache_get,
+    cache_put,
+    cache_size,
+    evict_lru,
+    _entry_path
+)
+
+
+def signal(seed=0, n=200):
+    return np.cumsum(np.random.default_rng(seed).standard_normal(n))
+
+
+def entry(seed=0, n=50):
+    rng = np.random.default_rng(seed)
+    adj = sparse.random(n, n, density=0.1, random_state=seed, format="csr")
+    return {
+        "adj": adj + adj.T,
+        "communities": rng.integers(0, 4, n),
+        "z": rng.standard_normal(n),
+        "modularity": 0.4,
+        "avg_clustering": 0.6
+    }
+
+
+# ---------------- KEYS ----------------
+def test_key_depends_on_signal_and_params():
+    x = signal()
+    key = cache_key(x, graph="nvg", seed=0)
+
+    assert cache_key(x.copy(), seed=0, graph="nvg") == key
+    assert cache_key(x.astype(np.float32).astype(float), graph="nvg", seed=0) != key
+    assert cache_key(x[:-1], graph="nvg", seed=0) != key
+    assert cache_key(x, graph="hvg", seed=0) != key
+    assert cache_key(x, graph="nvg", seed=1) != key
+    assert cache_key(x, graph="nvg", seed=0, lowcut=0.5) != key
+
+
+# ---------------- ENTRIES ----------------
+def test_put_get_round_trip(tmp_path):
+    stored = entry()
+    cache_put(tmp_path, "ab" * 32, stored)
+    loaded = cache_get(tmp_path, "ab" * 32)
+
+    assert sparse.issparse(loaded["adj"])
+    assert (loaded["adj"] != stored["adj"]).nnz == 0
+    np.testing.assert_array_equal(loaded["communities"], stored["communities"])
+    np.testing.assert_array_equal(loaded["z"], stored["z"])
+    assert loaded["modularity"] == 0.4 and isinstance(loaded["modularity"], float)
+
+
+def test_missing_and_truncated_entries_miss(tmp_path):
+    key = "cd" * 32
+    assert cache_get(tmp_path, key) is None
+
+    cache_put(tmp_path, key, entry())
+    path = _entry_path(tmp_path, key)
+    path.write_bytes(path.read_bytes()[:100])
+    assert cache_get(tmp_path, key) is None
+
+
+def test_lru_eviction(tmp_path):
+    keys = [f"{i:02d}" * 32 for i in range(5)]
+    for t, key in enumerate(keys):
+        cache_put(tmp_path, key, entry(t))
+        os.utime(_entry_path(tmp_path, key), (1000 + t, 1000 + t))
+
+    # Reading the oldest entry makes it the most recently used
+    cache_get(tmp_path, keys[0])
+    entry_size = _entry_path(tmp_path, keys[1]).stat().st_size
+
+    remaining = evict_lru(tmp_path, cache_size(tmp_path) - entry_size)
+    assert remaining == cache_size(tmp_path)
+    assert cache_get(tmp_path, keys[1]) is None
+    assert all(cache_get(tmp_path, k) is not None for k in (keys[0], *keys[2:]))
+
+
+def test_put_bounds_cache_size(tmp_path):
+    max_bytes = 3 * _size_of_one(tmp_path / "probe")
+    for i in range(10):
+        cache_put(tmp_path / "cache", f"{i:02d}" * 32, entry(0), max_bytes)
+    assert cache_size(tmp_path / "cache") <= max_bytes
+
+
+def test_bound_holds_across_processes(tmp_path, monkeypatch):
+    import networks.result_cache
+
+    monkeypatch.setattr(networks.result_cache, "RESCAN_PUTS", 2)
+    one = _size_of_one(tmp_path / "probe")
+    max_bytes = 20 * one
+
+    # Four workers taking turns, each with its own size estimate; none
+    # of them writes max_bytes on its own
+    estimates = [{} for _ in range(4)]
+    for i in range(8):
+        for worker, estimate in enumerate(estimates):
+            monkeypatch.setattr(networks.result_cache, "_size_estimate", estimate)
+            cache_put(tmp_path / "cache", f"{worker:02d}{i:02d}" * 16, entry(0), max_bytes)
+
+    assert cache_size(tmp_path / "cache") <= max_bytes + 4 * 2 * one
+
+
+def _size_of_one(cache_dir):
+    cache_put(cache_dir, "ff" * 32, entry(0))
+    return cache_size(cache_dir)
+
+
+# ---------------- EPOCH NETWORKS ----------------
+@pytest.mark.parametrize("vg_options", [None, {"graph": "hvg"}])
+def test_cached_epoch_network_equals_fresh(tmp_path, vg_options):
+    x = signal()
+    fresh = compute_epoch_network(x, vg_options=vg_options)
+    first = compute_epoch_network(x, cache_dir=tmp_path, vg_options=vg_options)
+    assert cache_size(tmp_path) > 0
+
+    hit = compute_epoch_network(x, cache_dir=tmp_path, vg_options=vg_options)
+    for result in (first, hit):
+        assert (result["adj"] != fresh["adj"]).nnz == 0
+        for name in ("communities", "degree", "clustering", "participation",
+                     "eigenvector_centrality", "z"):
+            np.testing.assert_array_equal(result[name], fresh[name], err_msg=name)
+        assert result["modularity"] == fresh["modularity"]
+
+
+def test_epoch_network_key_includes_settings(tmp_path):
+    x = signal()
+    compute_epoch_network(x, cache_dir=tmp_path)
+    compute_epoch_network(x, cache_dir=tmp_path, seed=1)
+    compute_epoch_network(x, cache_dir=tmp_path, resolution=1.5)
+    compute_epoch_network(x, cache_dir=tmp_path, cache_params={"lowcut": 1.0})
+    compute_epoch_network(x, cache_dir=tmp_path, vg_options={"graph": "lpvg", "penetrable_distance": 1})
+    assert len(list(tmp_path.glob("*/*.npz"))) == 5
@@ -0,0 +1,164 @@
+import numpy as np
+import pytest
+
+from networks.visibility_graph import NVG_ENGINES, compute_visibility_graph
+
+
+def brute_force_nvg(x):
+    """
+    NVG straight from the definition: i and j are linked when every
+    sample between them lies strictly below the line joining them.
+    """
+    N = len(x)
+    adj = np.zeros((N, N), dtype=int)
+    for i in range(N):
+        for j in range(i + 1, N):
+            if all(
+                x[k] < x[j] + (x[i] - x[j]) * (j - k) / (j - i)
+                for k in range(i + 1, j)
+            ):
+                adj[i, j] = adj[j, i] = 1
+    return adj
+
+
+def series(kind, n=80, seed=0):
+    rng = np.random.default_rng(seed)
+    if kind == "noise":
+        return rng.standard_normal(n)
+    if kind == "walk":
+        return np.cumsum(rng.standard_normal(n))
+    if kind == "ties":
+        return rng.integers(0, 4, n).astype(float)
+    if kind == "monotone":
+        return np.arange(n, dtype=float)
+    if kind == "constant":
+        return np.ones(n)
+    raise ValueError(kind)
+
+
+@pytest.mark.parametrize("engine", NVG_ENGINES)
+@pytest.mark.parametrize("kind", ["noise", "walk"])
+def test_engines_match_definition(engine, kind):
+    x = series(kind)
+    np.testing.assert_array_equal(
+        compute_visibility_graph(x, engine=engine), brute_force_nvg(x)
+    )
+
+
+@pytest.mark.parametrize("engine", ["vectorized", "divide_conquer"])
+@pytest.mark.parametrize("kind", ["noise", "walk", "ties", "monotone", "constant"])
+@pytest.mark.parametrize("seed", range(3))
+def test_engines_match_reference_loop(engine, kind, seed):
+    x = series(kind, n=150, seed=seed)
+    np.testing.assert_array_equal(
+        compute_visibility_graph(x, engine=engine),
+        compute_visibility_graph(x, engine="loop")
+    )
+
+
+@pytest.mark.parametrize("engine", NVG_ENGINES)
+@pytest.mark.parametrize("n", [0, 1, 2, 3])
+def test_short_series(engine, n):
+    x = np.arange(n, dtype=float)
+    adj = compute_visibility_graph(x, engine=engine)
+    assert adj.shape == (n, n)
+    # Consecutive samples always see each other
+    assert all(adj[i, i + 1] == 1 for i in range(n - 1))
+
+
+def test_unknown_engine():
+    with pytest.raises(ValueError):
+        compute_visibility_graph(np.arange(5.0), engine="nope")
+
+
+@pytest.mark.parametrize("kind", ["walk", "ties"])
+def test_sparse_output_matches_dense(kind, tmp_path):
+    from scipy import sparse
+    from networks.visibility_graph import (
+        save_visibility_graph,
+        load_visibility_graph
+    )
+
+    x = series(kind, n=200)
+    dense = compute_visibility_graph(x)
+    adj = compute_visibility_graph(x, sparse_output=True)
+
+    assert sparse.issparse(adj)
+    np.testing.assert_array_equal(adj.toarray(), dense)
+    assert (adj != adj.T).nnz == 0
+
+    save_visibility_graph(tmp_path / "vg.npz", adj)
+    np.testing.assert_array_equal(
+        load_visibility_graph(tmp_path / "vg.npz").toarray(), dense
+    )
+
+
+# ---------------- HVG and limited-penetrable VGs ----------------
+def brute_force_vg(x, horizontal, penetrable_distance=0):
+    """
+    (LP)(H)VG from the definition: i and j are linked when at most
+    penetrable_distance samples between them block the view.
+
+    As in the max-slope NVG, a sample exactly on the line of sight
+    does not block it; for the HVG, a sample as high as the lower end
+    does.
+    """
+    N = len(x)
+    adj = np.zeros((N, N), dtype=int)
+    for i in range(N):
+        for j in range(i + 1, N):
+            if horizontal:
+                blocking = sum(x[k] >= min(x[i], x[j]) for k in range(i + 1, j))
+            else:
+                slope = (x[j] - x[i]) / (j - i)
+                blocking = sum(
+                    (x[k] - x[i]) / (k - i) > slope for k in range(i + 1, j)
+                )
+            if blocking <= penetrable_distance:
+                adj[i, j] = adj[j, i] = 1
+    return adj
+
+
+@pytest.mark.parametrize("kind", ["noise", "walk", "ties", "monotone", "constant"])
+def test_hvg_matches_definition(kind):
+    x = series(kind)
+    np.testing.assert_array_equal(
+        compute_visibility_graph(x, graph="hvg"),
+        brute_force_vg(x, horizontal=True)
+    )
+
+
+@pytest.mark.parametrize("graph, horizontal", [("lpvg", False), ("lphvg", True)])
+@pytest.mark.parametrize("penetrable_distance", [0, 1, 3])
+@pytest.mark.parametrize("kind", ["noise", "walk", "ties"])
+def test_limited_penetrable_matches_definition(graph, horizontal, penetrable_distance, kind):
+    x = series(kind, n=60)
+    np.testing.assert_array_equal(
+        compute_visibility_graph(
+            x, graph=graph, penetrable_distance=penetrable_distance
+        ),
+        brute_force_vg(x, horizontal, penetrable_distance)
+    )
+
+
+@pytest.mark.parametrize("graph, base", [("lpvg", "nvg"), ("lphvg", "hvg")])
+def test_zero_penetration_is_the_plain_graph(graph, base):
+    x = series("walk", n=300)
+    np.testing.assert_array_equal(
+        compute_visibility_graph(x, graph=graph, penetrable_distance=0),
+        compute_visibility_graph(x, graph=base)
+    )
+
+
+def test_unknown_graph():
+    with pytest.raises(ValueError):
+        compute_visibility_graph(np.arange(5.0), graph="nope")
+
+
+def test_chunk_size_follows_graph_cost():
+    from networks.visibility_graph import epoch_chunksize
+
+    nvg = epoch_chunksize(100000, 4, 2500)
+    hvg = epoch_chunksize(100000, 4, 2500, {"graph": "hvg"})
+    lpvg = epoch_chunksize(100000, 4, 2500, {"graph": "lpvg", "penetrable_distance": 3})
+    assert lpvg <= nvg < hvg
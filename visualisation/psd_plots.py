@@ -3,6 +3,44 @@ import pandas as pd
 import matplotlib.pyplot as plt
 from pathlib import Path
 
+from frequency_analysis.psd_analysis import (
+    init_psd_accumulator,
+    update_psd_accumulator,
+    summarize_psd_accumulator
+)
+
+
+def plot_group_psd_summaries(
+    summaries: dict,
+    colors=None
+):
+    """
+    Plot group mean PSD curves with percentile shading.
+
+    summaries maps group -> summarize_psd_accumulator() output, e.g.
+    from the accumulators returned by run_psd_analysis.
+    """
+    if colors is None:
+        colors = {"mdd": "red", "normal": "blue"}
+
+    plt.figure(figsize=(8, 6))
+
+    for g, summary in summaries.items():
+        freqs = summary["freqs"]
+        plt.plot(freqs, summary["mean"], label=g.capitalize(), color=colors[g])
+        plt.fill_between(
+            freqs, summary["lower"], summary["upper"],
+            color=colors[g], alpha=0.3
+        )
+
+    plt.xlabel("Frequency (Hz)")
+    plt.ylabel("Power Density (µV²/Hz)")
+    plt.title("Group-Averaged PSD (1–30 Hz)")
+    plt.legend()
+    plt.grid(alpha=0.3)
+    plt.tight_layout()
+    plt.show()
+
 
 def plot_group_average_psd(
     base_psd_dir: Path,
@@ -13,48 +51,34 @@ def plot_group_average_psd(
 ):
     """
     Plot group-averaged PSD with variability shading.
-    """
-    if colors is None:
-        colors = {"mdd": "red", "normal": "blue"}
 
+    Subject PSDs are streamed from the CSVs into running group
+    accumulators; each file is read once.
+    """
     # Load reference frequency axis
     ref = next(base_psd_dir.rglob("chan_*_psd.csv"))
     freqs = pd.read_csv(ref)["frequency"].values
-    mask = (freqs >= fs_range[0]) & (freqs <= fs_range[1])
-    freqs = freqs[mask]
 
-    plt.figure(figsize=(8, 6))
+    summaries = {}
 
     for g in groups:
-        subject_curves = []
+        acc = init_psd_accumulator(freqs)
 
         for subj_dir in (base_psd_dir / g).iterdir():
             chan_curves = []
+            chan_names = []
 
             for ch in selected_channels:
                 fn = subj_dir / f"chan_{ch}_psd.csv"
                 if not fn.exists():
                     continue
 
-                psd = pd.read_csv(fn)["power_density"].values
-                chan_curves.append(psd[mask])
+                chan_curves.append(pd.read_csv(fn)["power_density"].values)
+                chan_names.append(ch)
 
             if chan_curves:
-                subject_curves.append(
-                    np.mean(np.stack(chan_curves), axis=0)
-                )
+                update_psd_accumulator(acc, np.stack(chan_curves), chan_names)
 
-        arr = np.stack(subject_curves)
-        mean_ = arr.mean(axis=0)
-        lo, hi = np.percentile(arr, [25, 75], axis=0)
+        summaries[g] = summarize_psd_accumulator(acc, fs_range=fs_range)
 
-        plt.plot(freqs, mean_, label=g.capitalize(), color=colors[g])
-        plt.fill_between(freqs, lo, hi, color=colors[g], alpha=0.3)
-
-    plt.xlabel("Frequency (Hz)")
-    plt.ylabel("Power Density (µV²/Hz)")
-    plt.title("Group-Averaged PSD (1–30 Hz)")
-    plt.legend()
-    plt.grid(alpha=0.3)
-    plt.tight_layout()
-    plt.show()
+    plot_group_psd_summaries(summaries, colors)